@@ -1,9 +1,10 @@
 # api/chatbot.py
 from typing import List, Dict
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel, Field, field_validator
 
 from backend.services.chat import chat as chat_service
+from backend.api.disconnect import cancel_on_disconnect
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
@@ -18,13 +19,13 @@ class ChatResponse(BaseModel):
 
 # ---------- Endpoint ---------- #
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(body: ChatRequest):
+async def chat_endpoint(body: ChatRequest, request: Request):
     try:
-        answer = await chat_service(
+        answer = await cancel_on_disconnect(request, chat_service(
             history=body.history,
             page_content=body.pageContent,
             query=body.promptText,
-        )
+        ))
         return ChatResponse(response=answer)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Chat service failed")
@@ -0,0 +1,29 @@
+# api/disconnect.py
+import asyncio
+from typing import Awaitable, TypeVar
+from fastapi import Request
+
+T = TypeVar("T")
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """Await ``awaitable`` but cancel it as soon as the client goes away.
+
+    Starlette keeps running a handler after its client disconnects; for LLM
+    calls that means paying for a completion nobody will read. Cancelling the
+    task aborts the in-flight HTTP request to the model and frees its slot.
+    """
+    task = asyncio.ensure_future(awaitable)
+
+    async def watch():
+        while not task.done():
+            if await request.is_disconnected():
+                print(f"[Disconnect] Client left {request.url.path}, cancelling LLM call")
+                task.cancel()
+                return
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    finally:
+        watcher.cancel()
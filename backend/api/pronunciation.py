@@ -1,19 +1,23 @@
-import psycopg2
 import json
+import time
+import asyncio
 from pathlib import Path
 import uuid
-import os
-from pydub import AudioSegment
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
 from backend.services.voice_quiz_generator import process_user_audio, pronunciation_feedback
-from backend.database import get_db
+from backend.services.user_audio import (
+    AudioDecodeError, USER_AUDIO_DIR, UPLOAD_SECONDS, UPLOAD_STAGE_SECONDS,
+    asr_input, decode_audio, discard_recording, recording_name, save_recording,
+)
+from backend.services.audio_pool import AUDIO_RETRY_AFTER, AudioPoolSaturated, audio_pool
+from backend.database import run_db
+from backend.services.quiz_service import quiz_service
 from backend.services.explanation_generator import generate_explanation_pronunciation
 from backend.schemas.pronunciation import PronunciationAnalysisResult, PronunciationScoreRequest, PronunciationScoreResponse
 
 router = APIRouter(tags=["pronunciation"])
 
-MEDIA_PUBLIC_DIR = Path("media/users")
-MEDIA_PUBLIC_DIR.mkdir(parents=True, exist_ok=True)
+USER_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
 @router.post("/upload-audio", response_model=PronunciationAnalysisResult)
 async def upload_audio(
@@ -21,7 +25,22 @@ async def upload_audio(
     user_id: str = Form(...),
     file: UploadFile = File(...)
 ):
-    conn = None
+    # Backpressure: a burst of recordings must not starve the other endpoints of this worker
+    try:
+        async with audio_pool.admit():
+            return await analyze_upload(id, user_id, file)
+    except AudioPoolSaturated:
+        raise audio_pool_busy()
+
+def audio_pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many recordings are being analyzed, please try again in a moment.",
+        headers={"Retry-After": str(AUDIO_RETRY_AFTER)},
+    )
+
+async def analyze_upload(id: int, user_id: str, file: UploadFile) -> PronunciationAnalysisResult:
+    started = time.perf_counter()
     try:
         # --- File Handling ---
         file_extension = Path(file.filename).suffix.lower()
@@ -29,48 +48,21 @@ async def upload_audio(
              # Assume webm if no extension given by browser recording
              file_extension = ".webm"
 
-        filename = f"{uuid.uuid4().hex}.wav" # Always save as wav eventually
-        temp_id = uuid.uuid4().hex
-        temp_path = MEDIA_PUBLIC_DIR / f"temp_{temp_id}{file_extension}"
-        output_path = MEDIA_PUBLIC_DIR / filename
+        content = await file.read()
+        filename = recording_name(uuid.uuid4().hex, file_extension)
         relative_output_url = f"/media/users/{filename}" # URL for frontend
 
-        # Write temporary file
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-
-        # Convert to WAV if necessary
-        if file_extension != ".wav":
-            try:
-                audio = AudioSegment.from_file(temp_path)
-                 # Ensure mono and standard sample rate if needed by analysis tool
-                 # audio = audio.set_channels(1).set_frame_rate(16000)
-                audio.export(output_path, format="wav")
-                os.remove(temp_path) # Clean up temp file
-            except Exception as convert_err:
-                 # Cleanup even if conversion fails
-                 if temp_path.exists():
-                     os.remove(temp_path)
-                 raise HTTPException(status_code=500, detail=f"Audio conversion failed: {convert_err}")
-        else:
-            os.rename(temp_path, output_path) # If already wav, just rename
+        # Decode in memory (16 kHz mono float32 for ASR) while the question is fetched
+        try:
+            samples, question_data = await asyncio.gather(
+                decode_audio(content, file_extension),
+                run_db(quiz_service.get_pronunciation_question, id),
+            )
+        except AudioDecodeError as convert_err:
+            raise HTTPException(status_code=500, detail=f"Audio conversion failed: {convert_err}")
 
         # --- Analysis ---
-        # Fetch question data from DB
-        conn = get_db()
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                SELECT question_text, correct_answer 
-                FROM quiz_questions 
-                    WHERE id = %s AND type = 'PRONUNCIATION'
-            """, (id,))
-            question_data = cur.fetchone()
-
         if not question_data:
-            # Clean up saved audio file if question not found or not pronunciation type
-            if output_path.exists():
-                os.remove(output_path)
             raise HTTPException(status_code=404, detail=f"Pronunciation question with ID {id} not found.")
 
         correct_answer_json = question_data['correct_answer']
@@ -79,53 +71,47 @@ async def upload_audio(
         try:
             correct_phonemes_dict = json.loads(correct_answer_json)
         except json.JSONDecodeError:
-             # Clean up saved audio file if correct answer format is bad
-             if output_path.exists():
-                 os.remove(output_path)
              raise HTTPException(status_code=500, detail=f"Invalid format for correct answer phonemes for question ID {id}.")
 
+        # Store the recording in the background; it only has to exist by the time we save the attempt
+        save_task = asyncio.create_task(save_recording(filename, content, samples, file_extension))
+        saved = False
+        try:
+            # Process the decoded samples
+            asr_started = time.perf_counter()
+            user_phonemes = await asyncio.to_thread(process_user_audio, asr_input(samples))
+            UPLOAD_STAGE_SECONDS.labels(stage="asr").observe(time.perf_counter() - asr_started)
+
+            # Calculate score
+            analysis = await audio_pool.run(pronunciation_feedback, user_phonemes, correct_answer_json)
+            score       = analysis["score"]
+            highlight   = analysis["highlight"]
+            corrections = analysis["corrections"]
+            is_correct = score >= 0.8
+
+            # Generate explanation (optional here, can be regenerated on submit)
+            explanation = await generate_explanation_pronunciation(question_text, correct_answer_json, user_phonemes)
+
+            try:
+                await save_task
+            except Exception as save_err:
+                print(f"Error saving recording {filename}: {save_err}")
 
-        # Process the saved WAV audio file
-        user_phonemes = process_user_audio(output_path)
-
-        # Calculate score
-        analysis = pronunciation_feedback(user_phonemes, correct_answer_json)
-        score       = analysis["score"]
-        highlight   = analysis["highlight"]
-        corrections = analysis["corrections"]
-        is_correct = score >= 0.8
-        
-        # Generate explanation (optional here, can be regenerated on submit)
-        explanation = await generate_explanation_pronunciation(question_text, correct_answer_json, user_phonemes)
-
-        # Save user_phonemes and explanation to DB
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            # Update user_answers: lưu userPhonemes
-            cur.execute("""
-                INSERT INTO user_answers (user_id, question_id, user_answer, user_phonemes, is_correct)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (user_id, question_id) DO UPDATE SET
-                    user_phonemes = EXCLUDED.user_phonemes,
-                    submitted_at = NOW()
-            """, (
+            # Save user_phonemes and explanation to DB
+            await run_db(
+                quiz_service.save_pronunciation_attempt,
                 user_id,
                 id,
                 relative_output_url,
                 user_phonemes,
-                is_correct
-            ))
-
-            # Update quiz_questions: lưu explanation
-            cur.execute("""
-                UPDATE quiz_questions 
-                SET explanation = %s 
-                WHERE id = %s
-            """, (
+                is_correct,
                 explanation,
-                id
-            ))
-
-        conn.commit()
+            )
+            saved = True
+        finally:
+            if not saved:
+                # No attempt row points to the recording: don't leave it in media/users
+                await discard_recording(save_task, filename)
 
         # Return results including the analysis
         return PronunciationAnalysisResult(
@@ -147,19 +133,16 @@ async def upload_audio(
         # Generic error for the client
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
     finally:
-        if conn:
-            conn.close()
-        # Ensure temporary file is removed in case of early exit/error
-        if 'temp_path' in locals() and temp_path.exists():
-            try:
-                os.remove(temp_path)
-            except OSError:
-                pass # Ignore if already removed or permissions issue
+        UPLOAD_SECONDS.observe(time.perf_counter() - started)
             
 @router.post("/calculate-phoneme-score", response_model=PronunciationScoreResponse)
-def calculate_phoneme_score(request: PronunciationScoreRequest):
+async def calculate_phoneme_score(request: PronunciationScoreRequest):
     try:
-        analysis = pronunciation_feedback(request.userPhonemes, request.correctPhonemes)
+        # Same slots as /upload-audio, so scoring requests cannot queue unbounded work into the pool
+        async with audio_pool.admit():
+            analysis = await audio_pool.run(pronunciation_feedback, request.userPhonemes, request.correctPhonemes)
         return PronunciationScoreResponse(**analysis)
+    except AudioPoolSaturated:
+        raise audio_pool_busy()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,9 +1,14 @@
 import psycopg2
+import json
+import time
 import random
 import asyncio
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import Histogram
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from asyncio import to_thread
 from backend.schemas.quiz import (
     QuizItem,
@@ -12,18 +17,25 @@ from backend.schemas.quiz import (
     QuizResponse,
     ExplanationRequest,
     QuizSubmission,
+    QuizAnswer,
     QuestionType,
     QuizQuestionWithUserAnswer
 )
-from backend.services.question_generator import generate_questions_batch
+from backend.services.question_generator import generate_questions_batch, iter_questions_batch
 from backend.services.quiz_service import quiz_service
 from backend.services.unit_service import get_unit_main_chunks, get_unit_subordinate_chunks
-from backend.services.practice_service import practice_service
-from backend.database import get_db
+from backend.services.analysis_queue import analysis_queue
+from backend.database import get_db, run_db
 from backend.services.voice_quiz_generator import calculate_pronunciation_score
 
 router = APIRouter(tags=["quiz"])
 
+QUIZ_TIME_TO_FIRST_QUESTION = Histogram(
+    "quiz_time_to_first_question_seconds", "Time from a streamed generate request to its first saved question",
+    ["question_type"],
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60),
+)
+
 # Chuyển đổi định dạng từ backend sang frontend
 def convert_to_quiz_items(questions: List[dict], start_id: int = 0):
     quiz_items = []
@@ -75,26 +87,28 @@ def convert_to_quiz_items(questions: List[dict], start_id: int = 0):
     
     return quiz_items
         
-@router.post("/generate", response_model=QuizResponse)
-async def generate_quiz(request: QuizRequest):
+async def _prepare_generation(request: QuizRequest) -> Tuple[int, Dict[str, Any]]:
+    """Create the quiz record and collect the unit content the generators need."""
     print(f"Received request - user: {request.user_id}, units: {request.unit_ids}, prompt: {request.prompt}, mc: {request.multiple_choice_count}, img: {request.image_count}, voice: {request.voice_count}, dok_level: {request.dok_level}")
     
-    # Create new quiz record first
-    quiz_id = quiz_service.create_new_quiz(request.unit_ids[0], request.user_id, request.prompt, request.dok_level)
+    # Create new quiz record first, load unit contents concurrently
+    quiz_id, main_chunks, subordinate_chunks = await asyncio.gather(
+        run_db(quiz_service.create_new_quiz, request.unit_ids[0], request.user_id, request.prompt, request.dok_level),
+        asyncio.gather(*(run_db(get_unit_main_chunks, unit_id) for unit_id in request.unit_ids)),
+        asyncio.gather(*(run_db(get_unit_subordinate_chunks, unit_id) for unit_id in request.unit_ids)),
+    )
     print(f"Created new quiz with ID: {quiz_id}")
     
     # Lấy nội dung liên quan đến unit (VOCAB, BOOKMAP)
     main_contents = []
     vocabs = []
-    for unit_id in request.unit_ids:
-        unit_chunks, vocab = get_unit_main_chunks(unit_id)
+    for unit_chunks, vocab in main_chunks:
         main_contents.extend(unit_chunks)
         vocabs.append(vocab)
     
     # Lấy VOCAB của 20 unit trước đó, BOOKMAP của 2 unit trước đó, TEXT_CONTENT của unit hiện tại
     vocab_chunks, text_chunks, bookmap_chunks = [], [], []
-    for unit_id in request.unit_ids:
-        vocab_chunk, text_chunk, bookmap_chunk = get_unit_subordinate_chunks(unit_id)
+    for vocab_chunk, text_chunk, bookmap_chunk in subordinate_chunks:
         vocab_chunks.extend(vocab_chunk)
         text_chunks.extend(text_chunk)
         bookmap_chunks.extend(bookmap_chunk)
@@ -114,9 +128,7 @@ async def generate_quiz(request: QuizRequest):
         "Grammar from earlier units: " + ", ".join(bookmap_chunks),
     ]
 
-    # Generate questions from chunks
-    questions_data = await generate_questions_batch(
-        quiz_id=quiz_id,
+    return quiz_id, dict(
         contents=main_contents,
         prior_contents=prior_contents,
         vocabs=vocabs,
@@ -127,6 +139,13 @@ async def generate_quiz(request: QuizRequest):
         custom_prompt=request.prompt,
         dok_level=request.dok_level
     )
+
+@router.post("/generate", response_model=QuizResponse)
+async def generate_quiz(request: QuizRequest):
+    quiz_id, inputs = await _prepare_generation(request)
+
+    # Generate questions from chunks
+    questions_data = await generate_questions_batch(quiz_id=quiz_id, **inputs)
     
     # Convert each question type
     multiple_choice_items, image_items, voice_items, pronunc_items = await asyncio.gather(
@@ -138,7 +157,7 @@ async def generate_quiz(request: QuizRequest):
     
     # Save questions to database
     all_items = multiple_choice_items + image_items + voice_items + pronunc_items
-    quiz_service.save_new_questions(quiz_id, all_items)
+    await run_db(quiz_service.save_new_questions, quiz_id, all_items)
     
     result = QuizResponse(
         quiz_id=quiz_id,  # Add quiz_id to response
@@ -151,6 +170,87 @@ async def generate_quiz(request: QuizRequest):
     print(f"Generated questions - MC: {len(multiple_choice_items)}, Image: {len(image_items)}, Voice: {len(voice_items)}, pronunc: {len(pronunc_items)}")
     return result
 
+# Generator groups -> QuizResponse fields
+STREAM_GROUPS = {
+    "multiple_choice_questions": "multiple_choice_questions",
+    "image_questions": "image_questions",
+    "voice_questions": "voice_questions",
+    "pronunciation_questions": "pronunc_questions",
+}
+STREAM_KEEPALIVE = 15  # seconds between SSE comments while nothing is ready
+
+# Streamed generations keep running (and saving) after the client disconnects
+_stream_tasks = set()
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+async def _stream_generation(quiz_id: int, inputs: Dict[str, Any], started: float, events: asyncio.Queue):
+    """Save each group of questions as it is generated and pass it on to ``events``; None ends the stream."""
+    next_id = 0
+    counts = {field: 0 for field in STREAM_GROUPS.values()}
+    try:
+        async for group, questions in iter_questions_batch(quiz_id=quiz_id, **inputs):
+            items = [
+                item for item in convert_to_quiz_items(questions, next_id)
+                if quiz_service.stored_correct_answer(item)
+            ]
+            next_id += len(questions)
+            question_ids = await run_db(quiz_service.save_new_questions, quiz_id, items)
+            if not question_ids:
+                continue
+            # Send database ids, as GET /api/quiz/{quiz_id} does, so the client can merge later reads
+            for item, question_id in zip(items, question_ids):
+                item.id = question_id
+
+            field = STREAM_GROUPS[group]
+            if not any(counts.values()):
+                QUIZ_TIME_TO_FIRST_QUESTION.labels(question_type=field).observe(time.perf_counter() - started)
+            counts[field] += len(items)
+            events.put_nowait(_sse("questions", {"group": field, "items": items}))
+
+        events.put_nowait(_sse("done", {"quiz_id": quiz_id, "counts": counts}))
+        print(f"Streamed questions for quiz {quiz_id} - {counts}")
+    except Exception as e:
+        print(f"Error streaming quiz {quiz_id}: {e}")
+        events.put_nowait(_sse("error", {"quiz_id": quiz_id, "detail": str(e)}))
+    finally:
+        events.put_nowait(None)
+
+@router.post("/generate/stream")
+async def generate_quiz_stream(request: QuizRequest):
+    """
+    Streaming variant of /generate (text/event-stream).
+    Events: ``quiz`` with the quiz_id, one ``questions`` per saved group
+    (``{"group": <QuizResponse field>, "items": [QuizItem]}``), then ``done``
+    with per-group counts, or ``error``.
+    """
+    started = time.perf_counter()
+    quiz_id, inputs = await _prepare_generation(request)
+
+    events: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_stream_generation(quiz_id, inputs, started, events))
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def _events() -> AsyncIterator[str]:
+        yield _sse("quiz", {"quiz_id": quiz_id})
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield event
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{quiz_id}", response_model=QuizResponse)
 async def get_quiz_by_id(quiz_id: int, lesson_id = None, user_id: str = Query(..., alias="userId")):
     """
@@ -158,24 +258,19 @@ async def get_quiz_by_id(quiz_id: int, lesson_id = None, user_id: str = Query(..
     Returns all questions and metadata for the specified quiz.
     """
     try:
-        conn = get_db()
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            # Lấy visibility và owner
-            cur.execute("""
-                SELECT user_id, visibility FROM user_quizzes WHERE id = %s
-            """, (quiz_id,))
-            row = cur.fetchone()
-            if not row:
-                raise HTTPException(status_code=404, detail="Quiz not found")
+        # Lấy visibility và owner
+        row = await run_db(quiz_service.get_quiz_owner, quiz_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Quiz not found")
 
-            visibility = row["visibility"]
-            quiz_owner = row["user_id"]
+        visibility = row["visibility"]
+        quiz_owner = row["user_id"]
 
-            if visibility is False and user_id != quiz_owner:
-                raise HTTPException(status_code=403, detail="This quiz is not public.")
+        if visibility is False and user_id != quiz_owner:
+            raise HTTPException(status_code=403, detail="This quiz is not public.")
             
         # Get quiz questions from database
-        questions = quiz_service.get_quiz_questions(quiz_id, lesson_id)
+        questions = await run_db(quiz_service.get_quiz_questions, quiz_id, lesson_id)
         if not questions:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
@@ -208,282 +303,206 @@ async def get_quiz_by_id(quiz_id: int, lesson_id = None, user_id: str = Query(..
         print(f"Error fetching quiz {quiz_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e)) 
     
-@router.post("/submit")
-async def submit_quiz(submission: QuizSubmission):
+def grade_answers(answers: List[QuizAnswer], question_map: dict) -> Tuple[list, ...]:
     """
-    Process quiz submission and return results.
+    Score every answer of a submission in one pass over columns.
+    Returns the columns (question_ids, user_answers, is_correct, user_phonemes, scores), one entry per graded question.
     """
-    try:
-        conn = get_db()
-        total_questions = len(submission.answers)
-        correct_answers_score = 0.0
-        
+    # Keep only the last answer per question: a single upsert cannot touch a row twice
+    latest = {ans.questionId: ans for ans in answers if ans.questionId in question_map}
+    question_ids = list(latest)
+    if not question_ids:
+        return [], [], [], [], []
+    questions = [question_map[question_id] for question_id in question_ids]
+    submitted = list(latest.values())
+
+    pronunciation = np.array([q['type'] == "PRONUNCIATION" for q in questions])
+    # ==== OTHER question types: exact match, compared for the whole submission at once ====
+    given = np.array([str(ans.userAnswer) for ans in submitted], dtype=object)
+    expected = np.array([str(q['correct_answer']) for q in questions], dtype=object)
+    scores = (given == expected).astype(float)
+    # ==== PRONUNCIATION questions: phonemes from payload vs stringified JSON of correct phonemes; fractional point ====
+    scores[pronunciation] = [
+        calculate_pronunciation_score(ans.userPhonemes or "", q['correct_answer'])
+        for ans, q, is_pronunciation in zip(submitted, questions, pronunciation) if is_pronunciation
+    ]
+    # Define a threshold for what is "correct"
+    is_correct = np.where(pronunciation, scores >= 0.8, scores == 1.0)
+
+    return (
+        question_ids,
+        [ans.userAnswer for ans in submitted],
+        is_correct.tolist(),
+        [ans.userPhonemes if is_pronunciation else None for ans, is_pronunciation in zip(submitted, pronunciation)],
+        scores.tolist(),
+    )
+
+def save_submission_answers(submission: QuizSubmission) -> Tuple[float, int]:
+    """
+    Grade a submission and upsert all answers into user_answers in one statement.
+    The questions are read first and graded with no connection held; returns (score, graded question count).
+    """
+    question_ids = [ans.questionId for ans in submission.answers]
+    if not question_ids:
+        return 0.0, 0
+
+    with get_db() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             # Get correct answers and types for all questions
-            question_ids = [ans.questionId for ans in submission.answers]
-            placeholders = ','.join(['%s'] * len(question_ids))
-            cur.execute(f"""
-                SELECT id, question_text, correct_answer, type
+            cur.execute("""
+                SELECT id, correct_answer, type
                 FROM quiz_questions 
-                WHERE id IN ({placeholders})
-            """, tuple(question_ids))
+                WHERE id = ANY(%s)
+            """, (question_ids,))
             question_map = {row['id']: row for row in cur.fetchall()}
-            
-            # Process each answer
-            for answer in submission.answers:
-                q = question_map.get(answer.questionId)
-                if not q:
-                    continue
-
-                question_type = q['type']
-                correct_answer = q['correct_answer']
-                user_answer = answer.userAnswer # Answer (text, URL)
-
-                is_correct = False
-                user_phonemes = None
-                
-                # ==== Handle PRONUNCIATION questions ====
-                if question_type == "PRONUNCIATION":
-                    user_phonemes = answer.userPhonemes # Phonemes from payload (for pronunciation)
-                    correct_phonemes = correct_answer  # stringified JSON
-                    score = calculate_pronunciation_score(user_phonemes, correct_phonemes)
-                    correct_answers_score += score  # fractional point
-                    # Define a threshold for what is "correct"
-                    is_correct = score >= 0.8
-
-                # ==== Handle OTHER question types ====
-                else:
-                    is_correct = str(user_answer) == str(correct_answer)
-                    if is_correct:
-                        correct_answers_score += 1.0
-
-                # --- Save answer details to user_answers table ---
-                cur.execute("""
-                    INSERT INTO user_answers (user_id, question_id, user_answer, is_correct, user_phonemes)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (user_id, question_id) DO UPDATE SET
-                        user_answer = EXCLUDED.user_answer,
-                        is_correct = EXCLUDED.is_correct,
-                        user_phonemes = EXCLUDED.user_phonemes,
-                        submitted_at = NOW() -- Optionally track submission time
-                """, (
-                    submission.userId,
-                    answer.questionId,
-                    user_answer, # Ensure user_answer is stored as text (URL for pronunciation)
-                    is_correct,
-                    user_phonemes # Save the submitted phonemes
-                ))
 
-        conn.commit()
-        
-        # === Analyze and comment on user's performance ===
-        quiz_id = submission.quizId
-
-        user_profile_task = practice_service.load_user_profile(quiz_id)
-        prompt_data_task = practice_service.get_prompt_data(quiz_id)
-        answers_data_task = practice_service.get_quiz_answers(quiz_id)
-
-        user_profile, prompt_data, answers_data = await asyncio.gather(
-            user_profile_task, prompt_data_task, answers_data_task
-        )
+    ids, user_answers, is_correct, user_phonemes, scores = grade_answers(submission.answers, question_map)
+    if not ids:
+        return 0.0, 0
 
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            # --- Save answer details to user_answers table ---
+            cur.execute("""
+                INSERT INTO user_answers (user_id, question_id, user_answer, is_correct, user_phonemes)
+                SELECT %s, a.question_id, a.user_answer, a.is_correct, a.user_phonemes
+                FROM unnest(%s::int[], %s::text[], %s::bool[], %s::text[])
+                    AS a(question_id, user_answer, is_correct, user_phonemes)
+                ON CONFLICT (user_id, question_id) DO UPDATE SET
+                    user_answer = EXCLUDED.user_answer,
+                    is_correct = EXCLUDED.is_correct,
+                    user_phonemes = EXCLUDED.user_phonemes,
+                    submitted_at = NOW() -- Optionally track submission time
+            """, (submission.userId, ids, user_answers, is_correct, user_phonemes))
+        conn.commit()
+    return sum(scores), len(ids)
 
-        user_profile = await practice_service.analyze_performance(
-            quiz_id,
-            answers_data,
-            prompt_data,
-            user_profile
-        )
-        print("Successfully analyzed performance")
+@router.post("/submit")
+async def submit_quiz(submission: QuizSubmission):
+    """
+    Process quiz submission and return results.
+    """
+    try:
+        # Total of the graded questions: repeated answers count once, unknown question ids not at all
+        correct_answers_score, total_questions = await run_db(save_submission_answers, submission)
+        
+        # === Analyze and comment on user's performance (background job) ===
+        analysis_status = await analysis_queue.enqueue(submission.quizId)
         
         results = {
             "success": True,
             "totalQuestions": total_questions,
             "correctAnswers": round(correct_answers_score, 1),
-            "quizId": submission.quizId
+            "quizId": submission.quizId,
+            "analysisStatus": analysis_status
         }
         
         return results
         
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Error during quiz submission: {error}")
-        if conn:
-            conn.rollback() # Rollback transaction on error
+        # Uncommitted answers are rolled back when the connection returns to the pool
         # Return an error response
         # Consider more specific error handling
         return JSONResponse(status_code=500, content={"success": False, "error": f"An error occurred processing the submission: {error}"})
 
-    finally:
-        if conn:
-            conn.close()
-
 @router.get("/{quiz_id}/explanations")
 async def get_quiz_with_user_answers(quiz_id: int, user_id: str = Query(..., alias="userId")) -> List[QuizQuestionWithUserAnswer]:
-    conn = get_db()
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                SELECT 
-                    q.id AS question_id,
-                    q.question_text,
-                    q.type,
-                    q.options,
-                    q.correct_answer,
-                    q.explanation,
-                    q.image_url,
-                    q.audio_url,
-                    ua.user_answer,
-                    ua.is_correct,
-                    ua.user_phonemes,
-                    uq.created_at,
-                    uq.user_id AS quiz_owner_id,
-                    uq.visibility,
-                    uq.title AS quiz_title,
-                    c.title AS curriculum_title
-                FROM quiz_questions q
-                LEFT JOIN user_answers ua ON ua.question_id = q.id
-                JOIN user_quizzes uq ON q.quiz_id = uq.id
-                JOIN units u ON uq.unit_id = u.id
-                JOIN curriculums c ON u.curriculum_id = c.id
-                WHERE q.quiz_id = %s
-                ORDER BY q.id
-            """, (quiz_id,))
-            rows = cur.fetchall()
+        rows = await run_db(quiz_service.get_questions_with_user_answers, quiz_id)
             
-            if not rows:
-                raise HTTPException(status_code=404, detail="Quiz not found")
+        if not rows:
+            raise HTTPException(status_code=404, detail="Quiz not found")
 
-            quiz_owner_id = rows[0]["quiz_owner_id"]
-            visibility = rows[0]["visibility"]
+        quiz_owner_id = rows[0]["quiz_owner_id"]
+        visibility = rows[0]["visibility"]
 
-            if visibility is False and user_id != quiz_owner_id:
-                raise HTTPException(status_code=403, detail="This quiz is not public.")
+        if visibility is False and user_id != quiz_owner_id:
+            raise HTTPException(status_code=403, detail="This quiz is not public.")
             
-            return [
-                QuizQuestionWithUserAnswer(
-                    id=i,
-                    questionId=row["question_id"],
-                    questionText=row["question_text"],
-                    type=row["type"],
-                    options=row.get("options"),
-                    correctAnswer=row["correct_answer"],
-                    explanation=row.get("explanation"),
-                    imageUrl=row.get("image_url"),
-                    audioUrl=row.get("audio_url"),
-                    userAnswer=row.get("user_answer"),
-                    isCorrect=row.get("is_correct"),
-                    userPhonemes=row.get("user_phonemes") or "",
-                    curriculumTitle=row.get("curriculum_title"),
-                    quizTitle=row.get("quiz_title"),
-                    createdAt=row.get("created_at").isoformat() if row.get("created_at") else None,
-                    visibility=row.get("visibility"),
-                )
-                for i, row in enumerate(rows, start=1)
-            ]
+        return [
+            QuizQuestionWithUserAnswer(
+                id=i,
+                questionId=row["question_id"],
+                questionText=row["question_text"],
+                type=row["type"],
+                options=row.get("options"),
+                correctAnswer=row["correct_answer"],
+                explanation=row.get("explanation"),
+                imageUrl=row.get("image_url"),
+                audioUrl=row.get("audio_url"),
+                userAnswer=row.get("user_answer"),
+                isCorrect=row.get("is_correct"),
+                userPhonemes=row.get("user_phonemes") or "",
+                curriculumTitle=row.get("curriculum_title"),
+                quizTitle=row.get("quiz_title"),
+                createdAt=row.get("created_at").isoformat() if row.get("created_at") else None,
+                visibility=row.get("visibility"),
+            )
+            for i, row in enumerate(rows, start=1)
+        ]
     except HTTPException as e:
         raise e
     except Exception as e:
         print(f"[ERROR] Failed to fetch quiz explanations: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch quiz explanations")
-    finally:
-        conn.close()
         
 @router.get("/{quiz_id}/get-strength-weakness")
 async def get_assignment_feedback(quiz_id: int):
-    conn = get_db()
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                SELECT strengths, weaknesses
-                FROM user_quizzes
-                WHERE id = %s
-            """, (quiz_id,))
-            row = cur.fetchone()
-            if row:
-                return row
-            else:
-                raise HTTPException(status_code=404, detail="Quiz not found")
+        row, status = await asyncio.gather(
+            run_db(quiz_service.get_strengths_weaknesses, quiz_id),
+            analysis_queue.get_status(quiz_id)
+        )
+        if row:
+            # Clients keep polling while the analysis is "queued" or "running"
+            return {**row, "analysisStatus": status["state"] if status else None}
+        else:
+            raise HTTPException(status_code=404, detail="Quiz not found")
     except Exception as e:
         print(f"[ERROR] Failed to fetch strengths/weaknesses: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch strengths/weaknesses")
-    finally:
-        conn.close()
         
 @router.patch("/{quiz_id}/visibility")
 async def update_quiz_visibility(quiz_id: int, payload: dict):
-    conn = get_db()
     try:
         visibility = payload.get("visibility")
         if visibility is None or not isinstance(visibility, bool):
             raise HTTPException(status_code=400, detail="Invalid visibility value")
 
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                UPDATE user_quizzes
-                SET visibility = %s
-                WHERE id = %s
-                RETURNING id, user_id, unit_id, title, visibility, created_at
-            """, (visibility, quiz_id))
-
-            updated = cur.fetchone()
-            if not updated:
-                raise HTTPException(status_code=404, detail="Quiz not found")
-
-            conn.commit()
-            return updated
+        updated = await run_db(quiz_service.update_visibility, quiz_id, visibility)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+
+        return updated
     except Exception as e:
         print(f"[ERROR] Failed to update quiz visibility: {e}")
         raise HTTPException(status_code=500, detail="Failed to update quiz visibility")
-    finally:
-        conn.close()
 
 @router.patch("/{quiz_id}/rename-title")
 async def rename_quiz_title(quiz_id: int, payload: dict):
-    conn = get_db()
     try:
         new_title = payload.get("title")
         if not new_title or not isinstance(new_title, str):
             raise HTTPException(status_code=400, detail="Invalid or missing title")
 
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                UPDATE user_quizzes
-                SET title = %s
-                WHERE id = %s
-                RETURNING id, user_id, unit_id, title, visibility, created_at
-            """, (new_title, quiz_id))
-
-            updated = cur.fetchone()
-            if not updated:
-                raise HTTPException(status_code=404, detail="Quiz not found")
-
-            conn.commit()
-            return updated
+        updated = await run_db(quiz_service.rename_title, quiz_id, new_title)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+
+        return updated
     except Exception as e:
         print(f"[ERROR] Failed to rename quiz title: {e}")
         raise HTTPException(status_code=500, detail="Failed to rename quiz title")
-    finally:
-        conn.close()
         
 @router.delete("/{quiz_id}")
 async def delete_quiz(quiz_id: int):
-    conn = get_db()
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute("""
-                DELETE FROM user_quizzes
-                WHERE id = %s
-                RETURNING *
-            """, (quiz_id,))
-
-            deleted = cur.fetchone()
-            if not deleted:
-                raise HTTPException(status_code=404, detail="Quiz not found")
+        deleted = await run_db(quiz_service.delete_quiz, quiz_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Quiz not found")
 
-            conn.commit()
-            return deleted
+        return deleted
     except Exception as e:
         print(f"[ERROR] Failed to delete quiz: {e}")
-        raise HTTPException(status_code=500, detail="Failed to delete quiz")
-    finally:
-        conn.close()
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to delete quiz")
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+CPU benchmark of pronunciation ASR throughput at different micro-batch windows.
+Window 0 with batch size 1 is the previous behaviour: one forward pass per upload.
+Clips are synthetic (noise of random length), as only the cost of inference matters.
+Needs transformers and torch; the model is downloaded on first run.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_asr_batching --clips 64 --clients 16 --windows 0 10 30 60
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from backend.integrators.asr import BatchingASR, LocalASR
+
+
+def make_clips(count: int, min_seconds: float, max_seconds: float, rate: int):
+    rng = np.random.default_rng(0)
+    return [
+        (rng.standard_normal(int(rate * rng.uniform(min_seconds, max_seconds))) * 0.1).astype(np.float32)
+        for _ in range(count)
+    ]
+
+
+def run(local: LocalASR, clips, clients: int, max_batch: int, window_ms: float):
+    asr = BatchingASR(local, max_batch=max_batch, window=window_ms / 1000)
+    batch_sizes = []
+    transcribe_batch = local.transcribe_batch
+
+    def counting(batch):
+        batch_sizes.append(len(batch))
+        return transcribe_batch(batch)
+
+    local.transcribe_batch = counting
+    latencies = []
+
+    def upload(samples):
+        started = time.perf_counter()
+        asr.submit(samples).result()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(upload, clips))
+    elapsed = time.perf_counter() - started
+    local.transcribe_batch = transcribe_batch
+
+    print(
+        f"window {window_ms:5.0f} ms  max batch {max_batch:2d}  "
+        f"{len(clips) / elapsed:6.2f} clips/s  mean batch {np.mean(batch_sizes):4.1f}  "
+        f"p50 {np.percentile(latencies, 50):5.2f}s  p95 {np.percentile(latencies, 95):5.2f}s"
+    )
+
+
+def main(args):
+    local = LocalASR()
+    clips = make_clips(args.clips, args.min_seconds, args.max_seconds, local.sampling_rate)
+    local.transcribe_batch(clips[:1])  # warm-up
+    print(f"{args.clips} clips of {args.min_seconds}-{args.max_seconds}s from {args.clients} concurrent clients")
+    run(local, clips, args.clients, max_batch=1, window_ms=0)
+    for window_ms in args.windows:
+        run(local, clips, args.clients, args.max_batch, window_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 10, 30, 60])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    main(parser.parse_args())
@@ -0,0 +1,66 @@
+"""
+Concurrent-request throughput of one worker, blocking psycopg2 vs run_db.
+
+Each simulated request mirrors /api/quiz/submit: three "parallel" reads
+gathered together, then a non-DB await (the LLM call). With blocking calls
+the reads serialize and stall every other request on the event loop.
+
+Usage (from the repository root, DATABASE_URL must be set):
+    python -m backend.benchmarks.bench_db_concurrency --requests 200 --concurrency 50 --query-ms 20
+"""
+import argparse
+import asyncio
+import time
+from backend.database import get_db, run_db
+
+
+def query(delay_s: float):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_sleep(%s)", (delay_s,))
+            cur.fetchall()
+
+
+async def blocking_request(delay_s: float, llm_s: float):
+    async def read():
+        query(delay_s)  # psycopg2 directly inside the coroutine
+    await asyncio.gather(read(), read(), read())
+    await asyncio.sleep(llm_s)
+
+
+async def async_request(delay_s: float, llm_s: float):
+    await asyncio.gather(run_db(query, delay_s), run_db(query, delay_s), run_db(query, delay_s))
+    await asyncio.sleep(llm_s)
+
+
+async def run(handler, total: int, concurrency: int, delay_s: float, llm_s: float) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            await handler(delay_s, llm_s)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=20, help="server-side pg_sleep per query")
+    parser.add_argument("--llm-ms", type=float, default=200, help="simulated non-DB await per request")
+    args = parser.parse_args()
+
+    delay_s, llm_s = args.query_ms / 1000, args.llm_ms / 1000
+    # Warm the pool so both runs start from open connections
+    asyncio.run(run(async_request, 10, 10, 0, 0))
+
+    for name, handler in (("blocking psycopg2", blocking_request), ("run_db executor", async_request)):
+        rps = asyncio.run(run(handler, args.requests, args.concurrency, delay_s, llm_s))
+        print(f"{name:<18} {rps:8.1f} req/s  ({args.requests} requests, concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of image question rendering: the previous one-at-a-time loop vs the
+bounded fan-out of services.image_generator.render_images. The image backend
+is a fake that sleeps, so no API key is used and no file is written.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_image_fanout --images 5 --latency 4 --slots 4
+"""
+import argparse
+import asyncio
+import random
+import time
+from backend.services import image_generator
+from backend.services.image_generator import render_image, render_images
+
+
+def fake_backend(latency: float, jitter: float, fail_rate: float):
+    def render(prompt: str) -> str:
+        time.sleep(max(latency + random.uniform(-jitter, jitter), 0))
+        if random.random() < fail_rate:
+            raise RuntimeError("fake backend failure")
+        return f"/media/images/{abs(hash(prompt))}.png"
+    return render
+
+
+async def sequential(prompts, render):
+    return [await render(p) for p in prompts]
+
+
+async def fan_out(prompts, render):
+    first = None
+    results = {}
+    started = time.perf_counter()
+    async for i, url in render_images(prompts, render=render):
+        first = first or time.perf_counter() - started
+        results[i] = url
+    return first, [results[i] for i in range(len(prompts))]
+
+
+async def main(args):
+    image_generator._image_slots = asyncio.Semaphore(args.slots)
+    backend = fake_backend(args.latency, args.jitter, args.fail_rate)
+
+    async def render(prompt):
+        return await render_image(prompt, timeout=args.timeout, backend=backend)
+
+    prompts = [f"scene {i}" for i in range(args.images)]
+
+    started = time.perf_counter()
+    await sequential(prompts, render)
+    seq = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first, urls = await fan_out(prompts, render)
+    par = time.perf_counter() - started
+    placeholders = sum(url == image_generator.IMAGE_PLACEHOLDER_URL for url in urls)
+
+    print(f"{args.images} images, ~{args.latency}s each, {args.slots} slots, timeout {args.timeout}s")
+    print(f"sequential: {seq:.2f}s")
+    print(f"fan-out:    {par:.2f}s total, first image after {first:.2f}s, {placeholders} placeholder(s)")
+    print(f"speed-up:   {seq / par:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=4.0)
+    parser.add_argument("--jitter", type=float, default=1.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=image_generator.IMAGE_RENDER_TIMEOUT)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of QuizService.save_new_questions: the previous per-row
+INSERT path (existence SELECT + COUNT + N x INSERT RETURNING + COUNT) vs
+the single multi-row INSERT. Every run happens inside a transaction that
+is rolled back, so nothing is left in the database.
+
+Usage (from the repository root, DATABASE_URL must be set):
+    python -m backend.benchmarks.bench_save_questions --sizes 10 100 1000 --repeat 5
+"""
+import argparse
+import statistics
+import time
+from psycopg2.extras import execute_values
+from backend.database import get_db
+from backend.schemas.quiz import QuizItem, QuizOption
+from backend.services.quiz_service import quiz_service, INSERT_QUESTIONS_SQL, INSERT_QUESTIONS_TEMPLATE
+
+
+def make_items(n: int):
+    return [
+        QuizItem(
+            id=i + 1,
+            question=f"Benchmark question {i}: choose the correct word ___",
+            challengeOptions=[QuizOption(id=j + 1, text=f"option {j}", correct=j == 0) for j in range(4)],
+            type="text",
+            explanation="",
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_insert(cur, quiz_id: int, rows):
+    cur.execute("SELECT id, user_id, unit_id FROM user_quizzes WHERE id = %s", (quiz_id,))
+    cur.fetchone()
+    cur.execute("SELECT COUNT(*) FROM quiz_questions WHERE quiz_id = %s", (quiz_id,))
+    cur.fetchone()
+    for row in rows:
+        cur.execute("""
+            INSERT INTO quiz_questions (
+                quiz_id, lesson_id, question_text, type, options,
+                correct_answer, explanation, image_url, audio_url
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, row[1:])
+        cur.fetchone()
+    cur.execute("SELECT COUNT(*) FROM quiz_questions WHERE quiz_id = %s", (quiz_id,))
+    cur.fetchone()
+
+
+def bulk_insert(cur, quiz_id: int, rows):
+    execute_values(cur, INSERT_QUESTIONS_SQL, rows, template=INSERT_QUESTIONS_TEMPLATE, page_size=len(rows), fetch=True)
+
+
+def timed(fn, quiz_id: int, rows, repeat: int) -> float:
+    samples = []
+    with get_db() as conn:
+        for _ in range(repeat):
+            with conn.cursor() as cur:
+                start = time.perf_counter()
+                fn(cur, quiz_id, rows)
+                samples.append(time.perf_counter() - start)
+            conn.rollback()
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quiz-id", type=int, default=None, help="existing quiz to insert into (default: any)")
+    args = parser.parse_args()
+
+    quiz_id = args.quiz_id
+    if quiz_id is None:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM user_quizzes LIMIT 1")
+                row = cur.fetchone()
+        if not row:
+            raise SystemExit("No quiz found; pass --quiz-id")
+        quiz_id = row["id"]
+
+    print(f"{'questions':>9} {'per-row (ms)':>13} {'bulk (ms)':>10} {'speedup':>8}")
+    for n in args.sizes:
+        rows = quiz_service.build_question_rows(quiz_id, make_items(n))
+        legacy = timed(legacy_insert, quiz_id, rows, args.repeat)
+        bulk = timed(bulk_insert, quiz_id, rows, args.repeat)
+        print(f"{n:>9} {legacy * 1000:>13.1f} {bulk * 1000:>10.1f} {legacy / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark of TTS throughput per engine: one clip at a time (the previous
+generate_audio loop) vs one batch per question set. Every run synthesizes into a
+fresh temporary audio store, so nothing is served from cache. The gtts engine
+needs network access; espeak needs the espeak(-ng) library.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_tts --engines gtts espeak --words 20
+"""
+import argparse
+import tempfile
+import time
+from backend.services.audio_store import AudioStore
+from backend.services.voice_quiz_generator import get_tts_engine, _synthesize, _synthesize_batch
+
+WORDS = [
+    "pronunciation", "vegetable", "comfortable", "environment", "chocolate", "library",
+    "February", "Wednesday", "temperature", "interesting", "clothes", "thirteen",
+    "thirty", "world", "rural", "squirrel", "sixth", "months", "colonel", "recipe",
+    "entrepreneur", "specific", "particularly", "hierarchy", "thoroughly", "anemone",
+]
+
+
+def run(engine_name: str, words, batch: bool) -> float:
+    engine = get_tts_engine(engine_name)
+    with tempfile.TemporaryDirectory() as root:
+        store = AudioStore(root=root, max_bytes=0)
+        started = time.perf_counter()
+        if batch:
+            urls = store.get_or_create_many(words, "en", engine.store_voice, _synthesize_batch, engine.extension)
+        else:
+            urls = [store.get_or_create(word, "en", engine.store_voice, _synthesize, engine.extension) for word in words]
+        elapsed = time.perf_counter() - started
+    failed = sum(not url for url in urls)
+    mode = "batch" if batch else "one by one"
+    print(f"{engine_name:7s} {mode:10s} {elapsed:6.2f}s  {len(words) / elapsed:6.1f} clips/s  {failed} failed")
+    return elapsed
+
+
+def main(args):
+    words = [WORDS[i % len(WORDS)] + ("" if i < len(WORDS) else f" {i}") for i in range(args.words)]
+    print(f"{len(words)} clips per run")
+    for engine_name in args.engines:
+        single = run(engine_name, words, batch=False)
+        batched = run(engine_name, words, batch=True)
+        print(f"{engine_name:7s} batch speed-up {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", nargs="+", default=["gtts", "espeak"])
+    parser.add_argument("--words", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+"""
+Classroom-scale load test for POST /api/quiz/submit.
+
+Fires --submissions quiz submissions (one per user, cycling through existing
+users) at a running backend with --concurrency requests in flight and
+reports submissions/sec and latency percentiles.
+
+Usage (from the repository root, DATABASE_URL must point at the same database
+as the server, which is only read to pick users and the quiz's questions):
+    python -m backend.benchmarks.load_submit --base-url http://localhost:8000 --quiz-id 42 \\
+        --submissions 500 --concurrency 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import httpx
+from backend.database import get_db
+
+
+def load_fixture(quiz_id: int, max_users: int):
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, type, options, correct_answer FROM quiz_questions WHERE quiz_id = %s ORDER BY id", (quiz_id,))
+            questions = cur.fetchall()
+            cur.execute("SELECT id FROM users ORDER BY id LIMIT %s", (max_users,))
+            users = [row["id"] for row in cur.fetchall()]
+    if not questions or not users:
+        raise SystemExit("Quiz has no questions or there are no users")
+    return questions, users
+
+
+def make_answers(questions):
+    answers = []
+    for q in questions:
+        if q["type"] == "PRONUNCIATION":
+            answers.append({"questionId": q["id"], "userAnswer": "/media/users/load-test.wav", "userPhonemes": "/həloʊ/"})
+        else:
+            options = [opt["text"] for opt in (q["options"] or [])] or [q["correct_answer"]]
+            answers.append({"questionId": q["id"], "userAnswer": random.choice(options)})
+    return answers
+
+
+async def run(base_url: str, quiz_id: int, questions, users, total: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def submit(client: httpx.AsyncClient, i: int):
+        nonlocal errors
+        payload = {"userId": users[i % len(users)], "quizId": quiz_id, "answers": make_answers(questions)}
+        async with sem:
+            start = time.perf_counter()
+            response = await client.post("/api/quiz/submit", json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(submit(client, i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{total} submissions x {len(questions)} answers, concurrency {concurrency}, {errors} errors")
+    print(f"throughput: {total / elapsed:.1f} submissions/s")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, "
+          f"max {latencies[-1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--quiz-id", type=int, required=True)
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    questions, users = load_fixture(args.quiz_id, args.submissions)
+    asyncio.run(run(args.base_url, args.quiz_id, questions, users, args.submissions, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
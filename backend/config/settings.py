@@ -1,7 +1,6 @@
 import os
 from dotenv import load_dotenv
 from backend.integrators.llm_router import LLMRouter
-from transformers import pipeline
 
 _ = load_dotenv(dotenv_path=".env", override=True)
 
@@ -11,4 +10,4 @@ os.environ["GEMINI_API_KEY"] = os.getenv('GEMINI_API_KEY')
 llm = LLMRouter(model="models/gemini-2.0-flash", temperature=1)
 
 img_model = "gemini-2.0-flash-exp-image-generation"
-asr_model = pipeline(model="vitouphy/wav2vec2-xls-r-300m-timit-phoneme", device='cpu')
+# ASR (wav2vec2 phoneme model) is loaded on first use or served by one shared process: see integrators/asr.py
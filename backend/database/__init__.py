@@ -1,3 +1,3 @@
-from .database import get_db
+from .database import get_db, get_pool, close_pool, run_db
 
-__all__ = ["get_db"]
+__all__ = ["get_db", "get_pool", "close_pool", "run_db"]
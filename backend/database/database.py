@@ -1,8 +1,17 @@
 import os
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from prometheus_client import Gauge
 
 # Load environment variables
 load_dotenv()
@@ -12,21 +21,244 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Pool sizing (per uvicorn worker process)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))        # seconds before an idle connection is reaped
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))  # ping connections idle longer than this
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Unlike ``psycopg2.pool.ThreadedConnectionPool`` this pool blocks when
+    exhausted instead of raising, keeps connections above ``minconn`` open
+    until they have been idle for ``idle_timeout`` seconds, and pings
+    connections that sat idle for a while before handing them out.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        idle_timeout: float,
+        checkout_timeout: float,
+        health_check_after: float,
+        **connect_kwargs,
+    ):
+        self.minconn = minconn
+        self.maxconn = max(maxconn, 1)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.connect_kwargs = connect_kwargs
+
+        self._idle = deque()   # (conn, last_used) - most recently used on the right
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reap_idle(self):
+        """Close connections idle for too long, keeping at least ``minconn`` open. Caller holds the lock."""
+        now = time.monotonic()
+        while len(self._idle) + self._in_use > self.minconn and self._idle:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            conn.close()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError("connection pool is closed")
+            self._reap_idle()
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Timed out after {self.checkout_timeout}s waiting for a database connection"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            else:
+                conn, last_used = None, None
+            self._in_use += 1
+
+        # Network I/O happens outside the lock
+        try:
+            if conn is not None and (
+                conn.closed
+                or (time.monotonic() - last_used > self.health_check_after and not self._is_healthy(conn))
+            ):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, discard: bool = False):
+        if not conn.closed and not discard:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if conn.closed or discard or self._closed:
+                conn.close()
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._reap_idle()
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                conn.close()
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_size": self.maxconn,
+                "size": len(self._idle) + self._in_use,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, creating it on first use (after uvicorn forks its workers)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Parse database URL
+                url = urlparse(DATABASE_URL)
+                _pool = ConnectionPool(
+                    minconn=DB_POOL_MIN_SIZE,
+                    maxconn=DB_POOL_MAX_SIZE,
+                    idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                    checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                    host=url.hostname,
+                    database=url.path[1:],  # Remove leading slash
+                    user=url.username,
+                    password=url.password,
+                    port=url.port or 5432,
+                    cursor_factory=RealDictCursor,
+                    sslmode='require'  # Required for Neon database
+                )
+    return _pool
+
+@contextmanager
 def get_db():
-    """Get database connection"""
+    """Check out a pooled database connection for the duration of the ``with`` block.
+
+    Uncommitted work is rolled back when the connection goes back to the pool.
+    """
+    pool = get_pool()
     try:
-        # Parse database URL
-        url = urlparse(DATABASE_URL)
-        conn = psycopg2.connect(
-            host=url.hostname,
-            database=url.path[1:],  # Remove leading slash
-            user=url.username,
-            password=url.password,
-            port=url.port or 5432,
-            cursor_factory=RealDictCursor,
-            sslmode='require'  # Required for Neon database
-        )
-        return conn
+        conn = pool.getconn()
     except Exception as e:
         print(f"Error connecting to database: {e}")
-        raise e 
\ No newline at end of file
+        raise e
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Connection-level failure: don't hand this connection to anyone else
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # One thread per pooled connection: DB work never queues on the pool
+                # and never competes with the default executor used by to_thread.
+                _executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX_SIZE, thread_name_prefix="db")
+    return _executor
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database function on the bounded DB executor.
+
+    Async handlers must use this instead of calling psycopg2 directly, so a
+    query only parks the coroutine and not the worker's whole event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+def close_pool():
+    global _pool, _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# Prometheus gauges, exposed on /metrics by the app's instrumentator (default registry)
+def _pool_stat(name: str) -> float:
+    return _pool.stats()[name] if _pool is not None else 0
+
+for _stat, _doc in (
+    ("max_size", "Maximum number of connections in the database pool"),
+    ("size", "Open connections in the database pool"),
+    ("in_use", "Database connections currently checked out"),
+    ("idle", "Idle database connections in the pool"),
+    ("waiting", "Threads waiting for a database connection"),
+):
+    Gauge(f"db_pool_{_stat}", _doc).set_function(lambda _stat=_stat: _pool_stat(_stat))
@@ -1,17 +1,52 @@
 # backend/libs/api_key_manager.py
 import os
 import re
-from typing import Iterator, Optional
+import time
+import random
+import hashlib
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 import redis
 from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge
 
 load_dotenv(".env")
 
+# How long a fetched cooldown snapshot is reused before asking Redis again
+API_KEY_STATE_TTL = float(os.getenv("API_KEY_STATE_TTL", "1.0"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))  # seconds; a stuck Redis fails the call instead of hanging it
+
+API_KEY_REQUESTS = Counter("api_key_requests_total", "Requests sent with an API key", ["purpose", "key"])
+API_KEY_COOLDOWNS = Counter("api_key_cooldowns_total", "Times an API key was put on cooldown", ["purpose", "key"])
+API_KEYS_ACTIVE = Gauge("api_keys_active", "API keys not cooling down", ["purpose"])
+
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+def get_redis() -> redis.Redis:
+    """Redis client on the process-wide connection pool (REDIS_URL is "host:port")."""
+    global _redis_pool
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                redis_url = os.environ.get("REDIS_URL", "localhost:6379")
+                host, port = redis_url.split(":")
+                _redis_pool = redis.ConnectionPool(
+                    host=host, port=int(port), decode_responses=True,
+                    socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                )
+    return redis.Redis(connection_pool=_redis_pool)
+
+def key_fingerprint(api_key: str) -> str:
+    """Short stable id for logs and metric labels, so the key itself is never exported."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:8]
+
+
 class APIKeyManager:
-    def __init__(self, key_prefix: str = "GEMINI_API_KEY", purpose: str = "default"):
-        redis_url = os.environ.get("REDIS_URL", "localhost:6379")
-        host, port = redis_url.split(":")
-        self.redis = redis.Redis(host=host, port=int(port), decode_responses=True)
+    def __init__(self, key_prefix: str = "GEMINI_API_KEY", purpose: str = "default", redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or get_redis()
         self.key_prefix = key_prefix
         self.purpose = purpose  # "text" hoặc "image"
         key_pattern = re.compile(f"^{key_prefix}_(\\d+)$")
@@ -31,11 +66,40 @@ class APIKeyManager:
         if not self.all_keys:
             raise ValueError(f"No API keys found for prefix {key_prefix}")
 
+        self._position = {key: i for i, key in enumerate(self.all_keys)}
+        self._fingerprints = {key: key_fingerprint(key) for key in self.all_keys}
+        self._cooldown_keys = [self._cooldown_key(key) for key in self.all_keys]
+
+        # Per-process load on each key; cooldowns and throttle history live in Redis and are shared by all workers
+        self._lock = threading.Lock()
+        self._in_flight = defaultdict(int)
+        self._turn = random.randrange(len(self.all_keys))  # workers start on different keys
+        self._state: Optional[Tuple[List[str], Dict[str, str]]] = None
+        self._state_expires = 0.0
+
     def _cooldown_key(self, api_key: str) -> str:
         return f"cooldown:{self.purpose}:{api_key}"
 
+    def _throttled_key(self) -> str:
+        return f"throttled_at:{self.purpose}"
+
+    def _key_state(self) -> Tuple[List[str], Dict[str, str]]:
+        """Active keys and their last throttle times (by fingerprint), from one pipelined round trip reused for API_KEY_STATE_TTL."""
+        now = time.monotonic()
+        state = self._state
+        if state is not None and now < self._state_expires:
+            return state
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.mget(self._cooldown_keys)
+        pipe.hgetall(self._throttled_key())
+        cooldowns, throttled_at = pipe.execute()
+        active = [key for key, cooldown in zip(self.all_keys, cooldowns) if cooldown is None]
+        API_KEYS_ACTIVE.labels(purpose=self.purpose).set(len(active))
+        self._state, self._state_expires = (active, throttled_at), now + API_KEY_STATE_TTL
+        return self._state
+
     def _active_keys(self):
-        return [key for key in self.all_keys if not self.redis.exists(self._cooldown_key(key))]
+        return self._key_state()[0]
 
     def key_cycle(self) -> Iterator[Optional[str]]:
         while True:
@@ -46,10 +110,65 @@ class APIKeyManager:
                 for k in active:
                     yield k
 
+    def ranked_keys(self) -> List[str]:
+        """Keys not cooling down, best candidate first.
+
+        Prefers the key with the fewest requests in flight from this process,
+        then the one throttled least recently (across all workers), then
+        rotates so that ties do not all land on the same key.
+        """
+        active, throttled_at = self._key_state()
+        if not active:
+            return []
+        n = len(self.all_keys)
+        with self._lock:
+            self._turn = (self._turn + 1) % n
+            return sorted(active, key=lambda k: (
+                self._in_flight[k],
+                float(throttled_at.get(self._fingerprints[k], 0)),
+                (self._position[k] - self._turn) % n,
+            ))
+
+    def pick_key(self) -> Optional[str]:
+        """Choose a key for one request without touching shared state, or None if all keys are cooling down."""
+        ranked = self.ranked_keys()
+        return ranked[0] if ranked else None
+
+    @contextmanager
+    def lease(self, key: str):
+        """Count a request against ``key`` while it is in flight."""
+        API_KEY_REQUESTS.labels(purpose=self.purpose, key=self._fingerprints[key]).inc()
+        with self._lock:
+            self._in_flight[key] += 1
+        try:
+            yield key
+        finally:
+            with self._lock:
+                self._in_flight[key] -= 1
+
     def mark_key_exhausted(self, key: str, cooldown_seconds: int = 90):
         cooldown_key = self._cooldown_key(key)
-        print(f"[Quota-{self.purpose}] Cooling down key {key[:8]} for {cooldown_seconds}s")
-        self.redis.setex(cooldown_key, cooldown_seconds, "1")
+        print(f"[Quota-{self.purpose}] Cooling down key {self._fingerprints[key]} for {cooldown_seconds}s")
+        API_KEY_COOLDOWNS.labels(purpose=self.purpose, key=self._fingerprints[key]).inc()
+        pipe = self.redis.pipeline()
+        pipe.setex(cooldown_key, cooldown_seconds, "1")
+        pipe.hset(self._throttled_key(), self._fingerprints[key], time.time())
+        pipe.execute()
+        self._state = None  # next pick sees the cooldown right away
 
     def get_redis(self):
         return self.redis
+
+
+_managers: Dict[Tuple[str, str], APIKeyManager] = {}
+_managers_lock = threading.Lock()
+
+def get_key_manager(purpose: str = "default", key_prefix: str = "GEMINI_API_KEY") -> APIKeyManager:
+    """Process-wide key manager per (key prefix, purpose): keys are read from the environment once."""
+    manager = _managers.get((key_prefix, purpose))
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get((key_prefix, purpose))
+            if manager is None:
+                manager = _managers[(key_prefix, purpose)] = APIKeyManager(key_prefix=key_prefix, purpose=purpose)
+    return manager
@@ -0,0 +1,320 @@
+# backend/integrators/asr.py
+"""
+Phoneme recognition (wav2vec2) used to score pronunciation.
+
+The transformers pipeline is only loaded when the first recording is scored,
+and concurrent recordings are micro-batched into one forward pass (see
+BatchingASR). With ASR_SOCKET set, workers do not load it at all: they send audio to one
+dedicated process that holds the only copy of the model, instead of every
+uvicorn worker keeping its own.
+
+Run the shared server (from the repository root):
+    python -m backend.integrators.asr --socket /run/asr/asr.sock
+
+Wire format, both directions: 4-byte big-endian header length, JSON header,
+then ``payload_bytes`` bytes of payload. A request is either ``{"path": ...}``
+(a file readable by the server) or ``{"sampling_rate": ...}`` with float32 mono
+samples as payload; the response is ``{"text": ...}`` or ``{"error": ...}``.
+"""
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import asyncio
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple, Union
+from prometheus_client import Counter, Gauge, Histogram
+
+ASR_MODEL = os.getenv("ASR_MODEL", "vitouphy/wav2vec2-xls-r-300m-timit-phoneme")
+ASR_DEVICE = os.getenv("ASR_DEVICE", "cpu")
+ASR_SOCKET = os.getenv("ASR_SOCKET", "")  # Unix socket of the shared ASR server; empty loads the model in-process
+ASR_REQUEST_TIMEOUT = float(os.getenv("ASR_REQUEST_TIMEOUT", "60"))  # seconds
+ASR_MAX_BATCH = int(os.getenv("ASR_MAX_BATCH", "8"))                  # clips per forward pass
+ASR_BATCH_WINDOW_MS = float(os.getenv("ASR_BATCH_WINDOW_MS", "30"))   # how long the first clip waits for company
+
+ASR_REQUESTS = Counter("asr_requests_total", "Recordings sent to speech recognition", ["mode", "result"])
+ASR_SECONDS = Histogram(
+    "asr_request_seconds", "Speech recognition latency as seen by the caller", ["mode"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+ASR_QUEUE_DEPTH = Gauge("asr_queue_depth", "Clips waiting for the next ASR batch")
+ASR_BATCH_SIZE = Histogram("asr_batch_size", "Clips per ASR forward pass", buckets=(1, 2, 4, 8, 16, 32))
+ASR_BATCH_SECONDS = Histogram("asr_batch_seconds", "Duration of one batched ASR forward pass", buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+
+# A file path, or {"raw": float32 samples, "sampling_rate": 16000} as the transformers pipeline accepts
+Audio = Union[str, Path, Dict[str, Any]]
+
+
+class LocalASR:
+    """The wav2vec2 model in this process, loaded on first use."""
+
+    def __init__(self, model: str = ASR_MODEL, device: str = ASR_DEVICE):
+        self.model = model
+        self.device = device
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    from transformers import pipeline
+                    started = time.perf_counter()
+                    self._pipeline = pipeline(model=self.model, device=self.device)
+                    print(f"[ASR] Loaded {self.model} on {self.device} in {time.perf_counter() - started:.1f}s")
+        return self._pipeline
+
+    @property
+    def sampling_rate(self) -> int:
+        return self.pipeline.feature_extractor.sampling_rate
+
+    def load_samples(self, audio: Audio):
+        """Mono float32 samples at the model's sampling rate."""
+        import numpy as np
+        if isinstance(audio, dict):
+            if int(audio["sampling_rate"]) != self.sampling_rate:
+                raise ValueError(f"Expected {self.sampling_rate} Hz audio, got {audio['sampling_rate']} Hz")
+            return np.asarray(audio["raw"], dtype=np.float32)
+        from transformers.pipelines.audio_utils import ffmpeg_read
+        with open(audio, "rb") as f:
+            return ffmpeg_read(f.read(), self.sampling_rate)
+
+    def transcribe_batch(self, batch: List[Any]) -> List[str]:
+        """One padded forward pass over several clips of samples; greedy CTC decoding per clip."""
+        import torch
+        pipe = self.pipeline
+        features = pipe.feature_extractor(
+            batch, sampling_rate=self.sampling_rate, padding=True, return_tensors="pt", return_attention_mask=True,
+        )
+        inputs = {"input_values": features["input_values"].to(pipe.device)}
+        if pipe.feature_extractor.return_attention_mask:
+            inputs["attention_mask"] = features["attention_mask"].to(pipe.device)
+        with torch.inference_mode():
+            ids = pipe.model(**inputs).logits.argmax(dim=-1)
+        # Frames computed from padding would decode to extra phonemes: cut each clip at its own length
+        lengths = pipe.model._get_feat_extract_output_lengths(features["attention_mask"].sum(-1))
+        return [pipe.tokenizer.decode(ids[i, :lengths[i]], skip_special_tokens=True) for i in range(len(batch))]
+
+    def transcribe(self, audio: Audio) -> str:
+        started = time.perf_counter()
+        try:
+            text = self.transcribe_batch([self.load_samples(audio)])[0]
+        except Exception:
+            ASR_REQUESTS.labels(mode="local", result="error").inc()
+            raise
+        ASR_REQUESTS.labels(mode="local", result="ok").inc()
+        ASR_SECONDS.labels(mode="local").observe(time.perf_counter() - started)
+        return text
+
+
+class BatchingASR:
+    """
+    Micro-batching in front of a LocalASR.
+
+    Callers decode their clip in their own thread and queue the samples; one
+    inference thread takes the first waiting clip, keeps collecting for up to
+    ``window`` seconds or ``max_batch`` clips, runs a single forward pass and
+    hands each caller its own transcription.
+    """
+
+    def __init__(self, asr: LocalASR, max_batch: int = ASR_MAX_BATCH, window: float = ASR_BATCH_WINDOW_MS / 1000):
+        self.asr = asr
+        self.model = asr.model
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def pipeline(self):
+        return self.asr.pipeline
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="asr-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, samples) -> Future:
+        """Queue decoded samples; the future resolves to the transcription."""
+        self._ensure_thread()
+        future: Future = Future()
+        self._queue.put((samples, future))
+        ASR_QUEUE_DEPTH.set(self._queue.qsize())
+        return future
+
+    def transcribe(self, audio: Audio) -> str:
+        started = time.perf_counter()
+        try:
+            text = self.submit(self.asr.load_samples(audio)).result(timeout=ASR_REQUEST_TIMEOUT)
+        except Exception:
+            ASR_REQUESTS.labels(mode="batched", result="error").inc()
+            raise
+        ASR_REQUESTS.labels(mode="batched", result="ok").inc()
+        ASR_SECONDS.labels(mode="batched").observe(time.perf_counter() - started)
+        return text
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        ASR_QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(samples, future) for samples, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                texts = self.asr.transcribe_batch([samples for samples, _ in batch])
+            except Exception as e:
+                print(f"[ASR] Batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            ASR_BATCH_SIZE.observe(len(batch))
+            ASR_BATCH_SECONDS.observe(time.perf_counter() - started)
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+
+# === Wire format ===
+def _encode_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    data = json.dumps({**header, "payload_bytes": len(payload)}).encode()
+    return struct.pack(">I", len(data)) + data + payload
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("ASR server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def _recv_frame(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    (length,) = struct.unpack(">I", _recv_exactly(sock, 4))
+    header = json.loads(_recv_exactly(sock, length))
+    return header, _recv_exactly(sock, header.get("payload_bytes", 0))
+
+def _encode_request(audio: Audio) -> bytes:
+    if isinstance(audio, dict):
+        import numpy as np
+        samples = np.ascontiguousarray(audio["raw"], dtype=np.float32)
+        return _encode_frame({"sampling_rate": int(audio["sampling_rate"])}, samples.tobytes())
+    return _encode_frame({"path": str(Path(audio).resolve())})
+
+
+class RemoteASR:
+    """Client of the shared ASR server; one short-lived Unix socket connection per recording."""
+
+    def __init__(self, socket_path: str = ASR_SOCKET, timeout: float = ASR_REQUEST_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def transcribe(self, audio: Audio) -> str:
+        started = time.perf_counter()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(_encode_request(audio))
+                header, _ = _recv_frame(sock)
+            if "error" in header:
+                raise RuntimeError(f"ASR server error: {header['error']}")
+        except Exception:
+            ASR_REQUESTS.labels(mode="remote", result="error").inc()
+            raise
+        ASR_REQUESTS.labels(mode="remote", result="ok").inc()
+        ASR_SECONDS.labels(mode="remote").observe(time.perf_counter() - started)
+        return header["text"]
+
+
+_asr = None
+_asr_lock = threading.Lock()
+
+def get_asr() -> Union[BatchingASR, RemoteASR]:
+    """The ASR backend of this process: the shared server when ASR_SOCKET is set, else a lazily loaded local model."""
+    global _asr
+    if _asr is None:
+        with _asr_lock:
+            if _asr is None:
+                _asr = RemoteASR(ASR_SOCKET) if ASR_SOCKET else BatchingASR(LocalASR())
+    return _asr
+
+
+# === Shared server ===
+class ASRServer:
+    def __init__(self, asr: BatchingASR, socket_path: str):
+        self.asr = asr
+        self.socket_path = socket_path
+
+    @staticmethod
+    def _decode_request(header: Dict[str, Any], payload: bytes) -> Audio:
+        if "path" in header:
+            return header["path"]
+        import numpy as np
+        return {"raw": np.frombuffer(payload, dtype=np.float32), "sampling_rate": header["sampling_rate"]}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    (length,) = struct.unpack(">I", await reader.readexactly(4))
+                except asyncio.IncompleteReadError:
+                    break  # client closed the connection
+                header = json.loads(await reader.readexactly(length))
+                payload = await reader.readexactly(header.get("payload_bytes", 0))
+                try:
+                    audio = self._decode_request(header, payload)
+                    # Decode files off the loop, then queue the samples for the next batch
+                    samples = await loop.run_in_executor(None, self.asr.asr.load_samples, audio)
+                    text = await asyncio.wrap_future(self.asr.submit(samples))
+                    writer.write(_encode_frame({"text": text}))
+                except Exception as e:
+                    print(f"[ASR] Request failed: {e}")
+                    writer.write(_encode_frame({"error": str(e)}))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.asr.pipeline  # load before accepting connections
+        Path(self.socket_path).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # left over from a previous run
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o666)
+        print(f"[ASR] Serving {self.asr.model} on {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared speech recognition server for all backend workers")
+    parser.add_argument("--socket", default=ASR_SOCKET or "/tmp/asr.sock")
+    parser.add_argument("--model", default=ASR_MODEL)
+    parser.add_argument("--device", default=ASR_DEVICE)
+    parser.add_argument("--max-batch", type=int, default=ASR_MAX_BATCH)
+    parser.add_argument("--window-ms", type=float, default=ASR_BATCH_WINDOW_MS)
+    args = parser.parse_args()
+    asr = BatchingASR(LocalASR(args.model, args.device), max_batch=args.max_batch, window=args.window_ms / 1000)
+    asyncio.run(ASRServer(asr, args.socket).serve())
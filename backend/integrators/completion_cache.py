@@ -0,0 +1,130 @@
+# backend/integrators/completion_cache.py
+"""
+Content-addressed cache for deterministic completions.
+
+Entries are keyed by ``sha256(namespace + normalized prompt + sampling params)``
+and stored in two tiers: a per-process LRU (bounded by entry count) in front of
+Redis (shared by all workers, bounded by TTL and a per-value size cap).
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import redis
+from prometheus_client import Counter
+from backend.integrators.api_key_manager import get_redis
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))         # in-process LRU size
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))             # seconds, both tiers
+LLM_CACHE_MAX_VALUE_BYTES = int(os.getenv("LLM_CACHE_MAX_VALUE_BYTES", "65536"))  # larger values are not cached
+
+CACHE_REQUESTS = Counter("llm_cache_requests_total", "Completion cache lookups", ["namespace", "result"])
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    return _whitespace.sub(" ", prompt).strip()
+
+
+class CompletionCache:
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl: int = LLM_CACHE_TTL,
+        max_value_bytes: int = LLM_CACHE_MAX_VALUE_BYTES,
+        prefix: str = "llmcache",
+    ):
+        self._redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_value_bytes = max_value_bytes
+        self.prefix = prefix
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = get_redis()
+        return self._redis
+
+    def make_key(self, namespace: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps(
+            {"prompt": normalize_prompt(prompt), "params": params or {}},
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return f"{self.prefix}:{namespace}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    @staticmethod
+    def _namespace(key: str) -> str:
+        return key.split(":")[1]
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_local(key)
+        return value if value is not None else self._get_redis(key)
+
+    def set(self, key: str, value: str):
+        if self._cacheable(value):
+            self._set_local(key, value, time.time())
+            self._set_redis(key, value)
+
+    # Coroutines use these: the local tier is answered inline, Redis round trips run in a worker thread
+    async def aget(self, key: str) -> Optional[str]:
+        value = self._get_local(key)
+        return value if value is not None else await asyncio.to_thread(self._get_redis, key)
+
+    async def aset(self, key: str, value: str):
+        if self._cacheable(value):
+            self._set_local(key, value, time.time())
+            await asyncio.to_thread(self._set_redis, key, value)
+
+    def _cacheable(self, value: str) -> bool:
+        return bool(value) and len(value.encode()) <= self.max_value_bytes
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] > time.time():
+                self._local.move_to_end(key)
+                CACHE_REQUESTS.labels(namespace=self._namespace(key), result="hit_local").inc()
+                return entry[1]
+            del self._local[key]
+            return None
+
+    def _get_redis(self, key: str) -> Optional[str]:
+        try:
+            value = self.redis.get(key)
+        except redis.RedisError as e:
+            print(f"[LLMCache] Redis unavailable: {e}")
+            value = None
+        if value is None:
+            CACHE_REQUESTS.labels(namespace=self._namespace(key), result="miss").inc()
+            return None
+        CACHE_REQUESTS.labels(namespace=self._namespace(key), result="hit_redis").inc()
+        self._set_local(key, value, time.time())
+        return value
+
+    def _set_redis(self, key: str, value: str):
+        try:
+            self.redis.set(key, value, ex=self.ttl)
+        except redis.RedisError as e:
+            print(f"[LLMCache] Redis unavailable: {e}")
+
+    def _set_local(self, key: str, value: str, now: float):
+        with self._lock:
+            self._local[key] = (now + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+completion_cache = CompletionCache()
@@ -0,0 +1,198 @@
+# backend/integrators/context_cache.py
+"""
+Gemini cached-content handles for long prompt prefixes shared between requests.
+
+Question prompts start with a stable prefix (instructions plus the unit's
+textbook content) that every student of the unit sends. The prefix is uploaded
+once as cached content and later requests send only their own suffix, billed
+at the cached-token rate for the rest. Cached content belongs to the project of
+the API key that created it, so handles are kept per (key, model, prefix);
+they are shared between workers through Redis and forgotten shortly before
+the cache expires on Google's side. A short Redis claim makes sure only one
+worker creates each cache; the others wait for it or send the prefix inline.
+"""
+import os
+import time
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+import redis
+from prometheus_client import Counter
+from google.genai import types as genai_types
+from backend.integrators.api_key_manager import get_redis, key_fingerprint
+from backend.integrators.rate_limiter import estimate_tokens
+
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "1") == "1"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))               # seconds
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))  # API minimum for explicit caches
+GEMINI_CONTEXT_CACHE_WAIT = float(os.getenv("GEMINI_CONTEXT_CACHE_WAIT", "3"))            # seconds to wait for another worker's cache
+_EXPIRY_MARGIN = 120  # seconds; stop handing out a handle this long before it expires
+_CREATE_LOCK_TTL = 60  # seconds; a worker that dies while creating does not block the prefix for longer
+_CREATE_POLL = 0.25    # seconds between reads while another worker creates the cache
+
+CONTEXT_CACHE_REQUESTS = Counter(
+    "gemini_context_cache_requests_total", "Prompt prefix lookups in Gemini cached content", ["result"],
+)
+
+
+class ContextCache:
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        ttl: int = GEMINI_CONTEXT_CACHE_TTL,
+        min_tokens: int = GEMINI_CONTEXT_CACHE_MIN_TOKENS,
+        wait: float = GEMINI_CONTEXT_CACHE_WAIT,
+    ):
+        self._redis = redis_client
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.wait = wait
+        self._local: Dict[str, Tuple[str, float]] = {}  # key -> (cached content name, expires_at)
+        self._locks: Dict[str, List] = {}  # key -> [lock, coroutines using it]; dropped when unused
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = get_redis()
+        return self._redis
+
+    def usable(self, prefix: str) -> bool:
+        # Output tokens are not part of a cache
+        return GEMINI_CONTEXT_CACHE and estimate_tokens(prefix, output_tokens=0) >= self.min_tokens
+
+    @staticmethod
+    def make_key(api_key: str, model: str, prefix: str) -> str:
+        digest = hashlib.sha256(prefix.encode()).hexdigest()[:32]
+        return f"llm:ctxcache:{key_fingerprint(api_key)}:{model.rsplit('/', 1)[-1]}:{digest}"
+
+    async def get(self, client, api_key: str, model: str, prefix: str) -> Optional[str]:
+        """Name of a cached content holding ``prefix`` for this key, created if needed; None to send it inline."""
+        if not self.usable(prefix):
+            CONTEXT_CACHE_REQUESTS.labels(result="skipped").inc()
+            return None
+
+        key = self.make_key(api_key, model, prefix)
+        name = self._get_local(key)
+        if name:
+            CONTEXT_CACHE_REQUESTS.labels(result="hit").inc()
+            return name
+
+        async with self._single_flight(key):
+            name = self._get_local(key)
+            if name:
+                CONTEXT_CACHE_REQUESTS.labels(result="hit").inc()
+                return name
+            name = await self._read_shared_into_local(key)
+            if name:
+                CONTEXT_CACHE_REQUESTS.labels(result="hit").inc()
+                return name
+
+            # Single flight across workers too: only the worker holding the claim creates (and pays for) the cache
+            if not await asyncio.to_thread(self._claim_creation, key):
+                deadline = time.monotonic() + self.wait
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(_CREATE_POLL)
+                    name = await self._read_shared_into_local(key)
+                    if name:
+                        CONTEXT_CACHE_REQUESTS.labels(result="hit").inc()
+                        return name
+                CONTEXT_CACHE_REQUESTS.labels(result="busy").inc()
+                return None  # still being created elsewhere: send this request's prefix inline
+
+            try:
+                cached = await client.aio.caches.create(
+                    model=model,
+                    config=genai_types.CreateCachedContentConfig(
+                        contents=[prefix],
+                        ttl=f"{self.ttl}s",
+                        display_name=key.rsplit(":", 1)[-1],
+                    ),
+                )
+            except Exception as e:
+                # e.g. the prefix is below the model's minimum; the request goes out uncached
+                print(f"[ContextCache] Could not create cached content: {e}")
+                CONTEXT_CACHE_REQUESTS.labels(result="error").inc()
+                await asyncio.to_thread(self._delete_shared, self._creating_key(key))
+                return None
+
+            lifetime = self.ttl - _EXPIRY_MARGIN
+            self._local[key] = (cached.name, time.time() + lifetime)
+            await asyncio.to_thread(self._write_shared, key, cached.name, lifetime)
+            await asyncio.to_thread(self._delete_shared, self._creating_key(key))
+            CONTEXT_CACHE_REQUESTS.labels(result="created").inc()
+            return cached.name
+
+    async def _read_shared_into_local(self, key: str) -> Optional[str]:
+        name, remaining = await asyncio.to_thread(self._read_shared, key)
+        if name and remaining > 0:
+            self._local[key] = (name, time.time() + remaining)
+            return name
+        return None
+
+    async def forget(self, api_key: str, model: str, prefix: str):
+        key = self.make_key(api_key, model, prefix)
+        self._local.pop(key, None)
+        await asyncio.to_thread(self._delete_shared, key)
+
+    @asynccontextmanager
+    async def _single_flight(self, key: str):
+        """One coroutine per key creates the cached content; the lock is dropped once nobody waits on it."""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    # === Redis (sync client): called through asyncio.to_thread ===
+    def _read_shared(self, key: str) -> Tuple[Optional[str], int]:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            name, remaining = pipe.execute()
+            return name, remaining
+        except redis.RedisError as e:
+            print(f"[ContextCache] Redis unavailable: {e}")
+            return None, -1
+
+    @staticmethod
+    def _creating_key(key: str) -> str:
+        return f"{key}:creating"
+
+    def _claim_creation(self, key: str) -> bool:
+        try:
+            return bool(self.redis.set(self._creating_key(key), 1, nx=True, ex=_CREATE_LOCK_TTL))
+        except redis.RedisError as e:
+            print(f"[ContextCache] Redis unavailable: {e}")
+            return True  # nothing to coordinate with: create it here
+
+    def _write_shared(self, key: str, name: str, lifetime: int):
+        try:
+            self.redis.set(key, name, ex=lifetime)
+        except redis.RedisError as e:
+            print(f"[ContextCache] Redis unavailable: {e}")
+
+    def _delete_shared(self, key: str):
+        try:
+            self.redis.delete(key)
+        except redis.RedisError as e:
+            print(f"[ContextCache] Redis unavailable: {e}")
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._local[key]
+            return None
+        return entry[0]
+
+
+context_cache = ContextCache()
@@ -1,75 +1,402 @@
 # backend/integrators/llm_router.py
 import os
-import redis
-import itertools
-from llama_index.llms.gemini import Gemini
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from google import genai
+from google.genai import types as genai_types
+from pydantic import TypeAdapter
+from prometheus_client import Counter
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse, MessageRole
 from backend.integrators.vllm import VllmServer
 from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
 from google.api_core.exceptions import ResourceExhausted
-from requests.exceptions import ConnectionError as RequestsConnectionError
-from backend.integrators.api_key_manager import APIKeyManager
+from backend.integrators.api_key_manager import get_key_manager
+from backend.integrators.rate_limiter import RateLimiter, estimate_tokens
+from backend.integrators.completion_cache import completion_cache, LLM_CACHE_ENABLED
+from backend.integrators.context_cache import context_cache
+from backend.integrators.http_client import get_async_client, LLM_REQUEST_TIMEOUT
+
+# Max in-flight async requests per backend and per process
+LLM_GEMINI_MAX_CONCURRENCY = int(os.getenv("LLM_GEMINI_MAX_CONCURRENCY", "32"))
+LLM_VLLM_MAX_CONCURRENCY = int(os.getenv("LLM_VLLM_MAX_CONCURRENCY", "8"))
+VLLM_API_URL = os.getenv("VLLM_API_URL", "http://localhost:8800/v1/completions")
+# Pass response_schema=<pydantic model or List[model]> to constrain the output to that JSON schema
+# (Gemini response_schema, vLLM guided_json); 0 ignores schemas, for comparing repair rates
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+LLM_STREAM_ATTEMPTS = 5  # same budget as _retry_on_quota; a stream is only retried before its first chunk
+
+# Repair rate = (repaired + failed) / all, compared per mode
+LLM_JSON_OUTPUTS = Counter(
+    "llm_json_outputs_total", "JSON outputs parsed from the LLM by task, decoding mode and outcome",
+    ["task", "mode", "result"],
+)
+
+def json_output_mode() -> str:
+    return "schema" if LLM_STRUCTURED_OUTPUT else "free"
+
+# prompt: billed at the full input rate; cached_prompt: read from cached content
+LLM_TOKENS = Counter("llm_tokens_total", "Gemini tokens by kind", ["kind"])
+
+
+class TokenUsage:
+    """Gemini token counts of the requests made inside ``track_usage()``."""
+
+    def __init__(self):
+        self.prompt = 0   # prompt tokens billed at the full rate
+        self.cached = 0   # prompt tokens read from cached content
+        self.output = 0
+        self.requests = 0
+
+    def add(self, prompt: int, cached: int, output: int):
+        self.prompt += prompt
+        self.cached += cached
+        self.output += output
+        self.requests += 1
+
+
+_token_usage: ContextVar[Optional[TokenUsage]] = ContextVar("llm_token_usage", default=None)
+
+
+@contextmanager
+def track_usage():
+    """Collect token usage of the LLM calls made in this context, including tasks it starts."""
+    usage = TokenUsage()
+    token = _token_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _token_usage.reset(token)
+
+def _is_quota_error(e: Exception) -> bool:
+    return "RESOURCE_EXHAUSTED" in str(e) or "quota" in str(e).lower() or getattr(e, "code", None) == 429
+
+_retry_on_quota = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_random_exponential(min=1, max=5),
+    retry=retry_if_exception_type(ResourceExhausted),
+    reraise=True
+)
 
 class LLMRouter:
+    """Routes completions over a pool of Gemini keys, falling back to vLLM when all are cooling down.
+
+    The router holds no "current key": every request picks a key from the
+    ``APIKeyManager`` and uses that key's own client, so concurrent requests
+    (threads or coroutines) never see a half-swapped client. Quota state is
+    shared between uvicorn workers through the Redis cooldown keys.
+    """
+
     def __init__(self, model: str, temperature: float = 1.0):
-        self.key_manager = APIKeyManager(purpose="text")
+        self.key_manager = get_key_manager(purpose="text")
         self.redis = self.key_manager.get_redis()
-        self.key_iterator = self.key_manager.key_cycle()
-        
+        self.rate_limiter = RateLimiter(self.key_manager)
+
         self.model = model
         self.temperature = temperature
 
-        self._init_llm()
+        self._clients: Dict[str, genai.Client] = {}  # one client per key, created on first use
+        self._clients_lock = threading.Lock()
+        self._vllm: Optional[VllmServer] = None
+        self._limits = {
+            "gemini": asyncio.Semaphore(LLM_GEMINI_MAX_CONCURRENCY),
+            "vllm": asyncio.Semaphore(LLM_VLLM_MAX_CONCURRENCY),
+        }
 
-    def _init_llm(self):
-        while True:
-            next_key = next(self.key_iterator)
-            if next_key is None:
-                print("[Fallback] All Gemini keys exhausted. Switching to vLLM backend.")
-                try:
-                    self.llm = VllmServer(
-                        api_url="http://localhost:8800/v1/completions",
+    def _client_for(self, api_key: str) -> genai.Client:
+        client = self._clients.get(api_key)
+        if client is None:
+            with self._clients_lock:
+                client = self._clients.get(api_key)
+                if client is None:
+                    client = genai.Client(
+                        api_key=api_key,
+                        http_options=genai_types.HttpOptions(
+                            timeout=int(LLM_REQUEST_TIMEOUT * 1000),
+                            httpx_async_client=get_async_client(),
+                        ),
+                    )
+                    self._clients[api_key] = client
+        return client
+
+    @property
+    def vllm(self) -> VllmServer:
+        if self._vllm is None:
+            with self._clients_lock:
+                if self._vllm is None:
+                    self._vllm = VllmServer(
+                        api_url=VLLM_API_URL,
                         max_new_tokens=4096,
                         temperature=0.6
                     )
-                    return
-                except RequestsConnectionError as e:
-                    raise RuntimeError("All Gemini keys exhausted and vLLM is not reachable.") from e
-            else:
+        return self._vllm
+
+    @staticmethod
+    def _fallback_notice(api_key: Optional[str]) -> Optional[str]:
+        if api_key is None:
+            print("[Fallback] All Gemini keys exhausted. Switching to vLLM backend.")
+        return api_key
+
+    def _acquire_key(self, tokens: int) -> Optional[str]:
+        return self._fallback_notice(self.rate_limiter.acquire_blocking(tokens))
+
+    async def _aacquire_key(self, tokens: int) -> Optional[str]:
+        return self._fallback_notice(await self.rate_limiter.acquire(tokens))
+
+    def _record_usage(self, api_key: str, tokens: int, response):
+        usage = getattr(response, "usage_metadata", None)
+        self.rate_limiter.record_usage(api_key, tokens, getattr(usage, "total_token_count", None))
+        self._count_tokens(usage)
+
+    async def _arecord_usage(self, api_key: str, tokens: int, response):
+        usage = getattr(response, "usage_metadata", None)
+        await asyncio.to_thread(self.rate_limiter.record_usage, api_key, tokens, getattr(usage, "total_token_count", None))
+        self._count_tokens(usage)
+
+    @staticmethod
+    def _count_tokens(usage):
+        if usage is None:
+            return
+        cached = usage.cached_content_token_count or 0
+        prompt = (usage.prompt_token_count or 0) - cached
+        output = usage.candidates_token_count or 0
+        LLM_TOKENS.labels(kind="prompt").inc(prompt)
+        LLM_TOKENS.labels(kind="cached_prompt").inc(cached)
+        LLM_TOKENS.labels(kind="output").inc(output)
+        current = _token_usage.get()
+        if current is not None:
+            current.add(prompt, cached, output)
+
+    def _throttled(self, api_key: str):
+        # Cooldown is shared through Redis; the retry picks another key
+        self.rate_limiter.record_throttle(api_key)
+        self.key_manager.mark_key_exhausted(api_key)
+
+    def _handle_error(self, api_key: str, e: Exception):
+        if _is_quota_error(e):
+            self._throttled(api_key)
+            raise ResourceExhausted("Quota exceeded") from e
+        raise e
+
+    async def _ahandle_error(self, api_key: str, e: Exception, prefix: str = ""):
+        if _is_quota_error(e):
+            await asyncio.to_thread(self._throttled, api_key)
+            raise ResourceExhausted("Quota exceeded") from e
+        if prefix and "cache" in str(e).lower():
+            await context_cache.forget(api_key, self.model, prefix)  # deleted or expired early; the retry recreates it
+        raise e
+
+    async def _prefixed(self, api_key: str, prefix: str, prompt: str, kwargs: dict):
+        """Contents and config for ``prompt`` behind ``prefix``, sent as Gemini cached content when it is long enough."""
+        cached = await context_cache.get(self._client_for(api_key), api_key, self.model, prefix) if prefix else None
+        if cached:
+            return prompt, self._generation_config(cached_content=cached, **kwargs)
+        return prefix + prompt, self._generation_config(**kwargs)
+
+    def _generation_config(self, **kwargs) -> genai_types.GenerateContentConfig:
+        schema = kwargs.pop("response_schema", None)
+        if schema is not None and LLM_STRUCTURED_OUTPUT:
+            kwargs.update(response_mime_type="application/json", response_schema=schema)
+        return genai_types.GenerateContentConfig(temperature=kwargs.pop("temperature", self.temperature), **kwargs)
+
+    @staticmethod
+    def _vllm_kwargs(kwargs: dict) -> dict:
+        """Sampling params for vLLM: a response_schema becomes guided decoding on the same JSON schema."""
+        kwargs = dict(kwargs)
+        schema = kwargs.pop("response_schema", None)
+        if schema is not None and LLM_STRUCTURED_OUTPUT:
+            kwargs["guided_json"] = TypeAdapter(schema).json_schema()
+        return kwargs
+
+    @staticmethod
+    def _to_contents(messages: Sequence[ChatMessage]) -> Tuple[Optional[str], List[genai_types.Content]]:
+        system = "\n".join(m.content for m in messages if m.role == MessageRole.SYSTEM)
+        contents = [
+            genai_types.Content(
+                role="model" if m.role == MessageRole.ASSISTANT else "user",
+                parts=[genai_types.Part(text=m.content or "")],
+            )
+            for m in messages if m.role != MessageRole.SYSTEM
+        ]
+        return system or None, contents
+
+    @staticmethod
+    def _to_chat_response(response) -> ChatResponse:
+        return ChatResponse(
+            message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text or ""),
+            raw=response,
+        )
+
+    # === Completion cache: pass cache=False for creative generation that must not repeat ===
+    def _cache_key(self, prompt: str, kwargs: dict, use_cache: bool) -> Optional[str]:
+        if not (use_cache and LLM_CACHE_ENABLED):
+            return None
+        return completion_cache.make_key(self.model, prompt, {"temperature": self.temperature, **kwargs})
+
+    @staticmethod
+    def _messages_prompt(messages: Sequence[ChatMessage]) -> str:
+        return "\n".join(f"{m.role.value}: {m.content or ''}" for m in messages)
+
+    # === prefix="...": a stable shared start of the prompt (see context_cache); only the async API caches it ===
+    def complete(self, prompt: str, cache: bool = True, **kwargs) -> CompletionResponse:
+        prompt = kwargs.pop("prefix", "") + prompt
+        key = self._cache_key(prompt, kwargs, cache)
+        if key and (text := completion_cache.get(key)) is not None:
+            return CompletionResponse(text=text)
+        response = self._complete(prompt, **kwargs)
+        if key:
+            completion_cache.set(key, response.text)
+        return response
+
+    def chat(self, messages: Sequence[ChatMessage], cache: bool = True, **kwargs) -> ChatResponse:
+        key = self._cache_key(self._messages_prompt(messages), kwargs, cache)
+        if key and (text := completion_cache.get(key)) is not None:
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+        response = self._chat(messages, **kwargs)
+        if key:
+            completion_cache.set(key, response.message.content)
+        return response
+
+    async def acomplete(self, prompt: str, cache: bool = True, **kwargs) -> CompletionResponse:
+        key = self._cache_key(prompt, kwargs, cache)
+        if key and (text := await completion_cache.aget(key)) is not None:
+            return CompletionResponse(text=text)
+        response = await self._acomplete(prompt, **kwargs)
+        if key:
+            await completion_cache.aset(key, response.text)
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], cache: bool = True, **kwargs) -> ChatResponse:
+        key = self._cache_key(self._messages_prompt(messages), kwargs, cache)
+        if key and (text := await completion_cache.aget(key)) is not None:
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text))
+        response = await self._achat(messages, **kwargs)
+        if key:
+            await completion_cache.aset(key, response.message.content)
+        return response
+
+    # === Sync API ===
+    @_retry_on_quota
+    def _complete(self, prompt: str, **kwargs) -> CompletionResponse:
+        tokens = estimate_tokens(prompt)
+        api_key = self._acquire_key(tokens)
+        if api_key is None:
+            return self.vllm.complete(prompt, **self._vllm_kwargs(kwargs))  # vLLM không xoay key, lỗi ném luôn
+        with self.key_manager.lease(api_key):
+            try:
+                response = self._client_for(api_key).models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=self._generation_config(**kwargs),
+                )
+            except Exception as e:
+                self._handle_error(api_key, e)
+        self._record_usage(api_key, tokens, response)
+        return CompletionResponse(text=response.text or "", raw=response)
+
+    @_retry_on_quota
+    def _chat(self, messages: Sequence[ChatMessage], **kwargs) -> ChatResponse:
+        tokens = estimate_tokens("".join(m.content or "" for m in messages))
+        api_key = self._acquire_key(tokens)
+        if api_key is None:
+            return self.vllm.chat(messages, **self._vllm_kwargs(kwargs))
+        system, contents = self._to_contents(messages)
+        with self.key_manager.lease(api_key):
+            try:
+                response = self._client_for(api_key).models.generate_content(
+                    model=self.model,
+                    contents=contents,
+                    config=self._generation_config(system_instruction=system, **kwargs),
+                )
+            except Exception as e:
+                self._handle_error(api_key, e)
+        self._record_usage(api_key, tokens, response)
+        return self._to_chat_response(response)
+
+    # === Async API: native coroutines on a shared HTTP client, cancellable by the caller ===
+    @_retry_on_quota
+    async def _acomplete(self, prompt: str, prefix: str = "", **kwargs) -> CompletionResponse:
+        tokens = estimate_tokens(prefix + prompt)
+        api_key = await self._aacquire_key(tokens)
+        if api_key is None:
+            async with self._limits["vllm"]:
+                # vLLM's automatic prefix caching reuses the shared start of the prompt by itself
+                return await self.vllm.acomplete(prefix + prompt, **self._vllm_kwargs(kwargs))
+        async with self._limits["gemini"]:
+            with self.key_manager.lease(api_key):
+                try:
+                    contents, config = await self._prefixed(api_key, prefix, prompt, kwargs)
+                    response = await self._client_for(api_key).aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=config,
+                    )
+                except Exception as e:
+                    await self._ahandle_error(api_key, e, prefix)
+        await self._arecord_usage(api_key, tokens, response)
+        return CompletionResponse(text=response.text or "", raw=response)
+
+    @_retry_on_quota
+    async def _achat(self, messages: Sequence[ChatMessage], **kwargs) -> ChatResponse:
+        tokens = estimate_tokens("".join(m.content or "" for m in messages))
+        api_key = await self._aacquire_key(tokens)
+        if api_key is None:
+            async with self._limits["vllm"]:
+                return await self.vllm.achat(messages, **self._vllm_kwargs(kwargs))
+        system, contents = self._to_contents(messages)
+        async with self._limits["gemini"]:
+            with self.key_manager.lease(api_key):
                 try:
-                    self.current_key = next_key
-                    os.environ["GEMINI_API_KEY"] = self.current_key
-                    self.llm = Gemini(model=self.model, temperature=self.temperature)
-                    return
+                    response = await self._client_for(api_key).aio.models.generate_content(
+                        model=self.model,
+                        contents=contents,
+                        config=self._generation_config(system_instruction=system, **kwargs),
+                    )
                 except Exception as e:
-                    print(f"[Fallback] Gemini key invalid or error occurred: {self.current_key[:8]} - {e}")
-                    self.key_manager.mark_key_exhausted(self.current_key)
-
-    @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_random_exponential(min=1, max=5),
-        retry=retry_if_exception_type(ResourceExhausted),
-        reraise=True
-    )
-    def complete(self, prompt: str, **kwargs):
-        try:
-            return self.llm.complete(prompt, **kwargs)
-        except Exception as e:
-            if isinstance(self.llm, VllmServer):
-                raise e  # vLLM không xoay key, ném luôn
-            if "RESOURCE_EXHAUSTED" in str(e) or "quota" in str(e).lower():
-                self.key_manager.mark_key_exhausted(self.current_key)
-                self._init_llm()
-                raise ResourceExhausted("Quota exceeded")
-            raise e
-
-    def chat(self, *args, **kwargs):
-        try:
-            return self.llm.chat(*args, **kwargs)
-        except Exception as e:
-            if isinstance(self.llm, VllmServer):
-                raise e
-            if "RESOURCE_EXHAUSTED" in str(e) or "quota" in str(e).lower():
-                self.key_manager.mark_key_exhausted(self.current_key)
-                self._init_llm()
-                raise ResourceExhausted("Quota exceeded")
-            raise e
+                    await self._ahandle_error(api_key, e)
+        await self._arecord_usage(api_key, tokens, response)
+        return self._to_chat_response(response)
+
+    async def astream_complete(self, prompt: str, prefix: str = "", **kwargs) -> AsyncIterator[str]:
+        """Yield the completion text in chunks as the model writes it (never cached).
+
+        The vLLM fallback has no async streaming and yields the whole text at once.
+        """
+        tokens = estimate_tokens(prefix + prompt)
+        for attempt in range(LLM_STREAM_ATTEMPTS):
+            api_key = await self._aacquire_key(tokens)
+            if api_key is None:
+                async with self._limits["vllm"]:
+                    response = await self.vllm.acomplete(prefix + prompt, **self._vllm_kwargs(kwargs))
+                yield response.text
+                return
+
+            streamed = False
+            last = None
+            try:
+                async with self._limits["gemini"]:
+                    with self.key_manager.lease(api_key):
+                        try:
+                            contents, config = await self._prefixed(api_key, prefix, prompt, kwargs)
+                            stream = await self._client_for(api_key).aio.models.generate_content_stream(
+                                model=self.model,
+                                contents=contents,
+                                config=config,
+                            )
+                            async for chunk in stream:
+                                last = chunk
+                                if chunk.text:
+                                    streamed = True
+                                    yield chunk.text
+                        except Exception as e:
+                            await self._ahandle_error(api_key, e, prefix)
+            except ResourceExhausted:
+                if streamed or attempt == LLM_STREAM_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(1)
+                continue
+            if last is not None:
+                await self._arecord_usage(api_key, tokens, last)
+            return
@@ -0,0 +1,165 @@
+# backend/integrators/rate_limiter.py
+"""
+Client-side RPM/TPM limiter for API keys, shared by all uvicorn workers through Redis.
+
+Usage per key is counted in one-minute buckets (hash ``ratelimit:{purpose}:{key}:{minute}``
+with fields ``req`` and ``tok``) and estimated as a sliding window:
+``previous_bucket * (1 - elapsed_fraction) + current_bucket``. A request reserves
+its slot before it is sent; if no key has headroom the caller waits instead of
+collecting a 429. When a 429 happens anyway the key's limit is lowered to what it
+actually sustained and recovers after LLM_RATE_LIMIT_LEARN_TTL.
+"""
+import os
+import time
+import random
+import asyncio
+from typing import Optional, Tuple
+from prometheus_client import Counter, Histogram
+from backend.integrators.api_key_manager import APIKeyManager, key_fingerprint
+
+LLM_KEY_RPM = int(os.getenv("LLM_KEY_RPM", "15"))            # requests per minute per key
+LLM_KEY_TPM = int(os.getenv("LLM_KEY_TPM", "1000000"))       # tokens per minute per key
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "30"))   # seconds a request may wait for headroom
+LLM_RATE_LIMIT_LEARN_TTL = int(os.getenv("LLM_RATE_LIMIT_LEARN_TTL", "3600"))  # how long a learned lower limit holds
+LLM_EST_OUTPUT_TOKENS = int(os.getenv("LLM_EST_OUTPUT_TOKENS", "1024"))
+
+RATE_LIMIT_WAITS = Counter("llm_rate_limit_waits_total", "Requests that waited for rate limit headroom", ["purpose"])
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "llm_rate_limit_wait_seconds", "Time spent waiting for rate limit headroom", ["purpose"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 30, 60),
+)
+RATE_LIMIT_LEARNED = Counter("llm_rate_limit_learned_total", "Key limits lowered after an unexpected 429", ["purpose", "key"])
+
+
+def estimate_tokens(text: str, output_tokens: int = LLM_EST_OUTPUT_TOKENS) -> int:
+    """Rough token count of a request: ~4 characters per token plus the expected output."""
+    return len(text) // 4 + output_tokens
+
+
+class RateLimiter:
+    def __init__(self, key_manager: APIKeyManager, rpm: int = LLM_KEY_RPM, tpm: int = LLM_KEY_TPM, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT):
+        self.key_manager = key_manager
+        self.redis = key_manager.get_redis()
+        self.purpose = key_manager.purpose
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+
+    # === Keys ===
+    def _bucket_key(self, api_key: str, bucket: int) -> str:
+        return f"ratelimit:{self.purpose}:{key_fingerprint(api_key)}:{bucket}"
+
+    def _learned_key(self, api_key: str) -> str:
+        return f"ratelimit:{self.purpose}:{key_fingerprint(api_key)}:rpm"
+
+    @staticmethod
+    def _window(now: float) -> Tuple[int, float]:
+        bucket = int(now // 60)
+        return bucket, (now % 60) / 60
+
+    @staticmethod
+    def _sliding(prev: Optional[str], cur: Optional[str], elapsed: float) -> float:
+        return float(prev or 0) * (1 - elapsed) + float(cur or 0)
+
+    def _rpm_for(self, learned: Optional[str]) -> int:
+        return min(self.rpm, int(learned)) if learned else self.rpm
+
+    # === Reservation ===
+    def _reserve(self, api_key: str, tokens: int, now: float) -> bool:
+        """Count one request of ``tokens`` against ``api_key`` if it stays under both limits."""
+        bucket, elapsed = self._window(now)
+        cur_key = self._bucket_key(api_key, bucket)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(cur_key, "req", 1)
+        pipe.hincrby(cur_key, "tok", tokens)
+        pipe.expire(cur_key, 120)
+        pipe.hmget(self._bucket_key(api_key, bucket - 1), "req", "tok")
+        pipe.get(self._learned_key(api_key))
+        req, tok, _, (prev_req, prev_tok), learned = pipe.execute()
+
+        # The increments are atomic, so concurrent workers never admit more than the limit together
+        if self._sliding(prev_req, req, elapsed) <= self._rpm_for(learned) and self._sliding(prev_tok, tok, elapsed) <= self.tpm:
+            return True
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(cur_key, "req", -1)
+        pipe.hincrby(cur_key, "tok", -tokens)
+        pipe.execute()
+        return False
+
+    def try_acquire(self, tokens: int) -> Tuple[Optional[str], bool]:
+        """Reserve a slot on the best key with headroom.
+
+        Returns ``(key, False)`` on success, ``(None, True)`` when keys exist but
+        all are at their limit (worth waiting), and ``(None, False)`` when every
+        key is cooling down.
+        """
+        ranked = self.key_manager.ranked_keys()
+        if not ranked:
+            return None, False
+        now = time.time()
+        for api_key in ranked:
+            if self._reserve(api_key, tokens, now):
+                return api_key, False
+        return None, True
+
+    def _next_poll(self) -> float:
+        # Capacity frees up continuously as the previous bucket slides out; poll with jitter
+        return 0.5 + random.random()
+
+    async def acquire(self, tokens: int) -> Optional[str]:
+        """Wait (without blocking the loop) until some key has headroom; None means fall back to another backend.
+
+        The Redis round trips run in a worker thread, so a slow Redis does not stall the other requests.
+        """
+        started = time.monotonic()
+        waited = False
+        while True:
+            api_key, should_wait = await asyncio.to_thread(self.try_acquire, tokens)
+            if not should_wait or time.monotonic() - started >= self.max_wait:
+                break
+            if not waited:
+                RATE_LIMIT_WAITS.labels(purpose=self.purpose).inc()
+                waited = True
+            await asyncio.sleep(self._next_poll())
+        if waited:
+            RATE_LIMIT_WAIT_SECONDS.labels(purpose=self.purpose).observe(time.monotonic() - started)
+        if api_key or not should_wait:
+            return api_key
+        return await asyncio.to_thread(self.key_manager.pick_key)
+
+    def acquire_blocking(self, tokens: int) -> Optional[str]:
+        """Same as ``acquire`` for callers running in a worker thread."""
+        started = time.monotonic()
+        waited = False
+        while True:
+            api_key, should_wait = self.try_acquire(tokens)
+            if not should_wait or time.monotonic() - started >= self.max_wait:
+                break
+            if not waited:
+                RATE_LIMIT_WAITS.labels(purpose=self.purpose).inc()
+                waited = True
+            time.sleep(self._next_poll())
+        if waited:
+            RATE_LIMIT_WAIT_SECONDS.labels(purpose=self.purpose).observe(time.monotonic() - started)
+        return api_key if api_key else (self.key_manager.pick_key() if should_wait else None)
+
+    # === Feedback ===
+    def record_usage(self, api_key: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Replace the token estimate reserved for a request by its real usage."""
+        if actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        cur_key = self._bucket_key(api_key, self._window(time.time())[0])
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(cur_key, "tok", actual_tokens - estimated_tokens)
+        pipe.expire(cur_key, 120)
+        pipe.execute()
+
+    def record_throttle(self, api_key: str):
+        """A 429 slipped through: learn that this key sustains less than what we sent in the last minute."""
+        bucket, elapsed = self._window(time.time())
+        prev_req, cur_req = self.redis.hget(self._bucket_key(api_key, bucket - 1), "req"), self.redis.hget(self._bucket_key(api_key, bucket), "req")
+        sustained = int(self._sliding(prev_req, cur_req, elapsed) * 0.9)
+        if sustained >= 1:
+            self.redis.set(self._learned_key(api_key), min(sustained, self.rpm), ex=LLM_RATE_LIMIT_LEARN_TTL)
+            RATE_LIMIT_LEARNED.labels(purpose=self.purpose, key=key_fingerprint(api_key)).inc()
+            print(f"[RateLimit-{self.purpose}] Key {key_fingerprint(api_key)} limited to {min(sustained, self.rpm)} RPM")
@@ -23,7 +23,8 @@ from llama_index.core.base.llms.generic_utils import (
 )
 from llama_index.core.llms.llm import LLM
 from llama_index.core.types import BaseOutputParser, PydanticProgramMode
-from .utils import get_response, post_http_request
+from .utils import get_response, post_http_request, async_post_http_request
+from ..http_client import get_async_client
 import atexit
 
 
@@ -469,7 +470,23 @@ class VllmServer(Vllm):
         self, prompt: str, formatted: bool = False, **kwargs: Any
     ) -> CompletionResponse:
         kwargs = kwargs if kwargs else {}
-        return self.complete(prompt, **kwargs)
+        params = {**self._model_kwargs, **kwargs}
+
+        # build sampling parameters
+        sampling_params = dict(**params)
+        sampling_params["prompt"] = prompt
+        response = await async_post_http_request(get_async_client(), self.api_url, sampling_params)
+        output = get_response(response)
+
+        return CompletionResponse(text=output)
+
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        completion_response = await self.acomplete(prompt, formatted=True, **kwargs)
+        return completion_response_to_chat_response(completion_response)
 
     @llm_completion_callback()
     async def astream_complete(
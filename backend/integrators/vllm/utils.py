@@ -1,6 +1,7 @@
 import json
 from typing import Iterable, List
 
+import httpx
 import requests
 
 
@@ -25,3 +26,14 @@ def get_streaming_response(response: requests.Response) -> Iterable[List[str]]:
         if chunk:
             data = json.loads(chunk.decode("utf-8"))
             yield data["choices"][0]['text']
+
+
+async def async_post_http_request(
+    client: httpx.AsyncClient, api_url: str, sampling_params: dict = {}
+) -> httpx.Response:
+    headers = {"User-Agent": "Test Client"}
+    sampling_params["stream"] = False
+
+    response = await client.post(api_url, headers=headers, json=sampling_params)
+    response.raise_for_status()
+    return response
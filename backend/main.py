@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from prometheus_fastapi_instrumentator import Instrumentator, metrics
 from prometheus_fastapi_instrumentator.metrics import (
@@ -9,15 +9,47 @@ from prometheus_fastapi_instrumentator.metrics import (
     response_size,
     requests
 )
+from contextlib import asynccontextmanager
 import sys, os
+import asyncio
+import threading
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.api.router import api_router
+from backend.database import close_pool
+from backend.services.analysis_queue import analysis_queue
+from backend.integrators.http_client import close_async_client
+from backend.services.audio_store import audio_store
+from backend.services.audio_pool import audio_pool
+from backend.services.voice_quiz_generator import regenerate_audio, run_media, warm_up_phoneme_lexicon
+from backend.services.unit_content_cache import unit_content_cache
 
 # Thêm thư mục gốc vào sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background worker for performance analysis jobs queued by /api/quiz/submit
+    await analysis_queue.start()
+    # Index existing audio clips once so lookups and eviction accounting stay in memory
+    await asyncio.to_thread(audio_store.load_index)
+    # Fill the phoneme lexicon with the curriculum vocabulary in the background
+    warm_up = asyncio.create_task(run_media(warm_up_phoneme_lexicon))
+    # Load the curriculum's unit contents once, so quiz generation does not query them
+    prewarm = threading.Thread(target=unit_content_cache.prewarm, name="unit-cache-prewarm", daemon=True)
+    prewarm.start()
+    yield
+    warm_up.cancel()
+    # The prewarm thread cannot be cancelled: stop it between batches and wait for it before the pool closes
+    unit_content_cache.stop_prewarm()
+    await asyncio.to_thread(prewarm.join)
+    await analysis_queue.stop()
+    await close_async_client()
+    audio_pool.shutdown()
+    # Release pooled database connections of this worker
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -28,6 +60,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Audio clips may have been evicted from the store: re-synthesize them on demand.
+# Registered before the /media mount so it takes precedence for this path.
+@app.get("/media/audio/{filename}", include_in_schema=False)
+def get_audio(filename: str):
+    path = regenerate_audio(filename)
+    if path is None:
+        path = audio_store.root / os.path.basename(filename)  # clips from the old naming scheme
+        if not path.is_file():
+            return JSONResponse({"detail": "Not Found"}, status_code=status.HTTP_404_NOT_FOUND)
+    return FileResponse(path)
+
 # Mount media directory for static file serving
 app.mount("/media", StaticFiles(directory="media"), name="media")
 
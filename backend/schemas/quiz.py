@@ -1,5 +1,5 @@
 from enum import Enum
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -26,6 +26,39 @@ class QuizItem(BaseModel):
     audioUrl: Optional[str] = None
     correctAnswer: Optional[str] = None
 
+class GeneratedQuestion(BaseModel):
+    """One question object as the LLM writes it, before it becomes a QuizItem"""
+    question: str = Field(min_length=1)
+    options: List[str] = []  # empty for pronunciation questions
+    correct_answer: str = Field(min_length=1)
+    type: Optional[str] = None
+    image_description: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_correct_answer(self):
+        # QuizItem marks the correct option by equality; without a match the question is never saved
+        if self.options and self.correct_answer not in self.options:
+            raise ValueError("correct_answer is not one of the options")
+        return self
+
+# Output schemas for schema-constrained generation (LLMRouter response_schema).
+# No defaults or validators: they become the JSON schema the model must follow.
+class ChoiceQuestionOutput(BaseModel):
+    question: str
+    options: List[str]
+    correct_answer: str
+
+class ImageQuestionOutput(ChoiceQuestionOutput):
+    image_description: str
+
+class PronunciationQuestionOutput(BaseModel):
+    question: str
+    correct_answer: str
+
+class PerformanceAnalysisOutput(BaseModel):
+    strengths: List[str]
+    weaknesses: List[str]
+
 class QuizRequest(BaseModel):
     user_id: str
     unit_ids: List[int]
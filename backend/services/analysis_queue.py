@@ -0,0 +1,307 @@
+# backend/services/analysis_queue.py
+"""
+Redis-backed background queue for quiz performance analysis.
+
+Submitting a quiz only enqueues the quiz id; a worker running inside every
+uvicorn process picks it up, calls the analyzer (an LLM call) and records the
+job status so clients can poll ``/api/quiz/{quiz_id}/get-strength-weakness``.
+
+Redis layout (all keys prefixed with ``analysis:``):
+    queue                 list of quiz ids waiting to be analysed
+    pending:{quiz_id}     marker set while a job is queued -> dedups resubmissions
+    status:{quiz_id}      hash: state, attempts, enqueued_at, started_at, finished_at, error
+    processing:{worker}   jobs taken by a worker but not finished yet
+    worker:{worker}       heartbeat of a live worker (expires when the process dies)
+    workers               set of worker ids, used to requeue jobs of dead workers
+"""
+import os
+import time
+import socket
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError, WatchError
+from prometheus_client import Counter, Gauge, Histogram
+
+ANALYSIS_WORKER_CONCURRENCY = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "1"))  # jobs run at once per process
+ANALYSIS_JOB_TIMEOUT = float(os.getenv("ANALYSIS_JOB_TIMEOUT", "180"))           # seconds before a job is abandoned
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+ANALYSIS_STATUS_TTL = int(os.getenv("ANALYSIS_STATUS_TTL", str(24 * 3600)))      # how long job status stays pollable
+ANALYSIS_HEARTBEAT_TTL = int(os.getenv("ANALYSIS_HEARTBEAT_TTL", "30"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+ANALYSIS_QUEUE_DEPTH = Gauge("analysis_queue_depth", "Performance analysis jobs waiting in the queue")
+ANALYSIS_JOBS = Counter("analysis_jobs_total", "Finished performance analysis jobs", ["result"])
+ANALYSIS_WAIT_SECONDS = Histogram(
+    "analysis_job_wait_seconds", "Time a performance analysis job spent queued",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+ANALYSIS_RUN_SECONDS = Histogram(
+    "analysis_job_duration_seconds", "Time spent running a performance analysis job",
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180),
+)
+
+Analyzer = Callable[[int], Awaitable[object]]
+
+
+async def _default_analyzer(quiz_id: int):
+    # Imported lazily: the practice service pulls in the LLM stack
+    from backend.services.practice_service import practice_service
+    return await practice_service.run_performance_analysis(quiz_id)
+
+
+def _redis_from_env() -> aioredis.Redis:
+    redis_url = os.environ.get("REDIS_URL", "localhost:6379")
+    host, port = redis_url.split(":")
+    return aioredis.Redis(host=host, port=int(port), decode_responses=True)
+
+
+class AnalysisQueue:
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        analyzer: Optional[Analyzer] = None,
+        prefix: str = "analysis",
+        concurrency: int = ANALYSIS_WORKER_CONCURRENCY,
+        job_timeout: float = ANALYSIS_JOB_TIMEOUT,
+        max_attempts: int = ANALYSIS_MAX_ATTEMPTS,
+        heartbeat_ttl: int = ANALYSIS_HEARTBEAT_TTL,
+        poll_timeout: float = 1.0,
+    ):
+        self._redis = redis_client
+        self.analyzer = analyzer or _default_analyzer
+        self.prefix = prefix
+        self.concurrency = max(concurrency, 1)
+        self.job_timeout = job_timeout
+        self.max_attempts = max(max_attempts, 1)
+        self.heartbeat_ttl = heartbeat_ttl
+        self.poll_timeout = poll_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._tasks = []
+        self._local_jobs = set()  # fallback jobs run in-process while Redis is unreachable
+        self._stopping = asyncio.Event()
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            self._redis = _redis_from_env()
+        return self._redis
+
+    # === Keys ===
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    @property
+    def _queue_key(self) -> str:
+        return self._key("queue")
+
+    def _processing_key(self, worker_id: str) -> str:
+        return self._key("processing", worker_id)
+
+    # === Producer side ===
+    async def enqueue(self, quiz_id: int) -> str:
+        """Queue an analysis of ``quiz_id`` unless one is already waiting. Returns the job state.
+
+        A job that is already running does not absorb the new submission: the
+        running analysis may have read the answers before they were saved.
+        """
+        pending = self._key("pending", quiz_id)
+        try:
+            # The marker and the job are written in one transaction: either both exist or neither does
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(pending)
+                if await pipe.exists(pending):
+                    return QUEUED
+                pipe.multi()
+                pipe.set(pending, self.worker_id, ex=ANALYSIS_STATUS_TTL)
+                pipe.delete(self._key("status", quiz_id))
+                pipe.hset(self._key("status", quiz_id), mapping={
+                    "state": QUEUED,
+                    "attempts": 0,
+                    "enqueued_at": time.time(),
+                })
+                pipe.expire(self._key("status", quiz_id), ANALYSIS_STATUS_TTL)
+                pipe.lpush(self._queue_key, quiz_id)
+                pipe.llen(self._queue_key)
+                *_, depth = await pipe.execute()
+            ANALYSIS_QUEUE_DEPTH.set(depth)
+            return QUEUED
+        except WatchError:
+            # Another request queued this quiz between our check and the write
+            return QUEUED
+        except RedisError as e:
+            # Losing the feedback is worse than losing durability: analyse in this process
+            print(f"[AnalysisQueue] Redis unavailable, analysing quiz {quiz_id} in-process: {e}")
+            task = asyncio.create_task(self._run_locally(quiz_id))
+            self._local_jobs.add(task)
+            task.add_done_callback(self._local_jobs.discard)
+            return RUNNING
+
+    async def get_status(self, quiz_id: int) -> Optional[Dict[str, str]]:
+        """Return the status hash of the latest analysis job of a quiz, or None if unknown."""
+        try:
+            status = await self.redis.hgetall(self._key("status", quiz_id))
+        except RedisError as e:
+            print(f"[AnalysisQueue] Failed to read status of quiz {quiz_id}: {e}")
+            return None
+        return status or None
+
+    async def _run_locally(self, quiz_id: int):
+        try:
+            await asyncio.wait_for(self.analyzer(quiz_id), self.job_timeout)
+            ANALYSIS_JOBS.labels(result=DONE).inc()
+        except Exception as e:
+            ANALYSIS_JOBS.labels(result=FAILED).inc()
+            print(f"[AnalysisQueue] In-process analysis of quiz {quiz_id} failed: {e}")
+
+    # === Worker side ===
+    async def start(self):
+        """Start the heartbeat and consumer tasks of this process."""
+        if self._tasks:
+            return
+        self._stopping.clear()
+        try:
+            await self._heartbeat()
+            await self.requeue_orphans()
+        except RedisError as e:
+            print(f"[AnalysisQueue] Redis unavailable at startup, worker will keep retrying: {e}")
+        self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._consume_loop()))
+        print(f"[AnalysisQueue] Worker {self.worker_id} started with {self.concurrency} consumer(s)")
+
+    async def stop(self):
+        """Stop consuming and hand the jobs this worker had in flight back to the queue."""
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            # Hand unfinished jobs back right away instead of waiting for the heartbeat to expire
+            await self._requeue_worker(self.worker_id)
+            await self.redis.delete(self._key("worker", self.worker_id))
+        except RedisError:
+            pass
+
+    async def _heartbeat(self):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self._key("worker", self.worker_id), 1, ex=self.heartbeat_ttl)
+            pipe.sadd(self._key("workers"), self.worker_id)
+            pipe.llen(self._queue_key)
+            *_, depth = await pipe.execute()
+        ANALYSIS_QUEUE_DEPTH.set(depth)
+
+    async def _heartbeat_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await self._heartbeat()
+                await self.requeue_orphans()
+            except RedisError as e:
+                print(f"[AnalysisQueue] Heartbeat failed: {e}")
+            await asyncio.sleep(max(self.heartbeat_ttl / 3, 0.1))
+
+    async def requeue_orphans(self) -> int:
+        """Move jobs held by workers whose heartbeat expired back to the queue."""
+        moved = 0
+        for worker_id in await self.redis.smembers(self._key("workers")):
+            if worker_id == self.worker_id or await self.redis.exists(self._key("worker", worker_id)):
+                continue
+            moved += await self._requeue_worker(worker_id)
+            await self.redis.srem(self._key("workers"), worker_id)
+        return moved
+
+    async def _requeue_worker(self, worker_id: str) -> int:
+        processing = self._processing_key(worker_id)
+        moved = 0
+        while True:
+            # Each job is moved back together with its pending marker, so a resubmission cannot queue a twin
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(processing)
+                quiz_id = await pipe.lindex(processing, -1)
+                if quiz_id is None:
+                    break
+                pending = self._key("pending", quiz_id)
+                await pipe.watch(pending)
+                # A resubmission may have queued the quiz again after this worker took it
+                already_queued = await pipe.lpos(self._queue_key, quiz_id) is not None
+                pipe.multi()
+                pipe.rpop(processing)
+                if not already_queued:
+                    pipe.rpush(self._queue_key, quiz_id)
+                    pipe.set(pending, self.worker_id, ex=ANALYSIS_STATUS_TTL)
+                    pipe.hset(self._key("status", quiz_id), "state", QUEUED)
+                try:
+                    await pipe.execute()
+                except WatchError:
+                    continue
+            if not already_queued:
+                moved += 1
+        if moved:
+            print(f"[AnalysisQueue] Requeued {moved} job(s) of worker {worker_id}")
+        return moved
+
+    async def _consume_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await self.process_next(timeout=self.poll_timeout)
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                print(f"[AnalysisQueue] Redis error in worker: {e}")
+                await asyncio.sleep(1)
+
+    async def process_next(self, timeout: float = 0) -> Optional[str]:
+        """Take one job off the queue and run it. Returns its final state, or None if the queue was empty.
+
+        ``timeout`` is how long to block waiting for a job; 0 returns immediately.
+        """
+        processing = self._processing_key(self.worker_id)
+        if timeout:
+            raw = await self.redis.blmove(self._queue_key, processing, timeout, "RIGHT", "LEFT")
+        else:
+            raw = await self.redis.lmove(self._queue_key, processing, "RIGHT", "LEFT")
+        if raw is None:
+            return None
+
+        quiz_id = int(raw)
+        status_key = self._key("status", quiz_id)
+        started = time.time()
+        # From here on a new submission must queue a fresh job
+        await self.redis.delete(self._key("pending", quiz_id))
+        enqueued_at = await self.redis.hget(status_key, "enqueued_at")
+        if enqueued_at:
+            ANALYSIS_WAIT_SECONDS.observe(max(started - float(enqueued_at), 0))
+        attempts = await self.redis.hincrby(status_key, "attempts", 1)
+        await self.redis.hset(status_key, mapping={"state": RUNNING, "started_at": started})
+
+        try:
+            await asyncio.wait_for(self.analyzer(quiz_id), self.job_timeout)
+            state, error = DONE, ""
+        except asyncio.CancelledError:
+            # Shutting down: leave the job in the processing list so it gets requeued
+            raise
+        except Exception as e:
+            print(f"[AnalysisQueue] Analysis of quiz {quiz_id} failed (attempt {attempts}): {e!r}")
+            state, error = FAILED, repr(e)
+        ANALYSIS_RUN_SECONDS.observe(time.time() - started)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if state == FAILED and attempts < self.max_attempts:
+                state = QUEUED
+                pipe.set(self._key("pending", quiz_id), self.worker_id, ex=ANALYSIS_STATUS_TTL)
+                pipe.lpush(self._queue_key, quiz_id)
+            else:
+                ANALYSIS_JOBS.labels(result=state).inc()
+            pipe.hset(status_key, mapping={"state": state, "finished_at": time.time(), "error": error})
+            pipe.expire(status_key, ANALYSIS_STATUS_TTL)
+            pipe.lrem(processing, 1, raw)
+            pipe.llen(self._queue_key)
+            *_, depth = await pipe.execute()
+        ANALYSIS_QUEUE_DEPTH.set(depth)
+        return state
+
+
+analysis_queue = AnalysisQueue()
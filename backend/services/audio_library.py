@@ -0,0 +1,186 @@
+# backend/services/audio_library.py
+"""
+Pre-generated audio and IPA for the curriculum vocabulary.
+
+Every headword of ``database/book_content/class_*/unit_vocab.json`` is a likely
+answer of voice and pronunciation questions. The build command synthesizes its
+clip into the audio store and phonemizes it ahead of time, and writes a manifest
+(headword -> audio URL + IPA). Question builders look words up in the manifest
+and only synthesize what it does not cover.
+
+Build from backend/ (where media/ lives), with the TTS engine the backend will use:
+    PYTHONPATH=.. python -m backend.services.audio_library --book-dir ../database/book_content
+"""
+import os
+import re
+import json
+import time
+import argparse
+import tempfile
+import threading
+import unicodedata
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from prometheus_client import Counter
+
+BOOK_CONTENT_DIR = Path(os.getenv("BOOK_CONTENT_DIR", Path(__file__).resolve().parents[2] / "database" / "book_content"))
+AUDIO_LIBRARY_MANIFEST = Path(os.getenv("AUDIO_LIBRARY_MANIFEST", "media/audio_library.json"))
+AUDIO_LIBRARY_BATCH = int(os.getenv("AUDIO_LIBRARY_BATCH", "32"))     # words per TTS / phonemizer batch
+AUDIO_LIBRARY_WORKERS = int(os.getenv("AUDIO_LIBRARY_WORKERS", "4"))  # batches built in parallel
+
+AUDIO_LIBRARY_LOOKUPS = Counter("audio_library_lookups_total", "Curriculum audio library lookups", ["kind", "result"])
+
+_HEADER_WORDS = {"word", "pronunciation", "meaning", "word pronunciation meaning"}
+_parenthesized = re.compile(r"\([^)]*\)")
+_headword = re.compile(r"^[A-Za-z][A-Za-z' .\-]*$")
+
+
+def normalize_word(text: str) -> str:
+    """Manifest key: case, surrounding punctuation and repeated whitespace do not matter."""
+    text = unicodedata.normalize("NFKC", text).replace("’", "'")
+    return " ".join(text.lower().split()).strip(" .,!?;:\"")
+
+
+def parse_headwords(content: str) -> List[str]:
+    """English headwords of one VOCABULARY chunk ("balance (n) \\t sự thăng bằng" -> "balance")."""
+    words = []
+    for line in content.split("\n"):
+        line = unicodedata.normalize("NFKC", line).replace("’", "'").strip()
+        if line.startswith("/"):
+            continue  # pronunciation line ("/bel/")
+        # The headword is everything before the tab (some books use two spaces instead)
+        head = re.split(r"\t| {2,}", line, maxsplit=1)[0]
+        head = _parenthesized.sub(" ", head)
+        for alternative in head.split("/"):  # "on cloud nine/ on top of the world"
+            word = " ".join(alternative.split()).strip(" .,")
+            if word and _headword.match(word) and word.lower() not in _HEADER_WORDS:
+                words.append(word)
+    return words
+
+
+def iter_curriculum_headwords(book_dir: Path = BOOK_CONTENT_DIR) -> List[str]:
+    """Unique headwords of all units of all classes, in book order."""
+    seen = set()
+    words = []
+    for path in sorted(Path(book_dir).glob("class_*/unit_vocab.json")):
+        for unit in json.loads(path.read_text(encoding="utf-8")):
+            for word in parse_headwords(unit.get("content", "")):
+                key = normalize_word(word)
+                if key not in seen:
+                    seen.add(key)
+                    words.append(word)
+    return words
+
+
+class AudioLibrary:
+    """Read side of the manifest; reloaded when the build command replaces the file."""
+
+    def __init__(self, manifest_path: Path = AUDIO_LIBRARY_MANIFEST):
+        self.manifest_path = Path(manifest_path)
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self._voice: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = self.manifest_path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8")) if mtime else {}
+            self._entries = manifest.get("entries", {})
+            self._voice = manifest.get("voice")
+            self._mtime = mtime
+            if mtime:
+                print(f"[AudioLibrary] Loaded {len(self._entries)} words built with {self._voice}")
+
+    def lookup(self, word: str) -> Optional[Dict[str, str]]:
+        self._refresh()
+        return self._entries.get(normalize_word(word))
+
+    def audio_url(self, word: str, voice: str) -> Optional[str]:
+        """Clip URL if the library has one made with ``voice`` (the store voice of the active TTS engine)."""
+        entry = self.lookup(word)
+        url = entry.get("audio_url") if entry and self._voice == voice else None
+        AUDIO_LIBRARY_LOOKUPS.labels(kind="audio", result="hit" if url else "miss").inc()
+        return url
+
+    def phonemes(self, word: str) -> Optional[str]:
+        entry = self.lookup(word)
+        ipa = entry.get("phonemes") if entry else None
+        AUDIO_LIBRARY_LOOKUPS.labels(kind="phonemes", result="hit" if ipa else "miss").inc()
+        return ipa
+
+
+audio_library = AudioLibrary()
+
+
+# === Lookup with fallback, used by the question builders ===
+def _resolve(texts: List[str], lookup, generate_batch) -> List[str]:
+    results = [lookup(text) for text in texts]
+    missing = [i for i, result in enumerate(results) if not result]
+    if missing:
+        for i, result in zip(missing, generate_batch([texts[i] for i in missing])):
+            results[i] = result
+    return results
+
+def resolve_audio_batch(texts: List[str], language: str = "en") -> List[str]:
+    """Like ``generate_audio_batch``, but curriculum words come straight from the library."""
+    from backend.services.voice_quiz_generator import generate_audio_batch, get_tts_engine
+    if language != "en":
+        return generate_audio_batch(texts, language)
+    voice = get_tts_engine().store_voice
+    return _resolve(texts, lambda text: audio_library.audio_url(text, voice), generate_audio_batch)
+
+def resolve_phonemes_batch(texts: List[str]) -> List[str]:
+    """Like ``get_phonemes_batch``, but curriculum words come straight from the library."""
+    from backend.services.voice_quiz_generator import get_phonemes_batch
+    return _resolve(texts, audio_library.phonemes, get_phonemes_batch)
+
+
+# === Build command ===
+def build_library(words: Iterable[str], manifest_path: Path = AUDIO_LIBRARY_MANIFEST,
+                  batch_size: int = AUDIO_LIBRARY_BATCH, workers: int = AUDIO_LIBRARY_WORKERS) -> Dict[str, Dict[str, str]]:
+    from backend.services.voice_quiz_generator import generate_audio_batch, get_phonemes_batch, get_tts_engine
+    words = list(words)
+    batches = [words[i:i + batch_size] for i in range(0, len(words), batch_size)]
+    entries: Dict[str, Dict[str, str]] = {}
+    started = time.perf_counter()
+
+    def build_batch(batch: List[str]):
+        return batch, generate_audio_batch(batch), get_phonemes_batch(batch)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-library") as pool:
+        for done, (batch, audios, phonemes) in enumerate(pool.map(build_batch, batches), 1):
+            for word, audio_url, ipa in zip(batch, audios, phonemes):
+                entries[normalize_word(word)] = {"text": word, "audio_url": audio_url, "phonemes": ipa}
+            print(f"[AudioLibrary] {done}/{len(batches)} batches, {len(entries)} words, {time.perf_counter() - started:.1f}s")
+
+    manifest = {"voice": get_tts_engine().store_voice, "built_at": time.time(), "entries": entries}
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename: running workers reload the manifest and must never read half of it
+    fd, tmp = tempfile.mkstemp(dir=manifest_path.parent, prefix=".tmp-", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, manifest_path)
+
+    failed = sum(not entry["audio_url"] for entry in entries.values())
+    print(f"[AudioLibrary] Wrote {len(entries)} words to {manifest_path} ({failed} without audio)")
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate audio and IPA for the curriculum vocabulary")
+    parser.add_argument("--book-dir", type=Path, default=BOOK_CONTENT_DIR)
+    parser.add_argument("--manifest", type=Path, default=AUDIO_LIBRARY_MANIFEST)
+    parser.add_argument("--batch-size", type=int, default=AUDIO_LIBRARY_BATCH)
+    parser.add_argument("--workers", type=int, default=AUDIO_LIBRARY_WORKERS)
+    args = parser.parse_args()
+    build_library(iter_curriculum_headwords(args.book_dir), args.manifest, args.batch_size, args.workers)
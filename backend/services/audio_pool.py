@@ -0,0 +1,86 @@
+# backend/services/audio_pool.py
+"""
+Admission control and a process pool for pronunciation uploads.
+
+Every upload holds one of AUDIO_MAX_PENDING slots of this uvicorn worker from
+decode to score (and every /calculate-phoneme-score request while it is scored);
+when they are all taken the request is rejected with 429 right
+away instead of queueing behind a burst and starving quiz/chat requests on the
+same event loop. CPU-bound Python work (phoneme alignment and scoring) runs in
+AUDIO_PROCESS_WORKERS child processes, so it holds neither the event loop nor
+the worker's GIL. ASR inference stays out of the pool: it is already batched on
+its own thread or sent to the shared ASR process (see integrators.asr), and each
+child process would otherwise load its own copy of the model.
+"""
+import os
+import time
+import asyncio
+import functools
+import multiprocessing
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+AUDIO_PROCESS_WORKERS = int(os.getenv("AUDIO_PROCESS_WORKERS", "2"))  # 0 runs the work in a thread instead
+AUDIO_MAX_PENDING = int(os.getenv("AUDIO_MAX_PENDING", "8"))          # uploads in progress per uvicorn worker
+AUDIO_RETRY_AFTER = int(os.getenv("AUDIO_RETRY_AFTER", "2"))          # seconds, sent with 429
+
+AUDIO_PENDING = Gauge("audio_pool_pending", "Pronunciation uploads in progress in this worker")
+AUDIO_REJECTED = Counter("audio_pool_rejected_total", "Pronunciation uploads rejected because the worker was saturated")
+AUDIO_TASK_SECONDS = Histogram(
+    "audio_pool_task_seconds", "Duration of CPU-bound audio tasks, queueing included", ["task"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+
+class AudioPoolSaturated(Exception):
+    pass
+
+
+class AudioPool:
+    def __init__(self, workers: int = AUDIO_PROCESS_WORKERS, max_pending: int = AUDIO_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        if self._executor is None and self.workers > 0:
+            # spawn: forking a worker that already runs threads (DB pool, ASR batcher) is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold one upload slot; raises AudioPoolSaturated when none is free."""
+        if self._pending >= self.max_pending:
+            AUDIO_REJECTED.inc()
+            raise AudioPoolSaturated(f"{self._pending} audio uploads already in progress")
+        self._pending += 1
+        AUDIO_PENDING.set(self._pending)
+        try:
+            yield
+        finally:
+            self._pending -= 1
+            AUDIO_PENDING.set(self._pending)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a picklable module-level function in the pool."""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            AUDIO_TASK_SECONDS.labels(task=func.__name__).observe(time.perf_counter() - started)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+audio_pool = AudioPool()
@@ -0,0 +1,258 @@
+# backend/services/audio_store.py
+"""
+Content-addressed store for synthesized audio clips.
+
+A clip lives at ``media/audio/<sha256(voice, lang, text)[:32]>.<mp3|wav>`` next to a
+``.json`` sidecar that records what it says, so an evicted clip can be
+synthesized again when a quiz still links to it. Generation is single-flight
+across threads and uvicorn workers through ``flock`` on one of a fixed set of
+lock files, striped by key prefix, so locks never grow with the store;
+the clip is written to a temp file and renamed into place, so readers never see
+half-written audio. Clips are evicted least-recently-used first once the store
+grows past AUDIO_STORE_MAX_BYTES (files from the old naming scheme, which have
+no sidecar, are never evicted).
+"""
+import os
+import re
+import json
+import time
+import fcntl
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional, Tuple
+from prometheus_client import Counter, Gauge
+
+AUDIO_DIR = Path(os.getenv("AUDIO_DIR", "media/audio"))
+AUDIO_URL_PREFIX = "/media/audio"
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(2 * 1024 ** 3)))  # 0 disables eviction
+AUDIO_STORE_EVICT_TO = float(os.getenv("AUDIO_STORE_EVICT_TO", "0.9"))  # evict down to this fraction of the max
+
+AUDIO_STORE_REQUESTS = Counter("audio_store_requests_total", "Audio clip lookups", ["result"])
+AUDIO_STORE_EVICTIONS = Counter("audio_store_evictions_total", "Audio clips evicted to stay under the size limit")
+AUDIO_STORE_BYTES = Gauge("audio_store_bytes", "Size of the audio store known to this process")
+AUDIO_STORE_CLIPS = Gauge("audio_store_clips", "Audio clips known to this process")
+
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+_clip_name = re.compile(r"^[0-9a-f]{32}\.(mp3|wav)$")
+_legacy_lock_name = re.compile(r"^[0-9a-f]{32}\.lock$")  # per-clip locks of earlier versions
+LOCK_STRIPE_CHARS = 2  # clips sharing the first 2 hex chars of their key share a lock: 256 lock files
+
+Synthesizer = Callable[[str, str, str, Path], None]  # (text, lang, voice, output path)
+BatchSynthesizer = Callable[[List[Tuple[str, str, str, Path]]], None]  # many of the above in one call
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class AudioStore:
+    def __init__(self, root: Path = AUDIO_DIR, max_bytes: int = AUDIO_STORE_MAX_BYTES, url_prefix: str = AUDIO_URL_PREFIX):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.url_prefix = url_prefix
+        self._index: Dict[str, Tuple[int, float]] = {}  # file name -> (size, last used)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # === Paths ===
+    @staticmethod
+    def clip_key(text: str, lang: str, voice: str) -> str:
+        return hashlib.sha256(f"{voice}\0{lang}\0{normalize_text(text)}".encode()).hexdigest()[:32]
+
+    def _paths(self, key: str, ext: str) -> Tuple[Path, Path, Path]:
+        return self.root / f"{key}.{ext}", self.root / f"{key}.json", self.root / ".locks" / f"{key[:LOCK_STRIPE_CHARS]}.lock"
+
+    def url_for(self, key: str, ext: str) -> str:
+        return f"{self.url_prefix}/{key}.{ext}"
+
+    # === Index ===
+    def load_index(self):
+        """Scan the store once per process; afterwards lookups and size accounting are in memory."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = {}
+        for entry in os.scandir(self.root):
+            if entry.is_file() and entry.name.endswith(AUDIO_EXTENSIONS) and not entry.name.startswith("."):
+                stat = entry.stat()
+                index[entry.name] = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            self._index = index
+            self._loaded = True
+            self._update_gauges()
+        self._remove_legacy_locks()
+        print(f"[AudioStore] Indexed {len(index)} clips ({self._total_bytes() / 1024 ** 2:.1f} MiB)")
+
+    def _remove_legacy_locks(self):
+        locks = self.root / ".locks"
+        if not locks.is_dir():
+            return
+        for entry in os.scandir(locks):
+            if _legacy_lock_name.match(entry.name):
+                _unlink_quietly(entry.path)
+
+    def _total_bytes(self) -> int:
+        return sum(size for size, _ in self._index.values())
+
+    def _update_gauges(self):
+        AUDIO_STORE_CLIPS.set(len(self._index))
+        AUDIO_STORE_BYTES.set(self._total_bytes())
+
+    def _touch(self, name: str, path: Path):
+        now = time.time()
+        try:
+            # mtime doubles as "last used", so every worker's hits count towards eviction order
+            os.utime(path, (now, now))
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._index[name] = (size, now)
+            self._update_gauges()
+
+    # === Lookup / generation ===
+    def get_or_create(self, text: str, lang: str, voice: str, synthesize: Synthesizer, ext: str = "mp3") -> str:
+        """Return the URL of the clip for ``text``, synthesizing it at most once across all workers."""
+        def synthesize_batch(items):
+            for item in items:
+                synthesize(*item)
+        return self.get_or_create_many([text], lang, voice, synthesize_batch, ext)[0]
+
+    def get_or_create_many(self, texts: List[str], lang: str, voice: str, synthesize_batch: BatchSynthesizer, ext: str = "mp3") -> List[str]:
+        """URLs of the clips for ``texts`` ("" for clips that failed); all missing clips go to one ``synthesize_batch`` call."""
+        if not self._loaded:
+            self.load_index()
+        keys = [self.clip_key(text, lang, voice) for text in texts]
+        urls = {}
+        missing = {}
+        for text, key in zip(texts, keys):
+            audio_path = self._paths(key, ext)[0]
+            if audio_path.name in self._index and audio_path.exists():
+                AUDIO_STORE_REQUESTS.labels(result="hit").inc()
+                self._touch(audio_path.name, audio_path)
+                urls[key] = self.url_for(key, ext)
+            else:
+                missing.setdefault(key, text)
+
+        if missing:
+            urls.update(self._create(missing, lang, voice, synthesize_batch, ext))
+            self.evict_if_needed()
+        return [urls.get(key, "") for key in keys]
+
+    def _create(self, missing: Dict[str, str], lang: str, voice: str, synthesize_batch: BatchSynthesizer, ext: str) -> Dict[str, str]:
+        (self.root / ".locks").mkdir(parents=True, exist_ok=True)
+        urls = {}
+        with ExitStack() as stack:
+            # Lock each stripe once (flock on a second descriptor would block on our own lock),
+            # in order so two workers with overlapping batches cannot deadlock
+            for lock_path in sorted({self._paths(key, ext)[2] for key in missing}):
+                lock_file = stack.enter_context(open(lock_path, "a"))
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                stack.callback(fcntl.flock, lock_file, fcntl.LOCK_UN)
+
+            todo = []
+            for key, text in missing.items():
+                audio_path = self._paths(key, ext)[0]
+                if audio_path.exists():
+                    # Another worker (or thread) made it while we waited for the lock
+                    AUDIO_STORE_REQUESTS.labels(result="hit").inc()
+                    urls[key] = self.url_for(key, ext)
+                else:
+                    AUDIO_STORE_REQUESTS.labels(result="miss").inc()
+                    fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-", suffix=f".{ext}")
+                    os.close(fd)
+                    stack.callback(_unlink_quietly, tmp)
+                    todo.append((key, text, Path(tmp)))
+
+            if todo:
+                try:
+                    synthesize_batch([(text, lang, voice, tmp) for _, text, tmp in todo])
+                except Exception as e:
+                    print(f"[AudioStore] Synthesis of {len(todo)} clips failed: {e}")
+                for key, text, tmp in todo:
+                    if not tmp.exists() or tmp.stat().st_size == 0:
+                        continue  # synthesis failed for this clip; the caller gets ""
+                    audio_path, meta_path, _ = self._paths(key, ext)
+                    os.replace(tmp, audio_path)
+                    if not meta_path.exists():
+                        meta_path.write_text(json.dumps(
+                            {"text": normalize_text(text), "lang": lang, "voice": voice},
+                            ensure_ascii=False,
+                        ))
+                    urls[key] = self.url_for(key, ext)
+
+        for key in urls:
+            audio_path = self._paths(key, ext)[0]
+            self._touch(audio_path.name, audio_path)
+        return urls
+
+    def regenerate(self, filename: str, synthesize: Synthesizer) -> Optional[Path]:
+        """Re-create an evicted clip from its sidecar; None if the file is unknown."""
+        if not _clip_name.match(filename):
+            return None
+        key, ext = filename.split(".")
+        audio_path, meta_path, _ = self._paths(key, ext)
+        if audio_path.exists():
+            return audio_path
+        if not meta_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text())
+        self.get_or_create(meta["text"], meta["lang"], meta["voice"], synthesize, ext)
+        return audio_path if audio_path.exists() else None
+
+    # === Eviction ===
+    def evict_if_needed(self):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if self._total_bytes() <= self.max_bytes:
+                return
+        lock_path = self.root / ".locks" / "evict.lock"
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another worker is already evicting
+            try:
+                self._evict(int(self.max_bytes * AUDIO_STORE_EVICT_TO))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self, target_bytes: int):
+        # Re-read sizes and mtimes from disk: other workers' hits and new clips are not in our index
+        self.load_index()
+        with self._lock:
+            total = self._total_bytes()
+            candidates = sorted(
+                (last_used, name, size)
+                for name, (size, last_used) in self._index.items()
+                if _clip_name.match(name) and (self.root / f"{name.split('.')[0]}.json").exists()
+            )
+        evicted = 0
+        for _, name, size in candidates:
+            if total <= target_bytes:
+                break
+            try:
+                os.unlink(self.root / name)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+            with self._lock:
+                self._index.pop(name, None)
+        with self._lock:
+            self._update_gauges()
+        if evicted:
+            AUDIO_STORE_EVICTIONS.inc(evicted)
+            print(f"[AudioStore] Evicted {evicted} clips, store is now {total / 1024 ** 2:.1f} MiB")
+
+
+audio_store = AudioStore()
@@ -1,6 +1,5 @@
 # services/chat_service.py
 import asyncio
-from asyncio import to_thread
 from typing import List, Dict
 from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.core.prompts import ChatPromptTemplate
@@ -66,5 +65,5 @@ async def chat(
     full_messages = messages[:1] + chat_history[-10:] + messages[1:]
 
     # 4. Gọi LLM
-    response = await to_thread(llm.chat, full_messages)
+    response = await llm.achat(full_messages, cache=False)
     return response.message.content.strip()
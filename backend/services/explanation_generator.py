@@ -1,8 +1,8 @@
 import asyncio
-from asyncio import to_thread
 from typing import List
 from llama_index.core.prompts import PromptTemplate
 from ..config.settings import llm
+from ..integrators.completion_cache import completion_cache
 from googletrans import Translator
 
 async def generate_explanation_mcq(question: str, correct_answer: str, user_answer: str, options: List[dict]) -> str:
@@ -31,7 +31,7 @@ async def generate_explanation_mcq(question: str, correct_answer: str, user_answ
         user_answer=user_answer,
         option_text=option_text
     )
-    response = await to_thread(llm.complete, prompt)
+    response = await llm.acomplete(prompt)
     return "\n".join(response.text.splitlines()[1:])
 
 async def generate_explanation_pronunciation(question: str, correct_answer: str, user_answer: str) -> str:
@@ -66,7 +66,7 @@ async def generate_explanation_pronunciation(question: str, correct_answer: str,
         correct_answer=correct_answer,
         user_answer=user_answer
     )
-    response = await to_thread(llm.complete, prompt)
+    response = await llm.acomplete(prompt)
     return "\n".join(response.text.splitlines())
 
 async def generate_explanation_image(options: List[dict]) -> str:
@@ -78,8 +78,18 @@ async def generate_explanation_image(options: List[dict]) -> str:
         "| English  | Vietnamese     |",
         "|----------|----------------|"
     ]
-    for option in options:
-        translated = await translator.translate(option['text'], src='en', dest='vi')
-        translated_table.append(f"| {option['text']} | {translated.text} |")
+
+    async def translate(text: str) -> str:
+        key = completion_cache.make_key("googletrans-en-vi", text)
+        cached = await completion_cache.aget(key)
+        if cached is not None:
+            return cached
+        translated = await translator.translate(text, src='en', dest='vi')
+        await completion_cache.aset(key, translated.text)
+        return translated.text
+
+    translations = await asyncio.gather(*(translate(option['text']) for option in options))
+    for option, translated in zip(options, translations):
+        translated_table.append(f"| {option['text']} | {translated} |")
 
     return "\n".join(translated_table)
\ No newline at end of file
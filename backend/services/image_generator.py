@@ -1,10 +1,42 @@
+import os
+import time
+import asyncio
 import mimetypes
 import uuid
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from prometheus_client import Counter, Histogram
 from google import genai
 from google.genai import types
 from ..config.settings import img_model
-from ..integrators.api_key_manager import APIKeyManager
+from ..integrators.api_key_manager import get_key_manager, key_fingerprint
+
+_clients = {}  # one genai client per API key
+
+def _client_for(api_key: str) -> genai.Client:
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients.setdefault(api_key, genai.Client(api_key=api_key))
+    return client
+
+IMAGE_CONCURRENCY_PER_KEY = int(os.getenv("IMAGE_CONCURRENCY_PER_KEY", "2"))  # parallel renders per image API key
+IMAGE_RENDER_TIMEOUT = float(os.getenv("IMAGE_RENDER_TIMEOUT", "60"))          # seconds before a render is abandoned
+IMAGE_PLACEHOLDER_URL = os.getenv("IMAGE_PLACEHOLDER_URL", "")  # empty: the lesson shows the question without an image
+
+IMAGE_RENDERS = Counter("image_renders_total", "Image renders by outcome", ["result"])
+IMAGE_RENDER_SECONDS = Histogram(
+    "image_render_seconds", "Time to render one quiz image",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90),
+)
+
+_image_slots: Optional[asyncio.Semaphore] = None
+
+def image_slots() -> asyncio.Semaphore:
+    """Process-wide render slots, sized to the image key pool so fan-out never outruns the keys."""
+    global _image_slots
+    if _image_slots is None:
+        _image_slots = asyncio.Semaphore(len(get_key_manager(purpose="image").all_keys) * IMAGE_CONCURRENCY_PER_KEY)
+    return _image_slots
 
 def save_binary_file(file_name: str, data: bytes) -> None:
     """Save binary data to a file"""
@@ -26,8 +58,7 @@ def generate_image(prompt: str) -> str:
         img_dir = Path("media/images")
         img_dir.mkdir(parents=True, exist_ok=True)
         
-        key_manager = APIKeyManager(purpose="image")
-        key_iterator = key_manager.key_cycle()
+        key_manager = get_key_manager(purpose="image")
 
         # Prepare content for generation
         contents = [
@@ -47,32 +78,32 @@ def generate_image(prompt: str) -> str:
         
         # Generate image
         while True:
-            api_key = next(key_iterator)
+            api_key = key_manager.pick_key()
             if not api_key:
                 print("[Error] All API keys are on cooldown.")
                 return ""
 
             try:
-                client = genai.Client(api_key=api_key)
-                for chunk in client.models.generate_content_stream(
-                    model=img_model,
-                    contents=contents,
-                    config=generate_content_config,
-                ):
-                    if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
-                        continue
-
-                    if chunk.candidates[0].content.parts[0].inline_data:
-                        filename = f"{uuid.uuid4()}"
-                        inline_data = chunk.candidates[0].content.parts[0].inline_data
-                        file_extension = mimetypes.guess_extension(inline_data.mime_type)
-                        filepath = img_dir / f"{filename}{file_extension}"
-                        save_binary_file(str(filepath), inline_data.data)
-                        return f"/media/images/{filename}{file_extension}"
+                with key_manager.lease(api_key):
+                    for chunk in _client_for(api_key).models.generate_content_stream(
+                        model=img_model,
+                        contents=contents,
+                        config=generate_content_config,
+                    ):
+                        if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                            continue
+
+                        if chunk.candidates[0].content.parts[0].inline_data:
+                            filename = f"{uuid.uuid4()}"
+                            inline_data = chunk.candidates[0].content.parts[0].inline_data
+                            file_extension = mimetypes.guess_extension(inline_data.mime_type)
+                            filepath = img_dir / f"{filename}{file_extension}"
+                            save_binary_file(str(filepath), inline_data.data)
+                            return f"/media/images/{filename}{file_extension}"
 
             except Exception as e:
                 if "RESOURCE_EXHAUSTED" in str(e) or "api" in str(e).lower():
-                    print(f"[Quota] API key {api_key[:8]} exceeded. Trying next key...")
+                    print(f"[Quota] API key {key_fingerprint(api_key)} exceeded. Trying next key...")
                     key_manager.mark_key_exhausted(api_key)
                     continue
                 print(f"[Other Error] {e}")
@@ -84,6 +115,56 @@ def generate_image(prompt: str) -> str:
         print(f"Error generating image: {e}")
         return ""
 
+async def render_image(
+    prompt: str,
+    timeout: float = IMAGE_RENDER_TIMEOUT,
+    backend: Callable[[str], str] = generate_image,
+) -> str:
+    """Render one image inside a shared slot; returns the placeholder URL on timeout or failure."""
+    slots = image_slots()
+    await slots.acquire()
+    started = time.monotonic()
+    # A worker thread cannot be stopped: the render keeps its slot (and key lease) until the thread is done,
+    # even when the caller has given up on it, so abandoned renders never exceed the slot count
+    render = asyncio.ensure_future(asyncio.to_thread(backend, prompt))
+    render.add_done_callback(lambda task: _release_slot(slots, task))
+    try:
+        url = await asyncio.wait_for(asyncio.shield(render), timeout)
+    except asyncio.TimeoutError:
+        print(f"[Image] Render timed out after {timeout}s, using placeholder")
+        IMAGE_RENDERS.labels(result="timeout").inc()
+        return IMAGE_PLACEHOLDER_URL
+    except Exception as e:
+        print(f"[Image] Render failed, using placeholder: {e}")
+        IMAGE_RENDERS.labels(result="error").inc()
+        return IMAGE_PLACEHOLDER_URL
+    finally:
+        IMAGE_RENDER_SECONDS.observe(time.monotonic() - started)
+    IMAGE_RENDERS.labels(result="ok" if url else "empty").inc()
+    return url or IMAGE_PLACEHOLDER_URL
+
+def _release_slot(slots: asyncio.Semaphore, render: asyncio.Future):
+    slots.release()
+    if not render.cancelled():
+        render.exception()  # an abandoned render's error is not reported as never retrieved
+
+async def render_images(
+    prompts: List[str],
+    render: Callable[[str], Awaitable[str]] = render_image,
+) -> AsyncIterator[Tuple[int, str]]:
+    """Render all prompts concurrently and yield ``(index, url)`` as each image finishes."""
+    async def _indexed(i: int, prompt: str) -> Tuple[int, str]:
+        return i, await render(prompt)
+
+    tasks = [asyncio.create_task(_indexed(i, p)) for i, p in enumerate(prompts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer stopped early (e.g. client disconnected): don't keep rendering
+        for task in tasks:
+            task.cancel()
+
 if __name__ == "__main__":
     # Test the function
     prompt = """An illustration of a nurse, in the style of Duolingo learning illustration. 
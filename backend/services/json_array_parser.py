@@ -0,0 +1,89 @@
+# backend/services/json_array_parser.py
+"""
+Incremental parser for a JSON array of objects arriving in arbitrary chunks.
+
+LLM question output is a JSON array, sometimes wrapped in a ```json fence or in
+{"questions": [...]}. The parser scans for the first '[' and hands back each
+top-level object as soon as its closing brace arrives, so callers can use the
+first questions while the model is still writing the rest. Each object is
+decoded on its own: a malformed object is counted and skipped, and a truncated
+array still yields every object that was completed before the cut.
+"""
+import re
+import json
+from typing import Any, Dict, List
+
+_TRAILING_COMMA = re.compile(r",(\s*[\]}])")
+
+
+class JsonArrayParser:
+    def __init__(self):
+        self.text = ""          # everything fed so far, for fallbacks and repair prompts
+        self.complete = False   # the closing ']' of the array was seen
+        self.objects = 0        # objects decoded
+        self.errors = 0         # objects that could not be decoded
+        self._in_array = False
+        self._depth = 0         # nesting inside the current element, 0 between elements
+        self._in_string = False
+        self._escape = False
+        self._start = -1        # offset in self.text where the current object began
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume ``chunk`` and return the objects it completed, in order."""
+        offset = len(self.text)
+        self.text += chunk
+        done = []
+        if self.complete:
+            return done
+
+        for i, ch in enumerate(chunk, start=offset):
+            if not self._in_array:
+                if ch == "[":
+                    self._in_array = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    if ch == "]":
+                        self.complete = True
+                        break
+                    continue  # stray brace between elements
+                self._depth -= 1
+                if self._depth == 0 and self._start >= 0:
+                    obj = self._decode(self.text[self._start:i + 1])
+                    self._start = -1
+                    if obj is not None:
+                        done.append(obj)
+        return done
+
+    def _decode(self, raw: str):
+        for candidate in (raw, _TRAILING_COMMA.sub(r"\1", raw)):
+            try:
+                obj = json.loads(candidate)
+            except ValueError:
+                continue
+            if isinstance(obj, dict):
+                self.objects += 1
+                return obj
+        self.errors += 1
+        return None
+
+    @property
+    def truncated(self) -> bool:
+        """The stream ended inside the array (call after the last feed)."""
+        return self._in_array and not self.complete
@@ -0,0 +1,92 @@
+# backend/services/phoneme_lexicon.py
+"""
+Persistent IPA lexicon in front of phonemizer/espeak.
+
+One SQLite file (WAL mode) is shared by all uvicorn workers and survives
+restarts; rows are keyed by (normalized text, accent). Each thread keeps its own
+connection, as sqlite3 connections must not cross threads.
+"""
+import os
+import time
+import fcntl
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+from prometheus_client import Counter
+
+PHONEME_LEXICON_PATH = Path(os.getenv("PHONEME_LEXICON_PATH", "media/phonemes.sqlite3"))
+
+PHONEME_LEXICON_REQUESTS = Counter("phoneme_lexicon_requests_total", "Phoneme lexicon lookups per text and accent", ["result"])
+
+_SQLITE_MAX_VARIABLES = 900  # stay under SQLITE_MAX_VARIABLE_NUMBER of older builds
+
+
+def normalize_text(text: str) -> str:
+    # Case is kept: espeak spells out "DIY" but reads "diy" as a word
+    return " ".join(text.split())
+
+
+class PhonemeLexicon:
+    def __init__(self, path: Path = PHONEME_LEXICON_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes ("
+                " text TEXT NOT NULL, accent TEXT NOT NULL, ipa TEXT NOT NULL,"
+                " PRIMARY KEY (text, accent)) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, texts: Iterable[str], accents: List[str]) -> Dict[Tuple[str, str], str]:
+        """IPA found for each (normalized text, accent) pair; missing pairs are absent."""
+        keys = sorted({normalize_text(text) for text in texts})
+        found = {}
+        conn = self._conn()
+        step = _SQLITE_MAX_VARIABLES - len(accents)
+        for i in range(0, len(keys), step):
+            chunk = keys[i:i + step]
+            rows = conn.execute(
+                f"SELECT text, accent, ipa FROM phonemes"
+                f" WHERE text IN ({','.join('?' * len(chunk))}) AND accent IN ({','.join('?' * len(accents))})",
+                [*chunk, *accents],
+            ).fetchall()
+            found.update({(text, accent): ipa for text, accent, ipa in rows})
+        hits = len(found)
+        PHONEME_LEXICON_REQUESTS.labels(result="hit").inc(hits)
+        PHONEME_LEXICON_REQUESTS.labels(result="miss").inc(len(keys) * len(accents) - hits)
+        return found
+
+    def put_many(self, rows: Iterable[Tuple[str, str, str]]):
+        """Store (text, accent, ipa) rows; concurrent writers of the same word are harmless."""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO phonemes (text, accent, ipa) VALUES (?, ?, ?)",
+                [(normalize_text(text), accent, ipa) for text, accent, ipa in rows],
+            )
+
+    def warm_up(self, words: List[str], phonemes_batch: Callable[[List[str]], List[str]], batch_size: int = 256):
+        """Fill the lexicon with ``words`` through ``phonemes_batch``; only one worker per host does it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".warmup.lock"), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another worker is warming up
+            started = time.perf_counter()
+            for i in range(0, len(words), batch_size):
+                phonemes_batch(words[i:i + batch_size])
+            print(f"[PhonemeLexicon] Warmed up {len(words)} words in {time.perf_counter() - started:.1f}s")
+
+
+phoneme_lexicon = PhonemeLexicon()
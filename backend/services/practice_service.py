@@ -1,10 +1,11 @@
 import asyncio
-from asyncio import to_thread
 from typing import List, Dict, Any, Optional
 from backend.services.question_generator import generate_questions_adaptive
 from ..config.settings import llm
+from ..integrators.llm_router import LLM_JSON_OUTPUTS, json_output_mode
+from ..schemas.quiz import PerformanceAnalysisOutput
 from llama_index.core.prompts import PromptTemplate
-from backend.database.database import get_db
+from backend.database.database import get_db, run_db
 import json
 from .quiz_service import quiz_service
 from tenacity import retry, stop_after_attempt, wait_fixed
@@ -15,8 +16,10 @@ class PracticeService:
 
     async def load_user_profile(self, quiz_id: int) -> Dict[str, List[str]]:
         """Load user's learning profile from database based on specific quiz."""
-        conn = get_db()
-        try:
+        return await run_db(self._fetch_user_profile, quiz_id)
+
+    def _fetch_user_profile(self, quiz_id: int) -> Dict[str, List[str]]:
+        with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT strengths, weaknesses 
@@ -35,13 +38,13 @@ class PracticeService:
                     "strengths": [],
                     "weaknesses": []
                 }
-        finally:
-            conn.close()
 
     async def get_quiz_answers(self, quiz_id: int) -> Dict[str, Any]:
         """Get all answers for a specific quiz with tracking of wrong answers."""
-        conn = get_db()
-        try:
+        return await run_db(self._fetch_quiz_answers, quiz_id)
+
+    def _fetch_quiz_answers(self, quiz_id: int) -> Dict[str, Any]:
+        with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT 
@@ -76,13 +79,13 @@ class PracticeService:
                     all_answers.append(answer)
                 print("Successfully loaded quiz answers")
                 return all_answers
-        finally:
-            conn.close()
 
     async def get_prompt_data(self, quiz_id: int) -> Dict[str, Any]:
         """Get prompt data from user_quizzes table."""
-        conn = get_db()
-        try:
+        return await run_db(self._fetch_prompt_data, quiz_id)
+
+    def _fetch_prompt_data(self, quiz_id: int) -> Dict[str, Any]:
+        with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT prompt, depth_of_knowledge
@@ -106,8 +109,6 @@ class PracticeService:
                         "dok_level": result["depth_of_knowledge"]
                     }
                 return {}
-        finally:
-            conn.close()
 
     def parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """Parse generated questions from JSON response"""
@@ -233,29 +234,20 @@ Chỉ trả về JSON. Không thêm bất kỳ giải thích hay văn bản nào
             all_answers=formatted_answers
         )
         try:
-            analysis = await to_thread(self.generate_analysis_with_retry, prompt)
+            analysis = await self.generate_analysis_with_retry(prompt)
             # Store the updated profile
             strengths = analysis.get("strengths", {})
             weaknesses = analysis.get("weaknesses", {})
             
-            unique_strengths = list(dict.fromkeys(str(v) for v in strengths.values()))
-            unique_weaknesses = list(dict.fromkeys(str(v) for v in weaknesses.values()))
+            # Lists with the response schema, {"point_1": ...} objects from free-form output
+            unique_strengths = list(dict.fromkeys(str(v) for v in (strengths.values() if isinstance(strengths, dict) else strengths)))
+            unique_weaknesses = list(dict.fromkeys(str(v) for v in (weaknesses.values() if isinstance(weaknesses, dict) else weaknesses)))
 
             combined_strengths = "\n".join(unique_strengths)
             combined_weaknesses = "\n".join(unique_weaknesses)
 
             # Update quiz with new strengths and weaknesses
-            conn = get_db()
-            try:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE user_quizzes 
-                        SET strengths = %s, weaknesses = %s
-                        WHERE id = %s
-                    """, (combined_strengths, combined_weaknesses, quiz_id))
-                    conn.commit()
-            finally:
-                conn.close()
+            await run_db(self._save_profile, quiz_id, combined_strengths, combined_weaknesses)
 
             return {
                 "strengths": combined_strengths,
@@ -263,7 +255,27 @@ Chỉ trả về JSON. Không thêm bất kỳ giải thích hay văn bản nào
             }
         except Exception as e:
             print(f"Error parsing analysis: {e}")
-            return previous_profile
+            # Let the analysis queue record the failure and retry
+            raise
+
+    async def run_performance_analysis(self, quiz_id: int) -> Dict[str, List[str]]:
+        """Load everything the analysis needs and refresh the quiz's strengths and weaknesses."""
+        user_profile, prompt_data, answers_data = await asyncio.gather(
+            self.load_user_profile(quiz_id),
+            self.get_prompt_data(quiz_id),
+            self.get_quiz_answers(quiz_id)
+        )
+        return await self.analyze_performance(quiz_id, answers_data, prompt_data, user_profile)
+
+    def _save_profile(self, quiz_id: int, strengths: str, weaknesses: str) -> None:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE user_quizzes 
+                    SET strengths = %s, weaknesses = %s
+                    WHERE id = %s
+                """, (strengths, weaknesses, quiz_id))
+                conn.commit()
 
     async def generate_practice_questions(
         self,
@@ -297,18 +309,27 @@ Chỉ trả về JSON. Không thêm bất kỳ giải thích hay văn bản nào
         print("Successfully generated adaptive questions")
         
         # Append new questions to existing quiz
-        return quiz_service.append_questions_to_quiz(quiz_id, questions_data)
+        return await run_db(quiz_service.append_questions_to_quiz, quiz_id, questions_data)
     
     @retry(stop=stop_after_attempt(2), wait=wait_fixed(1))
-    def generate_analysis_with_retry(self, prompt: str) -> Dict[str, Any]:
-        response = llm.complete(prompt)
+    async def generate_analysis_with_retry(self, prompt: str) -> Dict[str, Any]:
+        mode = json_output_mode()
+        response = await llm.acomplete(prompt, cache=False, response_schema=PerformanceAnalysisOutput)
         try:
-            return self.parse_json_response(response.text)
+            analysis = self.parse_json_response(response.text)
+            LLM_JSON_OUTPUTS.labels(task="analysis", mode=mode, result="complete").inc()
+            return analysis
         except Exception as e:
             print("Retrying question generation...")
             error_message = str(e)
             fix_prompt = f"""Output dưới đây không thể phân tích cú pháp JSON do lỗi này:\n\n{error_message}\n\nHãy chỉ trả về JSON đã được sửa lại (object) hợp lệ, không kèm text nào khác.\n\nOriginal (invalid) output:\n{response.text}"""
-            fixed_response = llm.complete(fix_prompt)
-            return self.parse_json_response(fixed_response.text)
+            fixed_response = await llm.acomplete(fix_prompt, cache=False, response_schema=PerformanceAnalysisOutput)
+            try:
+                analysis = self.parse_json_response(fixed_response.text)
+            except Exception:
+                LLM_JSON_OUTPUTS.labels(task="analysis", mode=mode, result="failed").inc()
+                raise
+            LLM_JSON_OUTPUTS.labels(task="analysis", mode=mode, result="repaired").inc()
+            return analysis
 
 practice_service = PracticeService() 
\ No newline at end of file
@@ -67,4 +67,6 @@ DIFFICULTY_LEVELS_PHONUNCIATION_QUESTIONS = {
     1: "Beginner - Focus on basic words with regular spelling-to-sound patterns (e.g., cat, dog, book)",
     2: "Intermediate - Include common but slightly irregular words or phrases (e.g., schedule, comfortable, a cup of tea)",
     3: "Advanced - Focus on difficult or misleading pronunciation (e.g., colonel, thorough, 'through the tunnel')"
-}
\ No newline at end of file
+}
+# Every question type, in the stable part of the text question prompts; a request only names the ones to use
+QUESTION_TYPE_CATALOG = "\n".join(f"- {question_type}" for question_type in QUESTION_TYPES)
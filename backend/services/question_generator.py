@@ -1,35 +1,83 @@
+import time
 import asyncio
-from asyncio import to_thread
 import random
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram
+from pydantic import ValidationError
 from llama_index.core.prompts import PromptTemplate
 from ..config.settings import llm
-from ..schemas.quiz import QuestionType
-from typing import List, Dict, Any, Optional
+from ..schemas.quiz import (
+    QuestionType, GeneratedQuestion, ChoiceQuestionOutput, ImageQuestionOutput, PronunciationQuestionOutput,
+)
+from ..integrators.llm_router import LLM_JSON_OUTPUTS, json_output_mode, track_usage
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import json
 import re
-from .voice_quiz_generator import generate_audio, get_phonemes
-from .image_generator import generate_image
-from .prompt_banks import POSSIBLE_CUSTOM_PROMPTS, DOK_DESCRIPTIONS, QUESTION_TYPES, DIFFICULTY_LEVELS_VOICE_QUESTIONS, DIFFICULTY_LEVELS_PHONUNCIATION_QUESTIONS
+from .voice_quiz_generator import run_media
+from .audio_library import resolve_audio_batch, resolve_phonemes_batch
+from .image_generator import render_images
+from .json_array_parser import JsonArrayParser
+from .prompt_banks import POSSIBLE_CUSTOM_PROMPTS, DOK_DESCRIPTIONS, QUESTION_TYPES, QUESTION_TYPE_CATALOG, DIFFICULTY_LEVELS_VOICE_QUESTIONS, DIFFICULTY_LEVELS_PHONUNCIATION_QUESTIONS
 from .quiz_service import quiz_service
+from ..database.database import run_db
 from tenacity import retry, stop_after_attempt, wait_fixed
 
-# Base prompt template for question generation without strengths/weaknesses
-BASE_TEXT_QUESTION_TEMPLATE = """ 
+QUESTION_STAGE_SECONDS = Histogram(
+    "question_build_stage_seconds", "Time spent in each stage of building generated questions",
+    ["question_type", "stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+QUIZ_PROMPT_TOKENS = Histogram(
+    "quiz_prompt_tokens", "Gemini prompt tokens per generated quiz or practice round, by billing kind", ["kind"],
+    buckets=(1000, 2500, 5000, 10000, 20000, 40000, 80000, 160000),
+)
+QUESTION_PARSE_DROPPED = Counter("question_parse_dropped_total", "Generated question objects dropped while parsing", ["reason"])
+
+@contextmanager
+def stage_timer(question_type: str, stage: str, items: int = 0):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        QUESTION_STAGE_SECONDS.labels(question_type=question_type, stage=stage).observe(elapsed)
+        print(f"[Timing] {question_type}/{stage}: {elapsed:.2f}s ({items} items)")
+
+@contextmanager
+def quiz_token_usage(quiz_id: int):
+    """Record the Gemini prompt tokens one quiz's generation is billed for, also when it fails."""
+    with track_usage() as usage:
+        try:
+            yield usage
+        finally:
+            record_quiz_tokens(quiz_id, usage)
+
+def record_quiz_tokens(quiz_id: int, usage):
+    QUIZ_PROMPT_TOKENS.labels(kind="prompt").observe(usage.prompt)
+    QUIZ_PROMPT_TOKENS.labels(kind="cached_prompt").observe(usage.cached)
+    print(f"[Tokens] quiz {quiz_id}: {usage.prompt} prompt + {usage.cached} cached prompt, {usage.output} output tokens in {usage.requests} requests")
+
+# Text question prompts are laid out as a stable prefix (instructions and the question type
+# catalog, then the unit's content) followed by everything that changes per request, so the
+# prefix is shared across students: Gemini serves it from cached content (context_cache),
+# vLLM from its automatic prefix cache.
+
+# Instructions for question generation without strengths/weaknesses
+BASE_TEXT_QUESTION_INSTRUCTIONS = """ 
 You are helping Vietnamese students improve their English through creative and varied questions.
 
-Use the following English learning materials as your inspiration. You are NOT restricted to the exact words or sentences in the provided data. Feel free to synthesize, combine, or transform ideas into realistic classroom or exam-style questions.
+Use the English learning materials given below as your inspiration. You are NOT restricted to the exact words or sentences in the provided data. Feel free to synthesize, combine, or transform ideas into realistic classroom or exam-style questions.
 
-{ 
-  "main_knowledge": "{content}",
-  "prior_knowledge": "{prior_contents}",
-  "sample_text": "{text_chunks}",
-  "custom_prompt": "{custom_prompt}",
-  "question_types": "{question_types}",
-  "count": "{count}"
-}
+The materials are:
+- main_knowledge: the current unit's content
+- prior_knowledge: vocabulary and grammar from earlier units
+- sample_text: snippets from the textbook
+- custom_prompt: the teacher's instruction
+- question_types: the question types to use, taken from the catalog below
+- count: how many questions to create
 
 Instruction:
-Create {count} unique multiple-choice questions.
+Create count unique multiple-choice questions.
 
 Make sure:
 1. Use a variety of school-level question formats. Avoid repeating similar formats.
@@ -40,33 +88,32 @@ Make sure:
 6. You may use standard Markdown syntax only (e.g., **bold**, *italic*, ~~strikethrough~~, line breaks \n). Use ___ for blanks.
 
 Format (in JSON array):
-- id: from 1 to {count}
+- id: from 1 to count
 - question: the word, phrase or sentence
 - options: list of 4 options, only one correct
 - correct_answer: the correct option string
 - type: "text"
 
-Return exactly {count} questions.
-"""
+Question type catalog:
+""" + QUESTION_TYPE_CATALOG
 
-# Template for practice questions with strengths/weaknesses
-ADAPTIVE_QUESTION_TEMPLATE = """ 
+# Instructions for practice questions with strengths/weaknesses
+ADAPTIVE_QUESTION_INSTRUCTIONS = """ 
 You are helping Vietnamese students improve their English through personalized and diverse multiple-choice questions.
 
-Use the materials below for inspiration. You are NOT limited to the exact sentences. You may **adapt freely**—rephrase, combine, or simplify so items feel natural in Vietnamese school exams.
+Use the materials given below for inspiration. You are NOT limited to the exact sentences. You may **adapt freely**—rephrase, combine, or simplify so items feel natural in Vietnamese school exams.
 
-{ 
-  "main_knowledge": "{content}",
-  "prior_knowledge": "{prior_contents}",
-  "text_chunks": "{text_chunks}",
-  "custom_prompt": "{custom_prompt}",
-  "question_types": "{question_types}",
-  "count": "{count}",
-  "adaptive_prompt": "{adaptive_prompt}"
-}
+The materials are:
+- main_knowledge: the current unit's content
+- prior_knowledge: vocabulary and grammar from earlier units
+- text_chunks: snippets from the textbook
+- custom_prompt: the teacher's instruction
+- question_types: the question types to use, taken from the catalog below
+- count: how many questions to create
+- adaptive_prompt: the student's weaknesses and strengths
 
 Instruction:
-Create {count} unique multiple-choice questions based on the above.
+Create count unique multiple-choice questions based on the materials.
 
 Guidelines:
 1. **Target weaknesses first.**  
@@ -80,15 +127,50 @@ Guidelines:
 5. Use Markdown (e.g., **bold**, *italic*, ___ for blanks).
 
 Output format (JSON array):
-- id: from 1 to {count}
+- id: from 1 to count
 - question: stem only
 - options: list of 4 strings (one correct)
 - correct_answer: the correct string
 - type: "text"
 
+Question type catalog:
+""" + QUESTION_TYPE_CATALOG
+
+UNIT_CONTENT_HEADER = """
+
+main_knowledge:
+"""
+
+# Per-request suffixes
+BASE_TEXT_QUESTION_REQUEST = """
+{ 
+  "prior_knowledge": "{prior_contents}",
+  "sample_text": "{text_chunks}",
+  "custom_prompt": "{custom_prompt}",
+  "question_types": "{question_types}",
+  "count": "{count}"
+}
+
+Return exactly {count} questions.
+"""
+
+ADAPTIVE_QUESTION_REQUEST = """
+{ 
+  "prior_knowledge": "{prior_contents}",
+  "text_chunks": "{text_chunks}",
+  "custom_prompt": "{custom_prompt}",
+  "question_types": "{question_types}",
+  "count": "{count}",
+  "adaptive_prompt": "{adaptive_prompt}"
+}
+
 Return exactly {count} questions.
 """
 
+def unit_prompt_prefix(instructions: str, content: str) -> str:
+    """Stable start of a prompt: instructions, then the unit content every student of the unit shares."""
+    return instructions + UNIT_CONTENT_HEADER + content + "\n"
+
 async def generate_text_questions(
     content: str,
     prior_contents: str,
@@ -107,11 +189,9 @@ async def generate_text_questions(
     question_types = "\n - ".join(question_types)
 
     if adaptive_prompt:
-        template = ADAPTIVE_QUESTION_TEMPLATE 
-        prompt_template = PromptTemplate(template=template)
-        
+        prefix = unit_prompt_prefix(ADAPTIVE_QUESTION_INSTRUCTIONS, content)
+        prompt_template = PromptTemplate(template=ADAPTIVE_QUESTION_REQUEST)
         prompt = prompt_template.format(
-            content=content,
             prior_contents=prior_contents,
             text_chunks=text_chunks,
             custom_prompt=custom_prompt,
@@ -120,10 +200,9 @@ async def generate_text_questions(
             adaptive_prompt=adaptive_prompt
         )
     else:   
-        template = BASE_TEXT_QUESTION_TEMPLATE
-        prompt_template = PromptTemplate(template=template)
+        prefix = unit_prompt_prefix(BASE_TEXT_QUESTION_INSTRUCTIONS, content)
+        prompt_template = PromptTemplate(template=BASE_TEXT_QUESTION_REQUEST)
         prompt = prompt_template.format(
-            content=content,
             prior_contents=prior_contents,
             text_chunks=text_chunks,
             custom_prompt=custom_prompt,
@@ -132,7 +211,7 @@ async def generate_text_questions(
         )
 
     try:
-        questions = await to_thread(generate_questions_with_retry, prompt)
+        questions = await generate_questions_with_retry(prompt, List[ChoiceQuestionOutput], prefix=prefix)
         return [
             {
                 "question": q["question"],
@@ -146,13 +225,14 @@ async def generate_text_questions(
         return []
 
 
-async def generate_image_questions(
+async def iter_image_questions(
     vocab: str,
     count: int,
     custom_prompt: Optional[str] = None
-) -> List[Dict[str, Any]]:
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(position, question)`` as soon as each question's image is rendered."""
     if count < 1:
-        return []
+        return
     
     prompt_template = PromptTemplate(
         template="""
@@ -197,15 +277,19 @@ async def generate_image_questions(
     
     try:
         prompt = prompt_template.format(vocab_list=vocab, count=count)
-        questions = await to_thread(generate_questions_with_retry, prompt)
-        
-        async def _build(q):
-            url = await to_thread(
-                generate_image,
-                f"An illustration in Duolingo flat style based on the following scene: "
-                f"{q.get('image_description', '')}. The image must not include any text or labels.",
-            )
-            return {
+        questions = await generate_questions_with_retry(prompt, List[ImageQuestionOutput])
+    except Exception as e:
+        return
+
+    image_prompts = [
+        f"An illustration in Duolingo flat style based on the following scene: "
+        f"{q.get('image_description', '')}. The image must not include any text or labels."
+        for q in questions
+    ]
+    async for i, url in render_images(image_prompts):
+        q = questions[i]
+        try:
+            yield i, {
                 "question": q["question"],
                 "options": q["options"],
                 "correct_answer": q["correct_answer"],
@@ -213,10 +297,17 @@ async def generate_image_questions(
                 "image_url": url,
                 "image_description": q.get("image_description", ""),
             }
+        except KeyError as e:
+            print(f"Skipping malformed image question: missing {e}")
 
-        return [await _build(q) for q in questions]
-    except Exception as e:
-        return []
+async def generate_image_questions(
+    vocab: str,
+    count: int,
+    custom_prompt: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    # Images render in parallel; keep the order the questions were generated in
+    items = [item async for item in iter_image_questions(vocab, count, custom_prompt)]
+    return [q for _, q in sorted(items, key=lambda item: item[0])]
 
 async def generate_voice_questions(
     content: str,
@@ -275,19 +366,22 @@ async def generate_voice_questions(
         diffucult_level=diffucult_level
     )
     try:
-        questions = await to_thread(generate_questions_with_retry, prompt)
+        with stage_timer("voice", "llm", count):
+            questions = await generate_questions_with_retry(prompt, List[ChoiceQuestionOutput])
 
-        async def _build(q):
-            audio = await to_thread(generate_audio, q["correct_answer"])
-            return {
+        with stage_timer("voice", "tts", len(questions)):
+            audios = await run_media(resolve_audio_batch, [q["correct_answer"] for q in questions])
+
+        return [
+            {
                 "question": q["question"],
                 "options": q["options"],
                 "correct_answer": q["correct_answer"],
                 "type": QuestionType.VOICE.value,
                 "audio_url": audio,
             }
-
-        return [await _build(q) for q in questions]
+            for q, audio in zip(questions, audios)
+        ]
     except Exception as e:
         return []
 
@@ -339,23 +433,33 @@ async def generate_pronunciation_questions(
         diffucult_level=diffucult_level
     )
     try:
-        questions = await to_thread(generate_questions_with_retry, prompt)
+        with stage_timer("pronunciation", "llm", count):
+            questions = await generate_questions_with_retry(prompt, List[PronunciationQuestionOutput])
+        words = [q["correct_answer"] for q in questions]
 
-        async def _build(q):
-            phonemes = get_phonemes(q["correct_answer"])
-            audio = await to_thread(generate_audio, q["correct_answer"])
-            return {
+        async def _phonemize():
+            with stage_timer("pronunciation", "phonemize", len(words)):
+                return await run_media(resolve_phonemes_batch, words)
+
+        async def _tts():
+            with stage_timer("pronunciation", "tts", len(words)):
+                return await run_media(resolve_audio_batch, words)
+
+        phonemes, audios = await asyncio.gather(_phonemize(), _tts())
+
+        return [
+            {
                 "question": q["question"],
-                "correct_answer": phonemes,
+                "correct_answer": ipa,
                 "type": QuestionType.PRONUNCIATION.value,
                 "audio_url": audio,
             }
-
-        return [await _build(q) for q in questions]
+            for q, ipa, audio in zip(questions, phonemes, audios)
+        ]
     except Exception as e:
         return []
 
-async def generate_questions_batch(
+async def _prepare_batch(
     quiz_id: int,
     contents: List[str],
     prior_contents: List[str],
@@ -366,9 +470,8 @@ async def generate_questions_batch(
     voice_count: int,
     custom_prompt: Optional[str] = None,
     dok_level: Optional[List[int]] = None,
-) -> Dict[str, List[Dict[str, Any]]]:
-    """Generate a batch of questions."""
-    
+) -> Dict[str, Any]:
+    """Build the generator inputs shared by every question type and store the prompt on the quiz."""
     # Combine chunks into one text
     combined_contents = "\n".join(contents)
     combined_text_chunks = "\n".join(text_chunks)
@@ -393,7 +496,8 @@ async def generate_questions_batch(
         combined_custom_prompt += f"\n\n{dok_prompt}"
     
     # Update new prompt
-    quiz_service.update_prompt(
+    await run_db(
+        quiz_service.update_prompt,
         quiz_id=quiz_id,
         contents=combined_contents,
         prior_contents=combined_prior_contents,
@@ -405,22 +509,55 @@ async def generate_questions_batch(
         custom_prompt=combined_custom_prompt,
     )
 
-    text_questions, image_questions, voice_questions, pronunciation_questions = await asyncio.gather(
-        generate_text_questions(
-            combined_contents,
-            combined_prior_contents,
-            combined_text_chunks,
-            multiple_choice_count,
-            combined_custom_prompt,
-        ),
-        generate_image_questions(combined_vocabs, image_count, custom_prompt),
-        generate_voice_questions(
-            combined_vocabs, listen_count, combined_text_chunks, custom_prompt, max(dok_level)
-        ),
-        generate_pronunciation_questions(
-            combined_vocabs, pronunciation_count, combined_text_chunks, custom_prompt, max(dok_level)
-        ),
+    return {
+        "contents": combined_contents,
+        "prior_contents": combined_prior_contents,
+        "text_chunks": combined_text_chunks,
+        "vocabs": combined_vocabs,
+        "custom_prompt": custom_prompt,
+        "combined_custom_prompt": combined_custom_prompt,
+        "multiple_choice_count": multiple_choice_count,
+        "image_count": image_count,
+        "listen_count": listen_count,
+        "pronunciation_count": pronunciation_count,
+        "dok_level": max(dok_level),
+    }
+
+async def generate_questions_batch(
+    quiz_id: int,
+    contents: List[str],
+    prior_contents: List[str],
+    vocabs: List[str],
+    text_chunks: List[str],
+    multiple_choice_count: int,
+    image_count: int,
+    voice_count: int,
+    custom_prompt: Optional[str] = None,
+    dok_level: Optional[List[int]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Generate a batch of questions."""
+    p = await _prepare_batch(
+        quiz_id, contents, prior_contents, vocabs, text_chunks,
+        multiple_choice_count, image_count, voice_count, custom_prompt, dok_level,
     )
+
+    with quiz_token_usage(quiz_id):
+        text_questions, image_questions, voice_questions, pronunciation_questions = await asyncio.gather(
+            generate_text_questions(
+                p["contents"],
+                p["prior_contents"],
+                p["text_chunks"],
+                p["multiple_choice_count"],
+                p["combined_custom_prompt"],
+            ),
+            generate_image_questions(p["vocabs"], p["image_count"], p["custom_prompt"]),
+            generate_voice_questions(
+                p["vocabs"], p["listen_count"], p["text_chunks"], p["custom_prompt"], p["dok_level"]
+            ),
+            generate_pronunciation_questions(
+                p["vocabs"], p["pronunciation_count"], p["text_chunks"], p["custom_prompt"], p["dok_level"]
+            ),
+        )
     
     return {
         "multiple_choice_questions": text_questions,
@@ -429,6 +566,71 @@ async def generate_questions_batch(
         "pronunciation_questions": pronunciation_questions
     }
 
+async def iter_questions_batch(
+    quiz_id: int,
+    contents: List[str],
+    prior_contents: List[str],
+    vocabs: List[str],
+    text_chunks: List[str],
+    multiple_choice_count: int,
+    image_count: int,
+    voice_count: int,
+    custom_prompt: Optional[str] = None,
+    dok_level: Optional[List[int]] = None,
+) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Same questions as generate_questions_batch, yielded as ``(group, questions)`` as soon as they are ready.
+
+    ``group`` is one of the keys of generate_questions_batch's result. Text,
+    voice and pronunciation questions arrive as one group each; image questions
+    arrive one by one, as their images finish rendering.
+    """
+    p = await _prepare_batch(
+        quiz_id, contents, prior_contents, vocabs, text_chunks,
+        multiple_choice_count, image_count, voice_count, custom_prompt, dok_level,
+    )
+    ready: asyncio.Queue = asyncio.Queue()
+
+    async def _whole(group: str, coro):
+        await ready.put((group, await coro))
+
+    async def _images():
+        async for _, question in iter_image_questions(p["vocabs"], p["image_count"], p["custom_prompt"]):
+            await ready.put(("image_questions", [question]))
+
+    # Tasks copy the context they are created in, so their LLM calls count towards this usage
+    with track_usage() as usage:
+        tasks = [
+            asyncio.create_task(_whole("multiple_choice_questions", generate_text_questions(
+                p["contents"], p["prior_contents"], p["text_chunks"], p["multiple_choice_count"], p["combined_custom_prompt"],
+            ))),
+            asyncio.create_task(_images()),
+            asyncio.create_task(_whole("voice_questions", generate_voice_questions(
+                p["vocabs"], p["listen_count"], p["text_chunks"], p["custom_prompt"], p["dok_level"],
+            ))),
+            asyncio.create_task(_whole("pronunciation_questions", generate_pronunciation_questions(
+                p["vocabs"], p["pronunciation_count"], p["text_chunks"], p["custom_prompt"], p["dok_level"],
+            ))),
+        ]
+    for task in tasks:
+        task.add_done_callback(lambda _: ready.put_nowait(None))
+
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await ready.get()
+            if item is None:
+                remaining -= 1
+            elif item[1]:
+                yield item
+        for task in tasks:
+            if not task.cancelled() and task.exception():
+                print(f"Question generation failed: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Also for aborted generations (client gone, failed stream): their tokens were billed too
+        record_quiz_tokens(quiz_id, usage)
+
 async def generate_questions_adaptive(
     quiz_id: int,
     contents: List[str],
@@ -463,23 +665,24 @@ async def generate_questions_adaptive(
     dok_level = dok_level.strip('{}').split(',')
     dok_level = max([DOK_LEVEL[i] for i in dok_level])
     
-    text_questions, image_questions, voice_questions, pronunciation_questions = await asyncio.gather(
-        generate_text_questions(
-            contents,
-            prior_contents,
-            text_chunks,
-            multiple_choice_count,
-            custom_prompt,
-            adaptive_prompt
-        ),
-        generate_image_questions(vocabs, image_count, custom_prompt),
-        generate_voice_questions(
-            vocabs, listen_count, text_chunks, custom_prompt, dok_level
-        ),
-        generate_pronunciation_questions(
-            vocabs, pronunciation_count, text_chunks, custom_prompt, dok_level
-        ),
-    )
+    with quiz_token_usage(quiz_id):
+        text_questions, image_questions, voice_questions, pronunciation_questions = await asyncio.gather(
+            generate_text_questions(
+                contents,
+                prior_contents,
+                text_chunks,
+                multiple_choice_count,
+                custom_prompt,
+                adaptive_prompt
+            ),
+            generate_image_questions(vocabs, image_count, custom_prompt),
+            generate_voice_questions(
+                vocabs, listen_count, text_chunks, custom_prompt, dok_level
+            ),
+            generate_pronunciation_questions(
+                vocabs, pronunciation_count, text_chunks, custom_prompt, dok_level
+            ),
+        )
     
     # Return questions to be appended to existing quiz
     return {
@@ -518,14 +721,60 @@ def parse_json_questions(response_text: str) -> List[Dict[str, Any]]:
         print(response_text)
         raise e
     
+def validate_questions(objects: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep the objects that have the GeneratedQuestion shape."""
+    questions = []
+    for obj in objects:
+        try:
+            questions.append(GeneratedQuestion.model_validate(obj).model_dump(exclude_none=True))
+        except ValidationError as e:
+            QUESTION_PARSE_DROPPED.labels(reason="invalid").inc()
+            print(f"Skipping invalid question: {e.errors()[0]['msg']}")
+    return questions
+
+async def stream_questions(
+    prompt: str, schema: Any = None, parser: Optional[JsonArrayParser] = None, prefix: str = ""
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each valid question as soon as the model has finished writing it.
+
+    ``schema`` (e.g. ``List[ChoiceQuestionOutput]``) constrains the model's output;
+    ``prefix`` is the stable start of the prompt (see unit_prompt_prefix).
+    """
+    parser = parser or JsonArrayParser()
+    async for delta in llm.astream_complete(prompt, prefix=prefix, response_schema=schema):
+        for question in validate_questions(parser.feed(delta)):
+            yield question
+
 @retry(stop=stop_after_attempt(2), wait=wait_fixed(1))
-def generate_questions_with_retry(prompt):
-    response = llm.complete(prompt)
+async def generate_questions_with_retry(prompt, schema: Any = None, prefix: str = ""):
+    mode = json_output_mode() if schema else "free"
+    outcome = lambda result: LLM_JSON_OUTPUTS.labels(task="questions", mode=mode, result=result).inc()
+
+    parser = JsonArrayParser()
+    questions = [q async for q in stream_questions(prompt, schema, parser, prefix)]
+    if parser.errors:
+        QUESTION_PARSE_DROPPED.labels(reason="malformed").inc(parser.errors)
+    if questions:
+        salvaged = parser.errors or parser.truncated or len(questions) < parser.objects
+        outcome("salvaged" if salvaged else "complete")
+        return questions
+
+    # Nothing salvageable, e.g. a single object or no array at all
     try:
-        return parse_json_questions(response.text)
+        questions = validate_questions(parse_json_questions(parser.text))
+        if questions:
+            outcome("salvaged")
+            return questions
+        raise ValueError("No valid question objects in the response")
     except Exception as e:
         print("Retrying question generation...")
         error_message = str(e)
-        fix_prompt = f"""The following output could not be parsed as valid JSON due to this error:\n\n{error_message}\n\nPlease fix the formatting and return only the corrected JSON array of question objects.\n\nOriginal (invalid) output:\n{response.text}"""
-        fixed_response = llm.complete(fix_prompt)
-        return parse_json_questions(fixed_response.text)
\ No newline at end of file
+        fix_prompt = f"""The following output could not be parsed as valid JSON due to this error:\n\n{error_message}\n\nPlease fix the formatting and return only the corrected JSON array of question objects.\n\nOriginal (invalid) output:\n{parser.text}"""
+        fixed_response = await llm.acomplete(fix_prompt, cache=False, response_schema=schema)
+        try:
+            questions = validate_questions(parse_json_questions(fixed_response.text))
+        except Exception:
+            outcome("failed")
+            raise
+        outcome("repaired" if questions else "failed")
+        return questions
@@ -1,17 +1,42 @@
 from typing import List, Dict, Any, Optional
 import json
+from psycopg2.extras import execute_values
 from ..database.database import get_db
 from ..schemas.quiz import QuizItem, QuizOption
 from ..schemas.quiz import QuestionType
 
+# Multi-row insert used by save_new_questions. Ids are drawn from the serial in
+# the CTE so each one comes back with the position (ord) of its input item; the
+# join skips the insert if the quiz does not exist.
+INSERT_QUESTIONS_SQL = """
+    WITH v AS (
+        SELECT nextval(pg_get_serial_sequence('quiz_questions', 'id')) AS id, r.*
+        FROM (VALUES %s) AS r(
+            ord, quiz_id, lesson_id, question_text, type, options,
+            correct_answer, explanation, image_url, audio_url
+        )
+        JOIN user_quizzes uq ON uq.id = r.quiz_id
+    ), inserted AS (
+        INSERT INTO quiz_questions (
+            id, quiz_id, lesson_id, question_text, type, options,
+            correct_answer, explanation, image_url, audio_url
+        )
+        SELECT id, quiz_id, lesson_id, question_text, type, options,
+               correct_answer, explanation, image_url, audio_url
+        FROM v
+        RETURNING id
+    )
+    SELECT v.id, v.ord FROM v JOIN inserted USING (id)
+"""
+INSERT_QUESTIONS_TEMPLATE = "(%s, %s, %s, %s, %s::question_type, %s::json, %s, %s, %s, %s)"
+
 class QuizService:
     def __init__(self):
         pass
 
     def get_quiz_questions(self, quiz_id: int, lesson_id: int = None) -> List[Dict]:
         """Get all questions for a quiz"""
-        conn = get_db()
-        try:
+        with get_db() as conn:
             with conn.cursor() as cur:
                 if lesson_id:
                     cur.execute("""
@@ -26,8 +51,150 @@ class QuizService:
                         ORDER BY id
                     """, (quiz_id,))
                 return cur.fetchall()
-        finally:
-            conn.close()
+
+    def get_quiz_owner(self, quiz_id: int) -> Optional[Dict]:
+        """Get owner and visibility of a quiz"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT user_id, visibility FROM user_quizzes WHERE id = %s
+                """, (quiz_id,))
+                return cur.fetchone()
+
+    def get_questions_with_user_answers(self, quiz_id: int) -> List[Dict]:
+        """Get all questions of a quiz joined with user answers and quiz metadata"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT 
+                        q.id AS question_id,
+                        q.question_text,
+                        q.type,
+                        q.options,
+                        q.correct_answer,
+                        q.explanation,
+                        q.image_url,
+                        q.audio_url,
+                        ua.user_answer,
+                        ua.is_correct,
+                        ua.user_phonemes,
+                        uq.created_at,
+                        uq.user_id AS quiz_owner_id,
+                        uq.visibility,
+                        uq.title AS quiz_title,
+                        c.title AS curriculum_title
+                    FROM quiz_questions q
+                    LEFT JOIN user_answers ua ON ua.question_id = q.id
+                    JOIN user_quizzes uq ON q.quiz_id = uq.id
+                    JOIN units u ON uq.unit_id = u.id
+                    JOIN curriculums c ON u.curriculum_id = c.id
+                    WHERE q.quiz_id = %s
+                    ORDER BY q.id
+                """, (quiz_id,))
+                return cur.fetchall()
+
+    def get_strengths_weaknesses(self, quiz_id: int) -> Optional[Dict]:
+        """Get the latest performance analysis of a quiz"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT strengths, weaknesses
+                    FROM user_quizzes
+                    WHERE id = %s
+                """, (quiz_id,))
+                return cur.fetchone()
+
+    def update_visibility(self, quiz_id: int, visibility: bool) -> Optional[Dict]:
+        """Update quiz visibility and return the updated quiz"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE user_quizzes
+                    SET visibility = %s
+                    WHERE id = %s
+                    RETURNING id, user_id, unit_id, title, visibility, created_at
+                """, (visibility, quiz_id))
+                updated = cur.fetchone()
+                conn.commit()
+                return updated
+
+    def rename_title(self, quiz_id: int, title: str) -> Optional[Dict]:
+        """Rename a quiz and return the updated quiz"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE user_quizzes
+                    SET title = %s
+                    WHERE id = %s
+                    RETURNING id, user_id, unit_id, title, visibility, created_at
+                """, (title, quiz_id))
+                updated = cur.fetchone()
+                conn.commit()
+                return updated
+
+    def delete_quiz(self, quiz_id: int) -> Optional[Dict]:
+        """Delete a quiz and return the deleted row"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM user_quizzes
+                    WHERE id = %s
+                    RETURNING *
+                """, (quiz_id,))
+                deleted = cur.fetchone()
+                conn.commit()
+                return deleted
+
+    def save_explanation(self, question_id: int, explanation: str) -> None:
+        """Store the generated explanation of a question"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE quiz_questions 
+                    SET explanation = %s 
+                    WHERE id = %s
+                """, (explanation, question_id))
+            conn.commit()
+
+    def get_pronunciation_question(self, question_id: int) -> Optional[Dict]:
+        """Get text and IPA answer of a pronunciation question"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT question_text, correct_answer 
+                    FROM quiz_questions 
+                        WHERE id = %s AND type = 'PRONUNCIATION'
+                """, (question_id,))
+                return cur.fetchone()
+
+    def save_pronunciation_attempt(
+        self,
+        user_id: str,
+        question_id: int,
+        audio_url: str,
+        user_phonemes: str,
+        is_correct: bool,
+        explanation: str,
+    ) -> None:
+        """Store a user's recorded pronunciation and its explanation"""
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                # Update user_answers: lưu userPhonemes
+                cur.execute("""
+                    INSERT INTO user_answers (user_id, question_id, user_answer, user_phonemes, is_correct)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (user_id, question_id) DO UPDATE SET
+                        user_phonemes = EXCLUDED.user_phonemes,
+                        submitted_at = NOW()
+                """, (user_id, question_id, audio_url, user_phonemes, is_correct))
+
+                # Update quiz_questions: lưu explanation
+                cur.execute("""
+                    UPDATE quiz_questions 
+                    SET explanation = %s 
+                    WHERE id = %s
+                """, (explanation, question_id))
+            conn.commit()
 
     def convert_db_question_to_quiz_item(self, question: Dict) -> QuizItem:
         """Convert a database question to a QuizItem"""
@@ -76,94 +243,75 @@ class QuizService:
             challengeOptions=challenge_options
         )
 
-    def save_new_questions(self, quiz_id: int, new_items: List[QuizItem], lesson_id: int = 0):
-        """Save new questions to database"""
-        conn = get_db()
-        try:
-            with conn.cursor() as cur:
-                # Verify quiz exists
-                cur.execute("""
-                    SELECT id, user_id, unit_id 
-                    FROM user_quizzes 
-                    WHERE id = %s
-                """, (quiz_id,))
-                quiz = cur.fetchone()
-                if not quiz:
-                    print(f"Quiz {quiz_id} not found!")
-                    return
-                
-                print(f"\n=== Quiz {quiz_id} Found ===")
+    @staticmethod
+    def stored_correct_answer(item: QuizItem) -> Optional[str]:
+        """Correct answer saved for a QuizItem; items without one are not saved"""
+        # Handle pronunciation questions differently
+        if item.type == "pronunciation":
+            return item.correctAnswer
+        return next((opt.text for opt in item.challengeOptions if opt.correct), None)
 
-                # Get current question count
-                cur.execute("""
-                    SELECT COUNT(*) 
-                    FROM quiz_questions 
-                    WHERE quiz_id = %s
-                """, (quiz_id,))
-                current_count = cur.fetchone()['count']
-                print(f"Current question count: {current_count}")
+    def build_question_rows(self, quiz_id: int, new_items: List[QuizItem], lesson_id: int = 0) -> List[tuple]:
+        """Convert QuizItems into parameter rows for INSERT_QUESTIONS_SQL"""
+        rows = []
+        for position, item in enumerate(new_items):
+            # Empty options for pronunciation
+            options = [] if item.type == "pronunciation" else [
+                {
+                    "text": opt.text,
+                    "correct": opt.correct
+                } for opt in item.challengeOptions
+            ]
+            correct_answer = self.stored_correct_answer(item)
+
+            if not correct_answer:
+                print(f"Warning: No correct answer found for question {item.id}")
+                continue
+
+            rows.append((
+                position, quiz_id, lesson_id,
+                item.question, item.type.value.upper(),
+                json.dumps(options), correct_answer,
+                item.explanation, item.imageUrl, item.audioUrl
+            ))
 
-                # Add new questions
-                questions_added = 0
-                for item in new_items:
-                    try:
-                        # Handle pronunciation questions differently
-                        if item.type == "pronunciation":
-                            options = []  # Empty options for pronunciation
-                            correct_answer = item.correctAnswer
-                        else:
-                            options = [
-                                {
-                                    "text": opt.text,
-                                    "correct": opt.correct
-                                } for opt in item.challengeOptions
-                            ]
-                            correct_answer = next((opt.text for opt in item.challengeOptions if opt.correct), None)
-                            
-                        if not correct_answer:
-                            print(f"Warning: No correct answer found for question {item.id}")
-                            continue
-                        
-                        cur.execute("""
-                            INSERT INTO quiz_questions (
-                                quiz_id, lesson_id, question_text, type, options, 
-                                correct_answer, explanation, image_url, audio_url
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            RETURNING id
-                        """, (
-                            quiz_id, lesson_id,
-                            item.question, item.type.value.upper(),
-                            json.dumps(options), correct_answer,
-                            item.explanation, item.imageUrl, item.audioUrl
-                        ))
-                        new_id = cur.fetchone()['id']
-                        questions_added += 1
-                        print(f"Added question {new_id}: {item.question[:50]}...")
-                    except Exception as e:
-                        print(item.type.upper())
-                        print(f"Error adding question: {str(e)}")
-                        continue
+        return rows
 
+    def save_new_questions(self, quiz_id: int, new_items: List[QuizItem], lesson_id: int = 0) -> List[Optional[int]]:
+        """Save new questions to database in a single round trip.
+
+        Returns one entry per item of ``new_items``: the id of its question, or
+        None for an item that was skipped because it has no correct answer.
+        Nothing is inserted, and [] is returned, when the quiz does not exist.
+        """
+        rows = self.build_question_rows(quiz_id, new_items, lesson_id)
+        if not rows:
+            return []
+
+        with get_db() as conn:
+            try:
+                with conn.cursor() as cur:
+                    inserted = execute_values(
+                        cur, INSERT_QUESTIONS_SQL, rows,
+                        template=INSERT_QUESTIONS_TEMPLATE,
+                        page_size=len(rows),  # one statement, one round trip
+                        fetch=True,
+                    )
                 conn.commit()
-                
-                # Get final question count
-                cur.execute("""
-                    SELECT COUNT(*) 
-                    FROM quiz_questions 
-                    WHERE quiz_id = %s
-                """, (quiz_id,))
-                final_count = cur.fetchone()['count']
-                
-                print(f"\n=== Quiz After Adding Questions ===")
-                print(f"Questions added: {questions_added}")
-                print(f"Total questions: {final_count}")
-                print("=====================================\n")
+            except Exception as e:
+                print(f"Error in save_new_questions: {str(e)}")
+                conn.rollback()
+                return []
+
+        if not inserted:
+            print(f"Quiz {quiz_id} not found!")
+            return []
 
-        except Exception as e:
-            print(f"Error in save_new_questions: {str(e)}")
-            conn.rollback()
-        finally:
-            conn.close()
+        question_ids: List[Optional[int]] = [None] * len(new_items)
+        for row in inserted:
+            question_ids[row['ord']] = row['id']
+        print(f"Quiz {quiz_id}: added {len(inserted)} questions")
+        return question_ids
 
     def append_questions_to_quiz(
         self,
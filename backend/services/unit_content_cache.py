@@ -0,0 +1,295 @@
+# backend/services/unit_content_cache.py
+"""
+Per-unit cache of textbook content for quiz generation.
+
+``unit_contents`` only changes when the curriculum is re-imported, so each
+unit's VOCABULARY, BOOKMAP (with its Grammar already parsed) and TEXT_CONTENT,
+plus the ids of the units before it, are loaded once into a ``UnitBundle``.
+Bundles live in this process and, optionally, in Redis for the other workers;
+at startup one worker loads them from the database while the others wait for
+it and read them from Redis. Units without any content are never cached.
+All of them belong to the content version stored in Redis: after changing
+``unit_contents``, run ``python -m backend.services.unit_content_cache bump``
+and every worker drops its copies within UNIT_CACHE_CHECK_INTERVAL seconds.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import redis
+from prometheus_client import Counter
+from ..database.database import get_db
+from ..integrators.api_key_manager import get_redis
+
+UNIT_CACHE_REDIS = os.getenv("UNIT_CACHE_REDIS", "1") == "1"                        # share bundles between workers
+UNIT_CACHE_TTL = int(os.getenv("UNIT_CACHE_TTL", str(7 * 24 * 3600)))               # seconds, Redis copies only
+UNIT_CACHE_CHECK_INTERVAL = float(os.getenv("UNIT_CACHE_CHECK_INTERVAL", "30"))      # seconds between version checks
+UNIT_CACHE_PREWARM_WAIT = float(os.getenv("UNIT_CACHE_PREWARM_WAIT", "30"))         # seconds without progress before another worker takes over a prewarm
+UNIT_CACHE_PREWARM_BATCH = 50  # units loaded per query during prewarm; stop requests are checked between batches
+PREVIOUS_UNITS = 20          # units whose vocabulary counts as prior knowledge
+PREVIOUS_GRAMMAR_UNITS = 5   # units whose grammar counts as prior knowledge
+
+UNIT_CACHE_REQUESTS = Counter("unit_content_cache_requests_total", "Unit content lookups", ["result"])
+
+_VERSION_KEY = "unitcache:version"
+
+
+class UnitBundle(NamedTuple):
+    vocab: Optional[str]        # first VOCABULARY row
+    bookmap: Optional[str]      # first BOOKMAP row
+    vocab_rows: List[str]       # every VOCABULARY row
+    grammar: List[str]          # "Grammar" of every BOOKMAP row
+    text_chunks: List[str]      # every TEXT_CONTENT row
+    prev_unit_ids: List[int]    # up to PREVIOUS_UNITS earlier units, newest first
+
+    @property
+    def empty(self) -> bool:
+        return not (self.vocab_rows or self.grammar or self.text_chunks)
+
+
+def _fetch_unit_ids() -> List[int]:
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM units ORDER BY id")
+            return [row["id"] for row in cur.fetchall()]
+
+
+def _fetch_bundles(unit_ids: Optional[List[int]] = None) -> Dict[int, UnitBundle]:
+    """Load bundles for ``unit_ids`` (all units when None) in two queries."""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM units ORDER BY id")
+            all_ids = [row["id"] for row in cur.fetchall()]
+            if unit_ids is None:
+                unit_ids = all_ids
+            cur.execute("""
+                SELECT unit_id, type, content
+                FROM unit_contents
+                WHERE unit_id = ANY(%s) AND type IN ('VOCABULARY', 'BOOKMAP', 'TEXT_CONTENT')
+                ORDER BY unit_id, "order"
+            """, (list(unit_ids),))
+            rows = cur.fetchall()
+
+    contents = {unit_id: {"VOCABULARY": [], "BOOKMAP": [], "TEXT_CONTENT": []} for unit_id in unit_ids}
+    for row in rows:
+        contents[row["unit_id"]][row["type"]].append(row["content"])
+
+    bundles = {}
+    for unit_id, by_type in contents.items():
+        vocab_rows, bookmaps = by_type["VOCABULARY"], by_type["BOOKMAP"]
+        earlier = [i for i in all_ids if i < unit_id]
+        bundles[unit_id] = UnitBundle(
+            vocab=vocab_rows[0] if vocab_rows else None,
+            bookmap=bookmaps[0] if bookmaps else None,
+            vocab_rows=vocab_rows,
+            grammar=[json.loads(bookmap).get("Grammar", "") for bookmap in bookmaps],
+            text_chunks=by_type["TEXT_CONTENT"],
+            prev_unit_ids=earlier[::-1][:PREVIOUS_UNITS],
+        )
+    return bundles
+
+
+class UnitContentCache:
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        use_redis: bool = UNIT_CACHE_REDIS,
+        ttl: int = UNIT_CACHE_TTL,
+        check_interval: float = UNIT_CACHE_CHECK_INTERVAL,
+        prewarm_wait: float = UNIT_CACHE_PREWARM_WAIT,
+        fetch=_fetch_bundles,
+        list_units=_fetch_unit_ids,
+    ):
+        self._redis = redis_client
+        self.use_redis = use_redis
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.prewarm_wait = prewarm_wait
+        self._fetch = fetch
+        self._list_units = list_units
+        self._stop = threading.Event()
+        self._local: Dict[int, UnitBundle] = {}
+        self._version = "0"
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = get_redis()
+        return self._redis
+
+    def _key(self, unit_id) -> str:
+        return f"unitcache:{self._version}:{unit_id}"
+
+    def _check_version(self):
+        """Drop local bundles once the content version in Redis has moved on."""
+        now = time.monotonic()
+        if not self.use_redis or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            version = self.redis.get(_VERSION_KEY) or "0"
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+            return
+        with self._lock:
+            if version != self._version:
+                print(f"[UnitCache] Content version {self._version} -> {version}, dropping {len(self._local)} units")
+                self._version = version
+                self._local.clear()
+
+    def get_many(self, unit_ids: Iterable[int]) -> Dict[int, UnitBundle]:
+        self._check_version()
+        unit_ids = list(dict.fromkeys(unit_ids))
+        found = {unit_id: self._local[unit_id] for unit_id in unit_ids if unit_id in self._local}
+        UNIT_CACHE_REQUESTS.labels(result="hit_local").inc(len(found))
+        missing = [unit_id for unit_id in unit_ids if unit_id not in found]
+
+        if missing and self.use_redis:
+            try:
+                values = self.redis.mget([self._key(unit_id) for unit_id in missing])
+            except redis.RedisError as e:
+                print(f"[UnitCache] Redis unavailable: {e}")
+                values = [None] * len(missing)
+            from_redis = {
+                unit_id: UnitBundle(**json.loads(value))
+                for unit_id, value in zip(missing, values) if value is not None
+            }
+            UNIT_CACHE_REQUESTS.labels(result="hit_redis").inc(len(from_redis))
+            self._store(from_redis, to_redis=False)
+            found.update(from_redis)
+            missing = [unit_id for unit_id in missing if unit_id not in from_redis]
+
+        if missing:
+            UNIT_CACHE_REQUESTS.labels(result="miss").inc(len(missing))
+            fetched = self._fetch(missing)
+            self._store(fetched)
+            found.update(fetched)
+        return found
+
+    def get(self, unit_id: int) -> UnitBundle:
+        return self.get_many([unit_id])[unit_id]
+
+    def _store(self, bundles: Dict[int, UnitBundle], to_redis: bool = True):
+        # An unknown unit, or one whose content is not imported yet, is read again next time
+        bundles = {unit_id: bundle for unit_id, bundle in bundles.items() if not bundle.empty}
+        with self._lock:
+            self._local.update(bundles)
+        if not (bundles and to_redis and self.use_redis):
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for unit_id, bundle in bundles.items():
+                pipe.set(self._key(unit_id), json.dumps(bundle._asdict(), ensure_ascii=False), ex=self.ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+
+    def prewarm(self) -> int:
+        """Load every unit, so quiz generation does not have to. Returns the number of units loaded.
+
+        The first worker to start reads the database and publishes the unit ids;
+        the others read the bundles from Redis instead of repeating the full read.
+        Units are loaded in batches, so ``stop_prewarm`` takes effect between two of them.
+        """
+        self._checked_at = 0.0
+        self._check_version()
+        started = time.perf_counter()
+        loaded = 0
+        owner = False
+        try:
+            unit_ids = self._shared_unit_ids() if self.use_redis else None
+            from_db = unit_ids is None
+            owner = from_db and self.use_redis  # holds the prewarm claim
+            if from_db:
+                unit_ids = self._list_units()
+            for start in range(0, len(unit_ids), UNIT_CACHE_PREWARM_BATCH):
+                if self._stop.is_set():
+                    print(f"[UnitCache] Prewarm stopped after {loaded} units")
+                    return loaded
+                batch = unit_ids[start:start + UNIT_CACHE_PREWARM_BATCH]
+                if owner:
+                    # Keeps the claim alive, so the waiting workers do not start a second run
+                    self._refresh_prewarm_claim()
+                if from_db:
+                    bundles = self._fetch(batch)
+                    self._store(bundles)
+                else:
+                    bundles = self.get_many(batch)
+                loaded += len(bundles)
+            if owner:
+                self._publish_unit_ids(unit_ids)
+        except Exception as e:
+            # Units are then loaded on first use
+            print(f"[UnitCache] Prewarm failed: {e}")
+            return loaded
+        finally:
+            if owner:
+                self._release_prewarm_claim()
+        print(f"[UnitCache] Prewarmed {loaded} units in {time.perf_counter() - started:.2f}s")
+        return loaded
+
+    def stop_prewarm(self):
+        """Make a running prewarm return after its current batch (at shutdown, before the DB pool closes)."""
+        self._stop.set()
+
+    @property
+    def _claim_ttl(self) -> int:
+        return max(int(self.prewarm_wait), 1)
+
+    def _shared_unit_ids(self) -> Optional[List[int]]:
+        """Unit ids published by the worker that prewarmed this version; None when this worker has to do it."""
+        try:
+            while not self._stop.is_set():
+                unit_ids = self.redis.get(self._key("ids"))
+                if unit_ids is not None:
+                    return json.loads(unit_ids)
+                # Single flight: the worker that takes the claim reads the database, the others wait for its ids
+                # for as long as it keeps refreshing the claim
+                if self.redis.set(self._key("prewarm"), "1", nx=True, ex=self._claim_ttl):
+                    return None
+                self._stop.wait(0.5)
+            return []
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+            return None
+
+    def _refresh_prewarm_claim(self):
+        try:
+            self.redis.expire(self._key("prewarm"), self._claim_ttl)
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+
+    def _release_prewarm_claim(self):
+        try:
+            self.redis.delete(self._key("prewarm"))
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+
+    def _publish_unit_ids(self, unit_ids: List[int]):
+        try:
+            self.redis.set(self._key("ids"), json.dumps(unit_ids), ex=self.ttl)
+        except redis.RedisError as e:
+            print(f"[UnitCache] Redis unavailable: {e}")
+
+    def bump_version(self) -> str:
+        """Invalidate every worker's bundles after unit_contents changed."""
+        version = str(self.redis.incr(_VERSION_KEY))
+        with self._lock:
+            self._version = version
+            self._local.clear()
+        return version
+
+
+unit_content_cache = UnitContentCache()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["bump"]:
+        print(f"Unit content version is now {unit_content_cache.bump_version()}")
+    else:
+        print("Usage: python -m backend.services.unit_content_cache bump")
+        sys.exit(2)
@@ -1,98 +1,45 @@
-import json
-import psycopg2
 import random
 from typing import List
 from ..database.database import get_db
+from .unit_content_cache import unit_content_cache, PREVIOUS_GRAMMAR_UNITS
        
 def get_unit_main_chunks(unit_id: int) -> List[str]:
     """Get VOCABULARY and BOOKMAP chunks for a unit"""
-    conn = get_db()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT type, content 
-                FROM unit_contents 
-                WHERE unit_id = %s AND type IN ('VOCABULARY', 'BOOKMAP')
-                ORDER BY "order"
-            """, (unit_id,))
-            results = cur.fetchall()
+    bundle = unit_content_cache.get(unit_id)
+    vocab = bundle.vocab
 
-            vocab = None
-            bookmap = None
+    # Unit chunks keep the stored order: they open the question prompt prefix shared across students
+    unit_chunks = ["Vocab: ", vocab, "Bookmap: ", bundle.bookmap]
 
-            for row in results:
-                row_type = row["type"]
-                if row_type == "VOCABULARY" and vocab is None:
-                    vocab = row["content"]
-                elif row_type == "BOOKMAP" and bookmap is None:
-                    bookmap = row["content"]
+    if vocab:
+        vocab_list = vocab.splitlines()
+        random.shuffle(vocab_list)
+        vocab = "\n".join(vocab_list)
 
-            if vocab:
-                vocab_list = vocab.splitlines()
-                random.shuffle(vocab_list)
-                vocab = "\n".join(vocab_list)
-                
-            unit_chunks = ["Vocab: ", vocab, "Bookmap: ", bookmap]
-            return unit_chunks, vocab
-    finally:
-        conn.close()
+    return unit_chunks, vocab
 
 def get_unit_subordinate_chunks(unit_id: int) -> List[str]:
     """Get VOCABULARY from 20 previous units and TEXT_CONTENT from the current unit."""
-    conn = get_db()
-    try:
-        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            # 1. Lấy TEXT_CONTENT của unit hiện tại
-            cur.execute("""
-                SELECT content 
-                FROM unit_contents 
-                WHERE unit_id = %s AND type = 'TEXT_CONTENT'
-                ORDER BY "order"
-            """, (unit_id,))
-            text_chunks = [row["content"] for row in cur.fetchall()]
-            
-            # 2. Lấy VOCAB của tối đa 20 unit trước đó
-            cur.execute("""
-                SELECT id FROM units
-                WHERE id < %s
-                ORDER BY id DESC
-                LIMIT 20
-            """, (unit_id,))
-            prev_unit_ids = [row["id"] for row in cur.fetchall()]
-
-            vocab_chunks = []
-            if prev_unit_ids:
-                cur.execute("""
-                    SELECT content 
-                    FROM unit_contents
-                    WHERE unit_id = ANY(%s) AND type = 'VOCABULARY'
-                    ORDER BY unit_id ASC, "order"
-                """, (prev_unit_ids,))
-                vocab_chunks = [row["content"] for row in cur.fetchall()]
-                
-            # 3. Lấy GRAMMAR của tối đa 5 unit trước đó
-            bookmap_chunks = []
-            prev_unit_ids = prev_unit_ids[:5] if len(prev_unit_ids) > 5 else prev_unit_ids
-            if prev_unit_ids:
-                cur.execute("""
-                    SELECT unit_id, content
-                    FROM unit_contents
-                    WHERE unit_id = ANY(%s) AND type = 'BOOKMAP'
-                    ORDER BY unit_id DESC, "order"
-                """, (prev_unit_ids,))
-                bookmap_chunks = [
-                    json.loads(row["content"]).get("Grammar", "")
-                    for row in cur.fetchall()
-                ]
+    bundle = unit_content_cache.get(unit_id)
+    previous = unit_content_cache.get_many(bundle.prev_unit_ids)
 
-            return vocab_chunks, text_chunks, bookmap_chunks
-    finally:
-        conn.close()
+    # VOCAB của tối đa 20 unit trước đó, unit cũ trước
+    vocab_chunks = [
+        vocab
+        for prev_id in sorted(bundle.prev_unit_ids)
+        for vocab in previous[prev_id].vocab_rows
+    ]
+    # GRAMMAR của tối đa 5 unit trước đó, unit mới trước
+    bookmap_chunks = [
+        grammar
+        for prev_id in bundle.prev_unit_ids[:PREVIOUS_GRAMMAR_UNITS]
+        for grammar in previous[prev_id].grammar
+    ]
+    return vocab_chunks, list(bundle.text_chunks), bookmap_chunks
 
 def get_units_by_ids(unit_ids: List[int]) -> List[dict]:
     """Get multiple units by their IDs"""
-    conn = get_db()
-    try:
+    with get_db() as conn:
         with conn.cursor() as cur:
             placeholders = ','.join(['%s'] * len(unit_ids))
             cur.execute(f"""
@@ -100,5 +47,3 @@ def get_units_by_ids(unit_ids: List[int]) -> List[dict]:
                 WHERE id IN ({placeholders})
             """, tuple(unit_ids))
             return cur.fetchall()
-    finally:
-        conn.close() 
\ No newline at end of file
@@ -0,0 +1,106 @@
+# backend/services/user_audio.py
+"""
+Decoding and storage of learners' pronunciation recordings.
+
+Uploads are decoded in memory: the bytes go to ffmpeg on stdin and come back on
+stdout as 16 kHz mono float32, the input wav2vec2 expects, so nothing touches
+the disk before ASR. The recording itself is kept in a compressed format:
+browser recordings (webm/ogg/mp4 with Opus or AAC) are stored as uploaded, and
+anything else (e.g. WAV) is encoded to AAC.
+"""
+import os
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+import numpy as np
+from prometheus_client import Histogram
+
+ASR_SAMPLING_RATE = 16000
+USER_AUDIO_DIR = Path("media/users")
+USER_AUDIO_BITRATE = os.getenv("USER_AUDIO_BITRATE", "48k")  # AAC bitrate for uploads that arrive uncompressed
+COMPRESSED_UPLOADS = {".webm", ".ogg", ".oga", ".opus", ".m4a", ".mp4", ".mp3", ".aac"}
+
+UPLOAD_STAGE_SECONDS = Histogram(
+    "pronunciation_upload_stage_seconds", "Time per stage of a pronunciation upload", ["stage"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+UPLOAD_SECONDS = Histogram(
+    "pronunciation_upload_seconds", "End-to-end latency of /api/upload-audio",
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30),
+)
+
+
+class AudioDecodeError(Exception):
+    pass
+
+
+async def _ffmpeg(args: List[str], data: bytes = b"") -> bytes:
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", *args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate(data)
+    if proc.returncode != 0:
+        raise AudioDecodeError(err.decode(errors="replace").strip() or f"ffmpeg exited with {proc.returncode}")
+    return out
+
+
+_TO_SAMPLES = ["-ac", "1", "-ar", str(ASR_SAMPLING_RATE), "-f", "f32le", "pipe:1"]
+
+async def decode_audio(data: bytes, extension: str = "") -> np.ndarray:
+    """Any container/codec ffmpeg reads -> mono float32 samples at 16 kHz."""
+    started = time.perf_counter()
+    try:
+        raw = await _ffmpeg(["-i", "pipe:0", *_TO_SAMPLES], data)
+    except AudioDecodeError:
+        # MP4 with its index at the end cannot be read from a pipe; only then go through a file
+        with tempfile.NamedTemporaryFile(suffix=extension or ".bin") as f:
+            f.write(data)
+            f.flush()
+            raw = await _ffmpeg(["-i", f.name, *_TO_SAMPLES])
+    samples = np.frombuffer(raw, dtype=np.float32)
+    if samples.size == 0:
+        raise AudioDecodeError("Recording contains no audio")
+    UPLOAD_STAGE_SECONDS.labels(stage="decode").observe(time.perf_counter() - started)
+    return samples
+
+
+def asr_input(samples: np.ndarray) -> Dict[str, Any]:
+    return {"raw": samples, "sampling_rate": ASR_SAMPLING_RATE}
+
+
+def recording_name(stem: str, extension: str) -> str:
+    """File name of a stored recording: compressed uploads keep their format, the rest becomes AAC."""
+    return f"{stem}{extension}" if extension in COMPRESSED_UPLOADS else f"{stem}.m4a"
+
+
+async def save_recording(name: str, data: bytes, samples: np.ndarray, extension: str) -> Path:
+    """Store a recording uploaded as ``extension`` under USER_AUDIO_DIR/name (see recording_name); visible only once complete."""
+    started = time.perf_counter()
+    USER_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
+    path = USER_AUDIO_DIR / name
+    tmp = USER_AUDIO_DIR / f".tmp-{name}"
+    try:
+        if extension in COMPRESSED_UPLOADS:
+            await asyncio.to_thread(tmp.write_bytes, data)
+        else:
+            await _ffmpeg([
+                "-f", "f32le", "-ar", str(ASR_SAMPLING_RATE), "-ac", "1", "-i", "pipe:0",
+                "-c:a", "aac", "-b:a", USER_AUDIO_BITRATE, "-f", "mp4", "-y", str(tmp),
+            ], samples.astype(np.float32).tobytes())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    UPLOAD_STAGE_SECONDS.labels(stage="persist").observe(time.perf_counter() - started)
+    return path
+
+
+async def discard_recording(save: "asyncio.Task[Path]", name: str):
+    """Wait for a save_recording task whose upload failed, then delete what it stored."""
+    await asyncio.wait([save])
+    if not save.cancelled() and save.exception() is not None:
+        print(f"Error saving recording {name}: {save.exception()}")
+    (USER_AUDIO_DIR / name).unlink(missing_ok=True)
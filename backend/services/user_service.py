@@ -0,0 +1,25 @@
+from typing import Optional, Dict
+from ..database.database import get_db
+
+def get_user_hearts(user_id: str) -> Optional[Dict]:
+    """Get id and hearts of a user"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, hearts
+                FROM users
+                WHERE id = %s
+            """, (user_id,))
+            return cur.fetchone()
+
+def get_user_by_id(user_id: str) -> Optional[Dict]:
+    """Get profile fields of a user"""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, name, image_src, role, hearts, 
+                       subscription_status, subscription_start_date, subscription_end_date
+                FROM users
+                WHERE id = %s
+            """, (user_id,))
+            return cur.fetchone()
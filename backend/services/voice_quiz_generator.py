@@ -1,53 +1,228 @@
-import re
+import os
+import wave
+import sqlite3
+import ctypes
+import ctypes.util
+import asyncio
+import functools
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 from gtts import gTTS 
 from pathlib import Path
-from ..config.settings import asr_model
+from ..integrators.asr import get_asr
+from .audio_store import audio_store
+from .audio_library import BOOK_CONTENT_DIR, iter_curriculum_headwords
+from .phoneme_lexicon import phoneme_lexicon, normalize_text as normalize_phoneme_text
 from phonemizer import phonemize
 import json
 from nltk.metrics import edit_distance
 from difflib import SequenceMatcher
 
+PHONEME_ACCENTS = ['en-gb', 'en-us']
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "4"))  # concurrent TTS / espeak jobs per process
+
+_media_executor = None
+
+def _get_media_executor() -> ThreadPoolExecutor:
+    global _media_executor
+    if _media_executor is None:
+        _media_executor = ThreadPoolExecutor(max_workers=MEDIA_WORKERS, thread_name_prefix="media")
+    return _media_executor
+
+async def run_media(func, *args, **kwargs):
+    """Run blocking TTS/phonemizer work on the bounded media pool instead of the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_media_executor(), functools.partial(func, *args, **kwargs))
+
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts")        # "gtts" (Google, online) or "espeak" (local, offline)
+GTTS_VOICE = os.getenv("GTTS_VOICE", "com")          # gTTS tld, picks the accent (com, co.uk, com.au, ...)
+GTTS_CONCURRENCY = int(os.getenv("GTTS_CONCURRENCY", "4"))  # parallel gTTS requests within one batch
+ESPEAK_VOICE = os.getenv("ESPEAK_VOICE", "en-us")    # espeak voice used for English text
+
+# === TTS engines ===
+class TTSEngine(ABC):
+    """Text-to-speech backend; ``voice`` goes into the audio store key, so engines and voices never share clips."""
+    name = ""
+    extension = "mp3"
+
+    def __init__(self, voice: str):
+        self.voice = voice
+
+    @property
+    def store_voice(self) -> str:
+        return f"{self.name}:{self.voice}"
+
+    @abstractmethod
+    def synthesize(self, text: str, language: str, output_path: Path):
+        """Write the speech for ``text`` to ``output_path`` in this engine's ``extension`` format."""
+
+    def synthesize_batch(self, items: List[Tuple[str, str, Path]]):
+        """Synthesize many (text, language, output path) items; a failed item leaves its file empty."""
+        for text, language, output_path in items:
+            try:
+                self.synthesize(text, language, output_path)
+            except Exception as e:
+                print(f"[TTS-{self.name}] Failed to synthesize {text!r}: {e}")
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS: one HTTPS round trip per text, so batches are sent concurrently."""
+    name = "gtts"
+    extension = "mp3"
+
+    def synthesize(self, text: str, language: str, output_path: Path):
+        gTTS(text=text, lang=language, tld=self.voice, slow=False).save(str(output_path))
+
+    def synthesize_batch(self, items: List[Tuple[str, str, Path]]):
+        if len(items) <= 1:
+            return super().synthesize_batch(items)
+        with ThreadPoolExecutor(max_workers=min(GTTS_CONCURRENCY, len(items)), thread_name_prefix="gtts") as pool:
+            list(pool.map(lambda item: super(GTTSEngine, self).synthesize_batch([item]), items))
+
+
+_ESPEAK_AUDIO_OUTPUT_SYNCHRONOUS = 2
+_ESPEAK_CHARS_UTF8 = 1
+_ESPEAK_SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+class EspeakEngine(TTSEngine):
+    """
+    Offline synthesis with the espeak(-ng) library already installed for phonemizer.
+
+    The library is loaded once into the process and called directly, so a batch of
+    words costs no subprocess or network round trip. libespeak keeps global state,
+    hence one lock around every synthesis.
+    """
+    name = "espeak"
+    extension = "wav"
+    # One library instance per process, shared by every EspeakEngine
+    _lock = threading.Lock()
+    _lib = None
+    _sample_rate = 0
+    _chunks: List[bytes] = []
+    _callback = None
+
+    @classmethod
+    def _load(cls):
+        if cls._lib is not None:
+            return
+        path = os.getenv("ESPEAK_LIBRARY") or ctypes.util.find_library("espeak-ng") or ctypes.util.find_library("espeak")
+        if not path:
+            raise RuntimeError("espeak library not found; install espeak-ng or set ESPEAK_LIBRARY")
+        lib = ctypes.CDLL(path)
+        lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.espeak_Initialize.restype = ctypes.c_int
+        lib.espeak_SetSynthCallback.argtypes = [_ESPEAK_SYNTH_CALLBACK]
+        lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+        lib.espeak_Synth.argtypes = [
+            ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+            ctypes.c_uint, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p,
+        ]
+        sample_rate = lib.espeak_Initialize(_ESPEAK_AUDIO_OUTPUT_SYNCHRONOUS, 0, None, 0)
+        if sample_rate <= 0:
+            raise RuntimeError(f"espeak_Initialize failed ({sample_rate})")
+        cls._callback = _ESPEAK_SYNTH_CALLBACK(cls._on_samples)  # keep a reference: C holds only the pointer
+        lib.espeak_SetSynthCallback(cls._callback)
+        cls._lib, cls._sample_rate = lib, sample_rate
+
+    @staticmethod
+    def _on_samples(wav, num_samples, events):
+        if num_samples > 0:
+            EspeakEngine._chunks.append(ctypes.string_at(wav, num_samples * 2))  # 16-bit mono
+        return 0  # continue synthesis
+
+    def _voice_for(self, language: str) -> str:
+        return self.voice if language == "en" else language
+
+    def _render(self, text: str, language: str) -> bytes:
+        EspeakEngine._chunks = []
+        data = text.encode("utf-8")
+        self._lib.espeak_SetVoiceByName(self._voice_for(language).encode())
+        self._lib.espeak_Synth(data, len(data) + 1, 0, 0, 0, _ESPEAK_CHARS_UTF8, None, None)
+        self._lib.espeak_Synchronize()
+        return b"".join(EspeakEngine._chunks)
+
+    def synthesize(self, text: str, language: str, output_path: Path):
+        self.synthesize_batch([(text, language, output_path)])
+
+    def synthesize_batch(self, items: List[Tuple[str, str, Path]]):
+        with self._lock:
+            self._load()
+            for text, language, output_path in items:
+                try:
+                    pcm = self._render(text, language)
+                    with wave.open(str(output_path), "wb") as out:
+                        out.setnchannels(1)
+                        out.setsampwidth(2)
+                        out.setframerate(self._sample_rate)
+                        out.writeframes(pcm)
+                except Exception as e:
+                    print(f"[TTS-espeak] Failed to synthesize {text!r}: {e}")
+
+
+TTS_ENGINES = {
+    GTTSEngine.name: lambda: GTTSEngine(GTTS_VOICE),
+    EspeakEngine.name: lambda: EspeakEngine(ESPEAK_VOICE),
+}
+_engines: Dict[str, TTSEngine] = {}
+
+def get_tts_engine(name: str = TTS_ENGINE) -> TTSEngine:
+    engine = _engines.get(name)
+    if engine is None:
+        if name not in TTS_ENGINES:
+            raise ValueError(f"Unknown TTS engine {name!r}, expected one of {sorted(TTS_ENGINES)}")
+        engine = _engines.setdefault(name, TTS_ENGINES[name]())
+    return engine
+
+def _synthesize_batch(items: List[Tuple[str, str, str, Path]]):
+    """Audio store callback: route (text, lang, store voice, path) items to the engine named in the voice."""
+    by_voice = defaultdict(list)
+    for text, language, voice, output_path in items:
+        by_voice[voice].append((text, language, output_path))
+    for voice, engine_items in by_voice.items():
+        engine_name, _, engine_voice = voice.rpartition(":")
+        engine = get_tts_engine(engine_name or GTTSEngine.name)  # clips stored before engines existed were gTTS
+        if engine_voice != engine.voice:
+            engine = type(engine)(engine_voice)
+        engine.synthesize_batch(engine_items)
+
+def _synthesize(text: str, language: str, voice: str, output_path: Path):
+    _synthesize_batch([(text, language, voice, output_path)])
+
 def generate_audio(text: str, language: str = 'en') -> str:
     """
-    Generate audio file from text using gTTS
+    Generate audio file from text with the configured TTS engine
     
     Args:
         text (str): Text to convert to speech
         language (str): Language code (default: 'en')
         
     Returns:
-        str: Path to the generated audio file
+        str: URL of the clip under the mounted /media directory
     """
+    return generate_audio_batch([text], language)[0]
+
+def generate_audio_batch(texts: List[str], language: str = 'en') -> List[str]:
+    """URLs of clips for many texts ("" where synthesis failed); missing clips are synthesized in one engine batch."""
     try:
-        # Create audio directory if it doesn't exist
-        audio_dir = Path("media/audio")
-        audio_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate filename from text
-        filename = text.lower().strip().replace(" ", "_")
-        filename = re.sub(r"[^\w_]", "", filename)
-        filename = filename[:50] + ".mp3"
-        filepath = audio_dir / filename
-        
-        # If file already exists, return its path
-        if filepath.exists():
-            return f"/media/audio/{filename}"
-        
-        # Generate audio if file doesn't exist
-        tts = gTTS(text=text, lang=language, slow=False)
-        tts.save(str(filepath))
-        
-        # Return relative path that matches the mounted static directory
-        return f"/media/audio/{filename}"
-        
+        engine = get_tts_engine()
+        # Clips are content-addressed and shared by all workers: each phrase is synthesized once
+        return audio_store.get_or_create_many(texts, language, engine.store_voice, _synthesize_batch, engine.extension)
     except Exception as e:
         print(f"Error generating audio: {e}")
-        return ""
+        return [""] * len(texts)
 
-def process_user_audio(audio_path: str) -> str:
+def regenerate_audio(filename: str):
+    """Path of an audio clip, re-synthesized if it was evicted from the store; None if unknown."""
+    return audio_store.regenerate(filename, _synthesize)
+
+def process_user_audio(audio_path) -> str:
     """
-    Process user's audio submission and compare with correct pronunciation
-    Returns: (user_phonemes, is_correct)
+    Transcribe the user's recording to phonemes
+    audio_path: a file path, or {"raw": 16 kHz float32 samples, "sampling_rate": 16000}
+    Returns: user_phonemes as "/.../"
     """
     try:
         # Convert Path object to str if needed
@@ -55,7 +230,7 @@ def process_user_audio(audio_path: str) -> str:
             audio_path = str(audio_path)
         
         # Get ASR transcription
-        result = asr_model(audio_path)['text'].replace(" ", "")
+        result = get_asr().transcribe(audio_path).replace(" ", "")
         result = f"/{result}/"
         return result
         
@@ -63,13 +238,47 @@ def process_user_audio(audio_path: str) -> str:
         print(f"Error processing audio: {e}")
         return ""
     
+def get_phonemes_batch(texts: List[str]) -> List[str]:
+    """IPA of every text for each accent, as JSON strings; words not in the lexicon cost one espeak run per accent."""
+    if not texts:
+        return []
+    lines = [normalize_phoneme_text(text) for text in texts]
+    try:
+        known = phoneme_lexicon.get_many(lines, PHONEME_ACCENTS)
+    except sqlite3.Error as e:
+        print(f"[PhonemeLexicon] Lookup failed: {e}")
+        known = {}
+
+    missing = sorted({line for line in lines if any((line, language) not in known for language in PHONEME_ACCENTS)})
+    if missing:
+        # phonemizer works line by line: one line per text keeps outputs aligned with inputs
+        rows = [
+            (line, language, ipa)
+            for language in PHONEME_ACCENTS
+            for line, ipa in zip(missing, phonemize(missing, language=language, backend='espeak', strip=True, with_stress=False, preserve_empty_lines=True))
+        ]
+        known.update({(line, language): ipa for line, language, ipa in rows})
+        try:
+            phoneme_lexicon.put_many(rows)
+        except sqlite3.Error as e:
+            print(f"[PhonemeLexicon] Store failed: {e}")
+
+    return [
+        json.dumps({language: f"/{known[(line, language)]}/" for language in PHONEME_ACCENTS}, ensure_ascii=False)
+        for line in lines
+    ]
+
 def get_phonemes(text: str) -> str:
-    phoneme_dict = {}
-    languages = ['en-gb', 'en-us']
-    for language in languages:
-        ipa = phonemize(text, language=language, backend='espeak', strip=True, with_stress=False)
-        phoneme_dict[language] = f"/{ipa}/"
-    return json.dumps(phoneme_dict, ensure_ascii=False)
+    return get_phonemes_batch([text])[0]
+
+def warm_up_phoneme_lexicon():
+    """Phonemize the curriculum vocabulary ahead of the first quiz (no-op when the book content is not deployed)."""
+    try:
+        words = iter_curriculum_headwords() if BOOK_CONTENT_DIR.is_dir() else []
+        if words:
+            phoneme_lexicon.warm_up(words, get_phonemes_batch)
+    except Exception as e:
+        print(f"[PhonemeLexicon] Warm-up failed: {e}")
 
 def calculate_pronunciation_score(user_phonemes: str, correct_phonemes_json: str) -> float:
     correct_dict = json.loads(correct_phonemes_json)
@@ -0,0 +1,153 @@
+import asyncio
+import fakeredis
+from redis.exceptions import RedisError
+from backend.services.analysis_queue import AnalysisQueue, QUEUED, RUNNING, DONE, FAILED
+
+
+class FakeAnalyzer:
+    """Stands in for the LLM-backed analysis: records calls and fails on demand."""
+
+    def __init__(self, failures: int = 0):
+        self.calls = []
+        self.failures = failures
+
+    async def __call__(self, quiz_id: int):
+        self.calls.append(quiz_id)
+        if self.failures:
+            self.failures -= 1
+            raise ValueError("invalid JSON from LLM")
+        return {"strengths": "ok", "weaknesses": "Không"}
+
+
+def make_queue(analyzer, **kwargs):
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return AnalysisQueue(redis_client=redis_client, analyzer=analyzer, **kwargs)
+
+
+def test_repeated_submissions_are_deduplicated():
+    async def scenario():
+        analyzer = FakeAnalyzer()
+        queue = make_queue(analyzer)
+        assert await queue.enqueue(1) == QUEUED
+        assert await queue.enqueue(1) == QUEUED
+        assert await queue.enqueue(2) == QUEUED
+        assert await queue.redis.llen(queue._queue_key) == 2
+
+        assert await queue.process_next() == DONE
+        assert await queue.process_next() == DONE
+        assert await queue.process_next() is None
+        assert analyzer.calls == [1, 2]
+        assert (await queue.get_status(1))["state"] == DONE
+
+    asyncio.run(scenario())
+
+
+def test_submission_during_running_job_queues_a_new_one():
+    async def scenario():
+        queue = None
+
+        async def analyzer(quiz_id):
+            # A student resubmits while the analysis reads the old answers
+            assert await queue.enqueue(quiz_id) == QUEUED
+
+        queue = make_queue(analyzer)
+        await queue.enqueue(1)
+        assert await queue.process_next() == DONE
+        assert await queue.redis.llen(queue._queue_key) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_jobs_are_retried_then_marked_failed():
+    async def scenario():
+        analyzer = FakeAnalyzer(failures=5)
+        queue = make_queue(analyzer, max_attempts=2)
+        await queue.enqueue(7)
+        assert await queue.process_next() == QUEUED
+        assert await queue.process_next() == FAILED
+        status = await queue.get_status(7)
+        assert status["attempts"] == "2"
+        assert "invalid JSON" in status["error"]
+        assert await queue.process_next() is None
+
+    asyncio.run(scenario())
+
+
+def test_jobs_of_dead_workers_are_requeued():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        dead = AnalysisQueue(redis_client=redis_client, analyzer=FakeAnalyzer())
+        dead.worker_id = "dead-host:1"
+        await dead.enqueue(3)
+        # The worker took the job, then its process died without a heartbeat
+        await redis_client.lmove(dead._queue_key, dead._processing_key(dead.worker_id), "RIGHT", "LEFT")
+        await redis_client.sadd(dead._key("workers"), dead.worker_id)
+
+        analyzer = FakeAnalyzer()
+        alive = AnalysisQueue(redis_client=redis_client, analyzer=analyzer)
+        assert await alive.requeue_orphans() == 1
+        assert await alive.process_next() == DONE
+        assert analyzer.calls == [3]
+
+    asyncio.run(scenario())
+
+
+def test_requeued_jobs_still_deduplicate_resubmissions():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        dead = AnalysisQueue(redis_client=redis_client, analyzer=FakeAnalyzer())
+        dead.worker_id = "dead-host:1"
+        await redis_client.sadd(dead._key("workers"), dead.worker_id)
+        for quiz_id in (5, 6):
+            await dead.enqueue(quiz_id)
+            # Taken like process_next does, then the process died
+            await redis_client.lmove(dead._queue_key, dead._processing_key(dead.worker_id), "RIGHT", "LEFT")
+            await redis_client.delete(dead._key("pending", quiz_id))
+        # Quiz 6 was resubmitted while its job was orphaned
+        await dead.enqueue(6)
+
+        analyzer = FakeAnalyzer()
+        alive = AnalysisQueue(redis_client=redis_client, analyzer=analyzer)
+        assert await alive.requeue_orphans() == 1
+        assert await alive.enqueue(5) == QUEUED
+        while await alive.process_next() is not None:
+            pass
+        assert sorted(analyzer.calls) == [5, 6]
+
+    asyncio.run(scenario())
+
+
+def test_redis_failure_while_queueing_leaves_no_pending_marker():
+    async def scenario():
+        analyzer = FakeAnalyzer()
+        queue = make_queue(analyzer)
+
+        def broken_pipeline(*args, **kwargs):
+            raise RedisError("connection reset")
+
+        pipeline, queue.redis.pipeline = queue.redis.pipeline, broken_pipeline
+        assert await queue.enqueue(8) == RUNNING
+        await asyncio.gather(*queue._local_jobs)
+        queue.redis.pipeline = pipeline
+        assert not await queue.redis.exists(queue._key("pending", 8))
+        assert await queue.enqueue(8) == QUEUED
+        assert await queue.redis.llen(queue._queue_key) == 1
+
+    asyncio.run(scenario())
+
+
+def test_worker_consumes_in_background():
+    async def scenario():
+        analyzer = FakeAnalyzer()
+        queue = make_queue(analyzer, poll_timeout=0.05, heartbeat_ttl=1)
+        await queue.start()
+        await queue.enqueue(4)
+        for _ in range(100):
+            status = await queue.get_status(4)
+            if status["state"] == DONE:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        assert analyzer.calls == [4]
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from backend.integrators.asr import ASRServer, BatchingASR, RemoteASR
+
+
+class FakeLocalASR:
+    model = "fake"
+    pipeline = None
+
+    def __init__(self):
+        self.batches = []
+
+    def load_samples(self, audio):
+        if isinstance(audio, dict):
+            return np.asarray(audio["raw"], dtype=np.float32)
+        if "broken" in audio:
+            raise ValueError("cannot decode")
+        return np.zeros(len(audio), dtype=np.float32)
+
+    def transcribe_batch(self, batch):
+        self.batches.append(len(batch))
+        return [f"{len(samples)} samples" for samples in batch]
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / "asr.sock")
+    loop = asyncio.new_event_loop()
+    server = ASRServer(BatchingASR(FakeLocalASR(), max_batch=8, window=0.01), path)
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    for _ in range(100):
+        try:
+            RemoteASR(path, timeout=1).transcribe("ready.wav")
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.02)
+    return path
+
+
+def test_remote_transcribes_paths_and_samples(socket_path):
+    asr = RemoteASR(socket_path, timeout=5)
+    assert asr.transcribe("/a.wav") == f"{len('/a.wav')} samples"
+    samples = {"raw": np.zeros(16000, dtype=np.float64), "sampling_rate": 16000}
+    assert asr.transcribe(samples) == "16000 samples"
+
+
+def test_server_errors_reach_the_caller(socket_path):
+    with pytest.raises(RuntimeError, match="cannot decode"):
+        RemoteASR(socket_path, timeout=5).transcribe("broken.wav")
+
+
+def test_concurrent_clips_share_a_forward_pass():
+    local = FakeLocalASR()
+    asr = BatchingASR(local, max_batch=4, window=0.2)
+    futures = [asr.submit(np.zeros(n, dtype=np.float32)) for n in range(1, 6)]
+    assert [f.result(timeout=5) for f in futures] == [f"{n} samples" for n in range(1, 6)]
+    assert local.batches == [4, 1]
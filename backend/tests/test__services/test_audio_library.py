@@ -0,0 +1,40 @@
+import json
+from backend.services.audio_library import AudioLibrary, _resolve, parse_headwords
+
+
+def test_parse_headwords():
+    content = (
+        "WORD\nPRONUNCIATION\nMEANING\n"
+        "balance (n) \t sự thăng bằng\n"
+        "DIY (do-it-yourself) (n)\t (/ˌduː ɪt jəˈself/)\n"
+        "hoạt động tự làm ra\n"
+        "bell \tquả chuông\n/bel/ \n"
+        "city (n)  thành phố\n"
+        "on cloud nine/ on top of the world\trất vui sướng\n"
+        "on Children’s Day\t vào ngày Quốc tế Thiếu nhi"
+    )
+    assert parse_headwords(content) == [
+        "balance", "DIY", "bell", "city", "on cloud nine", "on top of the world", "on Children's Day",
+    ]
+
+
+def test_lookup_uses_the_manifest_and_falls_back_for_misses(tmp_path):
+    manifest = tmp_path / "audio_library.json"
+    library = AudioLibrary(manifest)
+    assert library.lookup("balance") is None
+
+    manifest.write_text(json.dumps({
+        "voice": "gtts:com",
+        "entries": {"balance": {"text": "balance", "audio_url": "/media/audio/a.mp3", "phonemes": "{}"}},
+    }))
+    assert library.audio_url(" Balance. ", "gtts:com") == "/media/audio/a.mp3"
+    assert library.audio_url("balance", "espeak:en-us") is None  # built with another engine
+
+    generated = []
+    def generate_batch(texts):
+        generated.append(texts)
+        return [f"/media/audio/{text}.mp3" for text in texts]
+
+    urls = _resolve(["balance", "bracelet"], lambda text: library.audio_url(text, "gtts:com"), generate_batch)
+    assert urls == ["/media/audio/a.mp3", "/media/audio/bracelet.mp3"]
+    assert generated == [["bracelet"]]
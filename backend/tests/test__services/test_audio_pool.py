@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from backend.services.audio_pool import AudioPool, AudioPoolSaturated
+
+
+def test_uploads_beyond_the_limit_are_rejected():
+    pool = AudioPool(workers=0, max_pending=2)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def upload():
+            async with pool.admit():
+                await release.wait()
+
+        running = [asyncio.create_task(upload()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AudioPoolSaturated):
+            async with pool.admit():
+                pass
+        release.set()
+        await asyncio.gather(*running)
+        async with pool.admit():  # slots are free again
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_work_runs_in_child_processes():
+    pool = AudioPool(workers=1, max_pending=2)
+    try:
+        assert asyncio.run(pool.run(divmod, 7, 2)) == (3, 1)
+    finally:
+        pool.shutdown()
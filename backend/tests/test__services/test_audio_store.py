@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from backend.services.audio_store import AudioStore
+
+
+class FakeSynthesizer:
+    def __init__(self, size=100, delay=0.0):
+        self.calls = []
+        self.size = size
+        self.delay = delay
+
+    def __call__(self, text, lang, voice, output_path):
+        self.calls.append((text, lang, voice))
+        time.sleep(self.delay)
+        output_path.write_bytes(b"\0" * self.size)
+
+
+def test_clips_are_keyed_by_text_language_and_voice(tmp_path):
+    store = AudioStore(root=tmp_path, max_bytes=0)
+    synth = FakeSynthesizer()
+    url = store.get_or_create("Hello  world", "en", "com", synth)
+    assert store.get_or_create("Hello world", "en", "com", synth) == url
+    assert store.get_or_create("Hello world", "fr", "com", synth) != url
+    assert store.get_or_create("Hello world", "en", "co.uk", synth) != url
+    assert len(synth.calls) == 3
+    assert (tmp_path / os.path.basename(url)).exists()
+
+
+def test_concurrent_requests_synthesize_once(tmp_path):
+    store = AudioStore(root=tmp_path, max_bytes=0)
+    synth = FakeSynthesizer(delay=0.05)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        urls = list(pool.map(lambda _: store.get_or_create("pronunciation", "en", "com", synth), range(8)))
+    assert len(set(urls)) == 1
+    assert len(synth.calls) == 1
+
+
+def test_least_recently_used_clips_are_evicted_and_regenerated(tmp_path):
+    store = AudioStore(root=tmp_path, max_bytes=350)
+    synth = FakeSynthesizer(size=100)
+    first = store.get_or_create("one", "en", "com", synth)
+    second = store.get_or_create("two", "en", "com", synth)
+    store.get_or_create("three", "en", "com", synth)
+    os.utime(tmp_path / os.path.basename(second), (1, 1))  # "two" is the least recently used
+    os.utime(tmp_path / os.path.basename(first), (2, 2))
+    store.get_or_create("four", "en", "com", synth)
+
+    assert not (tmp_path / os.path.basename(second)).exists()
+    assert (tmp_path / os.path.basename(first)).exists()
+    assert store.regenerate(os.path.basename(second), synth).exists()
+    assert synth.calls[-1] == ("two", "en", "com")
+
+
+def test_missing_clips_are_synthesized_in_one_batch(tmp_path):
+    store = AudioStore(root=tmp_path, max_bytes=0)
+    synth = FakeSynthesizer()
+    store.get_or_create("cached", "en", "espeak:en-us", synth, ext="wav")
+    batches = []
+
+    def synthesize_batch(items):
+        batches.append([text for text, _, _, _ in items])
+        for text, lang, voice, output_path in items:
+            if text != "broken":
+                synth(text, lang, voice, output_path)
+
+    urls = store.get_or_create_many(["cached", "new", "broken", "new"], "en", "espeak:en-us", synthesize_batch, ext="wav")
+    assert batches == [["new", "broken"]]
+    assert urls[0].endswith(".wav") and urls[1] == urls[3]
+    assert urls[2] == ""
+
+
+def test_lock_files_stay_bounded(tmp_path):
+    (tmp_path / ".locks").mkdir()
+    (tmp_path / ".locks" / f"{'a' * 32}.lock").touch()  # per-clip lock of an older version
+    store = AudioStore(root=tmp_path, max_bytes=0)
+    synth = FakeSynthesizer()
+
+    def synthesize_batch(items):
+        for item in items:
+            synth(*item)
+
+    # 300 keys share stripes with each other: the batch must not wait on its own locks
+    urls = store.get_or_create_many([f"word {i}" for i in range(300)], "en", "com", synthesize_batch)
+    assert all(urls)
+    lock_files = os.listdir(tmp_path / ".locks")
+    assert len(lock_files) <= 256
+    assert f"{'a' * 32}.lock" not in lock_files
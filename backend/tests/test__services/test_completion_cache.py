@@ -0,0 +1,44 @@
+import asyncio
+import fakeredis
+from backend.integrators.completion_cache import CompletionCache
+
+
+def make_cache(**kwargs):
+    return CompletionCache(redis_client=fakeredis.FakeRedis(decode_responses=True), **kwargs)
+
+
+def test_key_ignores_whitespace_but_not_params():
+    cache = make_cache()
+    assert cache.make_key("m", "Explain  this\n word ") == cache.make_key("m", "Explain this word")
+    assert cache.make_key("m", "p", {"temperature": 1}) != cache.make_key("m", "p", {"temperature": 0})
+    assert cache.make_key("a", "p") != cache.make_key("b", "p")
+
+
+def test_lru_evicts_locally_and_falls_back_to_redis():
+    cache = make_cache(max_entries=2)
+    for word in ("one", "two", "three"):
+        cache.set(cache.make_key("m", word), word.upper())
+    assert len(cache._local) == 2
+    # Evicted from the process tier, still served by Redis
+    assert cache.get(cache.make_key("m", "one")) == "ONE"
+    assert cache.get(cache.make_key("m", "four")) is None
+
+
+def test_oversized_and_empty_values_are_not_cached():
+    cache = make_cache(max_value_bytes=10)
+    cache.set(cache.make_key("m", "big"), "x" * 11)
+    cache.set(cache.make_key("m", "empty"), "")
+    assert cache.get(cache.make_key("m", "big")) is None
+    assert cache.get(cache.make_key("m", "empty")) is None
+
+
+def test_async_api_shares_both_tiers():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = CompletionCache(redis_client=redis_client), CompletionCache(redis_client=redis_client)
+    key = worker_a.make_key("m", "prompt")
+
+    async def roundtrip():
+        await worker_a.aset(key, "answer")
+        return await worker_a.aget(key), await worker_b.aget(key), await worker_b.aget(worker_b.make_key("m", "other"))
+
+    assert asyncio.run(roundtrip()) == ("answer", "answer", None)
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+import fakeredis
+from backend.integrators.context_cache import ContextCache
+
+PREFIX = "instructions and unit content " * 100
+
+
+class FakeCaches:
+    def __init__(self):
+        self.created = []
+
+    async def create(self, model, config):
+        await asyncio.sleep(0.01)
+        self.created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+
+def make_client():
+    return SimpleNamespace(aio=SimpleNamespace(caches=FakeCaches()))
+
+
+def test_short_prefixes_are_sent_inline():
+    cache = ContextCache(redis_client=fakeredis.FakeRedis(decode_responses=True), min_tokens=10_000)
+    client = make_client()
+    assert asyncio.run(cache.get(client, "key", "models/m", PREFIX)) is None
+    assert client.aio.caches.created == []
+
+
+def test_one_cached_content_per_key_and_prefix_shared_between_workers():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    client = make_client()
+
+    async def lookups(cache, api_key, n):
+        return await asyncio.gather(*(cache.get(client, api_key, "models/m", PREFIX) for _ in range(n)))
+
+    worker_a, worker_b = ContextCache(redis_client, min_tokens=100), ContextCache(redis_client, min_tokens=100)
+    assert set(asyncio.run(lookups(worker_a, "key-1", 5))) == {"cachedContents/1"}
+    assert worker_a._locks == {}  # per-prefix locks do not outlive the lookups
+    assert asyncio.run(lookups(worker_b, "key-1", 1)) == ["cachedContents/1"]
+    # Cached content belongs to the key's project
+    assert asyncio.run(lookups(worker_b, "key-2", 1)) == ["cachedContents/2"]
+
+    asyncio.run(worker_a.forget("key-1", "models/m", PREFIX))
+    assert asyncio.run(lookups(worker_b, "key-1", 1)) == ["cachedContents/1"]  # still in worker_b's memory
+    assert asyncio.run(lookups(worker_a, "key-1", 1)) == ["cachedContents/3"]
+
+
+def test_workers_do_not_create_the_same_cache_twice():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    client = make_client()
+    workers = [ContextCache(redis_client, min_tokens=100) for _ in range(3)]
+
+    async def lookups():
+        return await asyncio.gather(*(worker.get(client, "key-1", "models/m", PREFIX) for worker in workers))
+
+    assert asyncio.run(lookups()) == ["cachedContents/1"] * 3
+    assert len(client.aio.caches.created) == 1
+
+
+def test_prefix_is_sent_inline_while_another_worker_creates_it():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    client = make_client()
+    creating = ContextCache(redis_client, min_tokens=100)
+    assert creating._claim_creation(creating.make_key("key-1", "models/m", PREFIX))  # ...and never finishes
+    waiting = ContextCache(redis_client, min_tokens=100, wait=0.3)
+    assert asyncio.run(waiting.get(client, "key-1", "models/m", PREFIX)) is None
+    assert client.aio.caches.created == []
@@ -0,0 +1,46 @@
+from backend.services.json_array_parser import JsonArrayParser
+
+RESPONSE = """```json
+[
+  {"question": "Pick the odd one {out}", "options": ["a", "b]", "c\\"d", "e"], "correct_answer": "a", "type": "text"},
+  {"question": "Second", "options": ["x", "y",], "correct_answer": "x", "type": "text"},
+]
+```"""
+
+
+def _feed_in_chunks(parser, text, size):
+    objects = []
+    for i in range(0, len(text), size):
+        objects.extend(parser.feed(text[i:i + size]))
+    return objects
+
+
+def test_objects_are_returned_as_soon_as_they_close():
+    parser = JsonArrayParser()
+    first_end = RESPONSE.index('"type": "text"}') + len('"type": "text"}')
+    assert parser.feed(RESPONSE[:first_end - 1]) == []
+    first = parser.feed(RESPONSE[first_end - 1:first_end])
+    assert [q["question"] for q in first] == ["Pick the odd one {out}"]
+    assert first[0]["options"][1:3] == ["b]", 'c"d']
+    rest = parser.feed(RESPONSE[first_end:])
+    assert [q["options"] for q in rest] == [["x", "y"]]
+    assert parser.complete and not parser.truncated and parser.errors == 0
+
+
+def test_chunk_boundaries_do_not_matter():
+    for size in (1, 2, 7, 64):
+        parser = JsonArrayParser()
+        assert [q["question"] for q in _feed_in_chunks(parser, RESPONSE, size)] == ["Pick the odd one {out}", "Second"]
+
+
+def test_broken_and_truncated_arrays_are_salvaged():
+    text = (
+        '{"questions": [{"question": "ok 1", "correct_answer": "a"},'
+        ' {"question": "broken" "correct_answer": "b"},'
+        ' {"question": "ok 2", "correct_answer": "c"},'
+        ' {"question": "cut off", "correct_ans'
+    )
+    parser = JsonArrayParser()
+    assert [q["question"] for q in _feed_in_chunks(parser, text, 5)] == ["ok 1", "ok 2"]
+    assert parser.errors == 1 and parser.objects == 2
+    assert parser.truncated
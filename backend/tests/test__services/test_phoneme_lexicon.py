@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+from backend.services.phoneme_lexicon import PhonemeLexicon
+
+ACCENTS = ["en-gb", "en-us"]
+
+
+def test_lookup_returns_only_stored_pairs(tmp_path):
+    lexicon = PhonemeLexicon(tmp_path / "phonemes.sqlite3")
+    lexicon.put_many([("hello  world", "en-gb", "həlˈəʊ wˈɜːld"), ("hello world", "en-us", "həlˈoʊ wˈɜːld")])
+    found = lexicon.get_many(["hello world", "DIY"], ACCENTS)
+    assert found == {("hello world", "en-gb"): "həlˈəʊ wˈɜːld", ("hello world", "en-us"): "həlˈoʊ wˈɜːld"}
+
+
+def test_lexicon_is_shared_by_threads_and_instances(tmp_path):
+    path = tmp_path / "phonemes.sqlite3"
+    lexicon = PhonemeLexicon(path)
+    words = [f"word{i}" for i in range(2000)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda w: lexicon.put_many([(w, "en-us", w.upper())]), words))
+    assert len(PhonemeLexicon(path).get_many(words, ACCENTS)) == len(words)
+
+
+def test_warm_up_fills_the_lexicon(tmp_path):
+    lexicon = PhonemeLexicon(tmp_path / "phonemes.sqlite3")
+    batches = []
+
+    def phonemes_batch(words):
+        batches.append(words)
+        lexicon.put_many([(w, a, w) for w in words for a in ACCENTS])
+
+    lexicon.warm_up([f"w{i}" for i in range(5)], phonemes_batch, batch_size=2)
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert len(lexicon.get_many(["w0", "w4"], ACCENTS)) == 4
@@ -0,0 +1,70 @@
+import time
+import asyncio
+import threading
+import fakeredis
+import pytest
+from backend.integrators.api_key_manager import APIKeyManager
+from backend.integrators.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def key_manager(monkeypatch):
+    monkeypatch.setenv("TEST_KEY_1", "key-one")
+    monkeypatch.setenv("TEST_KEY_2", "key-two")
+    return APIKeyManager(key_prefix="TEST_KEY", purpose="test", redis_client=fakeredis.FakeRedis(decode_responses=True))
+
+
+def test_requests_spread_over_keys_until_rpm_is_used(key_manager):
+    limiter = RateLimiter(key_manager, rpm=2, tpm=10_000)
+    keys = [limiter.try_acquire(100)[0] for _ in range(4)]
+    assert sorted(keys) == ["key-one", "key-one", "key-two", "key-two"]
+    # Both keys are at their limit: the caller should wait, not send
+    assert limiter.try_acquire(100) == (None, True)
+
+
+def test_token_budget_is_enforced(key_manager):
+    limiter = RateLimiter(key_manager, rpm=100, tpm=1_000)
+    assert limiter.try_acquire(900)[0] is not None
+    assert limiter.try_acquire(900)[0] is not None
+    assert limiter.try_acquire(900) == (None, True)
+
+
+def test_cooling_down_keys_are_not_used(key_manager):
+    limiter = RateLimiter(key_manager, rpm=10)
+    key_manager.mark_key_exhausted("key-one")
+    key_manager.mark_key_exhausted("key-two")
+    assert limiter.try_acquire(100) == (None, False)
+
+
+def test_throttle_lowers_the_learned_limit(key_manager):
+    limiter = RateLimiter(key_manager, rpm=10)
+    for _ in range(4):
+        assert limiter._reserve("key-one", 10, now=time.time())
+    limiter.record_throttle("key-one")
+    assert int(limiter.redis.get(limiter._learned_key("key-one"))) < 10
+
+
+def test_acquire_keeps_redis_off_the_event_loop(key_manager):
+    limiter = RateLimiter(key_manager, rpm=1, max_wait=0)
+    loop_thread = threading.get_ident()
+    threads = []
+    try_acquire = limiter.try_acquire
+    limiter.try_acquire = lambda tokens: threads.append(threading.get_ident()) or try_acquire(tokens)
+
+    async def acquire_all():
+        return [await limiter.acquire(100) for _ in range(3)]
+
+    keys = asyncio.run(acquire_all())
+    assert sorted(keys[:2]) == ["key-one", "key-two"]
+    assert keys[2] is not None  # out of headroom and not allowed to wait: best key anyway
+    assert loop_thread not in threads
+
+
+def test_throttle_history_does_not_store_raw_keys(key_manager):
+    key_manager.mark_key_exhausted("key-one", cooldown_seconds=1)
+    throttled_at = key_manager.redis.hgetall(key_manager._throttled_key())
+    assert list(throttled_at) == [key_manager._fingerprints["key-one"]]
+    # The key throttled most recently is ranked last once it is active again
+    key_manager.redis.delete(key_manager._cooldown_key("key-one"))
+    key_manager._state = None
+    assert key_manager.ranked_keys()[-1] == "key-one"
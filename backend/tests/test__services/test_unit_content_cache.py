@@ -0,0 +1,140 @@
+import fakeredis
+from backend.services import unit_content_cache
+from backend.services.unit_content_cache import UnitBundle, UnitContentCache
+
+
+def bundle(unit_id):
+    return UnitBundle(
+        vocab=f"word{unit_id}", bookmap="{}", vocab_rows=[f"word{unit_id}"],
+        grammar=[f"grammar{unit_id}"], text_chunks=[f"text{unit_id}"],
+        prev_unit_ids=list(range(unit_id - 1, 0, -1)),
+    )
+
+
+def empty_bundle(unit_id):
+    return UnitBundle(None, None, [], [], [], list(range(unit_id - 1, 0, -1)))
+
+
+class FakeFetch:
+    def __init__(self, unit_ids=(1, 2, 3)):
+        self.unit_ids = list(unit_ids)
+        self.calls = []
+
+    def __call__(self, unit_ids=None):
+        self.calls.append(unit_ids)
+        return {
+            unit_id: bundle(unit_id) if unit_id in self.unit_ids else empty_bundle(unit_id)
+            for unit_id in (self.unit_ids if unit_ids is None else unit_ids)
+        }
+
+    def list_units(self):
+        return list(self.unit_ids)
+
+
+def test_units_are_fetched_once_and_shared_through_redis():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    worker_a = UnitContentCache(redis_client, use_redis=True, check_interval=0, fetch=fetch)
+    worker_b = UnitContentCache(redis_client, use_redis=True, check_interval=0, fetch=fetch)
+
+    assert worker_a.get(3) == bundle(3)
+    assert worker_a.get_many([3, 2]) == {3: bundle(3), 2: bundle(2)}
+    assert fetch.calls == [[3], [2]]
+    # Another worker reads the bundles from Redis instead of the database
+    assert worker_b.get_many([2, 3]) == {2: bundle(2), 3: bundle(3)}
+    assert fetch.calls == [[3], [2]]
+
+
+def test_version_bump_drops_every_worker_copy():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    worker_a = UnitContentCache(redis_client, use_redis=True, check_interval=0, fetch=fetch, list_units=fetch.list_units)
+    worker_b = UnitContentCache(redis_client, use_redis=True, check_interval=0, fetch=fetch)
+    assert worker_a.prewarm() == 3
+    worker_b.get(1)
+    assert fetch.calls == [[1, 2, 3]]
+
+    worker_a.bump_version()
+    worker_b.get(1)
+    assert fetch.calls == [[1, 2, 3], [1]]
+
+
+def test_without_redis_prewarm_serves_everything_locally():
+    fetch = FakeFetch()
+    cache = UnitContentCache(use_redis=False, fetch=fetch, list_units=fetch.list_units)
+    cache.prewarm()
+    assert [cache.get(unit_id).text_chunks for unit_id in (1, 2, 3)] == [["text1"], ["text2"], ["text3"]]
+    assert fetch.calls == [[1, 2, 3]]
+
+
+def test_failed_prewarm_falls_back_to_lookups():
+    def broken(unit_ids=None):
+        raise ConnectionError("database is down")
+
+    cache = UnitContentCache(use_redis=False, fetch=broken, list_units=lambda: [1, 2, 3])
+    assert cache.prewarm() == 0
+
+
+def test_only_the_first_worker_prewarms_from_the_database():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    workers = [
+        UnitContentCache(redis_client, use_redis=True, fetch=fetch, list_units=fetch.list_units) for _ in range(3)
+    ]
+    assert [worker.prewarm() for worker in workers] == [3, 3, 3]
+    assert fetch.calls == [[1, 2, 3]]
+    assert workers[2].get(2) == bundle(2)
+
+
+def test_prewarm_reads_the_database_when_the_first_worker_never_finishes():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    stuck = UnitContentCache(redis_client, use_redis=True, prewarm_wait=1, fetch=fetch)
+    assert stuck._shared_unit_ids() is None  # took the prewarm claim, then died without refreshing it
+    worker = UnitContentCache(redis_client, use_redis=True, fetch=fetch, list_units=fetch.list_units)
+    assert worker.prewarm() == 3
+    assert fetch.calls == [[1, 2, 3]]
+
+
+def test_prewarm_refreshes_its_claim_between_batches(monkeypatch):
+    monkeypatch.setattr(unit_content_cache, "UNIT_CACHE_PREWARM_BATCH", 1)
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    cache = UnitContentCache(redis_client, use_redis=True, prewarm_wait=5, fetch=fetch, list_units=fetch.list_units)
+    claim_ttls = []
+
+    def slow_fetch(unit_ids=None):
+        claim_ttls.append(redis_client.ttl(cache._key("prewarm")))
+        redis_client.expire(cache._key("prewarm"), 1)  # time passes
+        return fetch(unit_ids)
+
+    cache._fetch = slow_fetch
+    assert cache.prewarm() == 3
+    assert claim_ttls == [5, 5, 5]
+    assert not redis_client.exists(cache._key("prewarm"))
+
+
+def test_stopped_prewarm_returns_between_batches(monkeypatch):
+    monkeypatch.setattr(unit_content_cache, "UNIT_CACHE_PREWARM_BATCH", 1)
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    fetch = FakeFetch()
+    cache = UnitContentCache(redis_client, use_redis=True, fetch=fetch, list_units=fetch.list_units)
+
+    def fetch_then_shut_down(unit_ids=None):
+        cache.stop_prewarm()
+        return fetch(unit_ids)
+
+    cache._fetch = fetch_then_shut_down
+    assert cache.prewarm() == 1
+    assert fetch.calls == [[1]]
+    # The unfinished run does not publish its ids and frees the claim for the next worker
+    assert not redis_client.exists(cache._key("ids"))
+    assert not redis_client.exists(cache._key("prewarm"))
+
+
+def test_unknown_units_are_not_cached():
+    fetch = FakeFetch()
+    cache = UnitContentCache(use_redis=False, fetch=fetch)
+    assert cache.get(9).empty
+    assert cache.get(9).empty
+    assert fetch.calls == [[9], [9]]
@@ -0,0 +1,50 @@
+import asyncio
+import io
+import shutil
+import wave
+import numpy as np
+import pytest
+from backend.services import user_audio
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def wav_bytes(seconds: float, rate: int = 44100, channels: int = 2) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (np.sin(2 * np.pi * 440 * t) * 0.3 * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(np.repeat(tone, channels).tobytes())
+    return buf.getvalue()
+
+
+@needs_ffmpeg
+def test_upload_is_decoded_to_16k_mono_and_stored_compressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_audio, "USER_AUDIO_DIR", tmp_path)
+    data = wav_bytes(1.0)
+
+    samples = asyncio.run(user_audio.decode_audio(data, ".wav"))
+    assert samples.dtype == np.float32
+    assert abs(len(samples) - 16000) < 400
+
+    name = user_audio.recording_name("clip", ".wav")
+    path = asyncio.run(user_audio.save_recording(name, data, samples, ".wav"))
+    assert path.name == "clip.m4a"
+    assert 0 < path.stat().st_size < len(data) / 5
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_failed_upload_discards_its_recording(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_audio, "USER_AUDIO_DIR", tmp_path)
+    name = user_audio.recording_name("clip", ".webm")
+    samples = np.zeros(16000, dtype=np.float32)
+
+    async def upload_fails_during_analysis():
+        save = asyncio.create_task(user_audio.save_recording(name, b"webm data", samples, ".webm"))
+        await user_audio.discard_recording(save, name)
+
+    asyncio.run(upload_fails_during_analysis())
+    assert not list(tmp_path.iterdir())
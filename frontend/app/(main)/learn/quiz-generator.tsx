@@ -3,7 +3,7 @@
 import { useState } from "react";
 import { Button } from "@/components/ui/button";
 import { DokExplanation } from "@/components/ui/ui-dok";
-import { generateQuiz } from "@/actions/quiz";
+import { streamQuiz } from "@/lib/quiz-stream";
 import { useRouter } from "next/navigation";
 import { toast } from "sonner";
 import { Card } from "@/components/ui/card";
@@ -71,20 +71,50 @@ export const QuizGenerator = ({ units }: QuizGeneratorProps) => {
   
     setIsLoading(true);
     try {
-      const result = await generateQuiz(
-        [parseInt(selectedUnit)],
-        dokLevel,
-        prompt || undefined,
-        counts.multipleChoice,
-        counts.image,
-        counts.voice,
-      );
-  
-      if (result.success && result.quizId) {
+      // Start the quiz as soon as the first text questions are saved;
+      // the lesson page picks up the remaining ones while the student answers.
+      const expected = counts.multipleChoice + counts.image + counts.voice;
+      let quizId: number | undefined;
+      let received = 0;
+      let started = false;
+      let error: string | undefined;
+
+      const start = () => {
+        started = true;
         toast.success("Quiz generated successfully!");
-        router.push(`/lesson?quizId=${result.quizId}&lessonId=0`);
-      } else {
-        toast.error(result.error || "Failed to generate quiz");
+        router.push(`/lesson?quizId=${quizId}&lessonId=0&pending=${Math.max(expected - received, 0)}`);
+      };
+
+      await streamQuiz(
+        {
+          unit_ids: [parseInt(selectedUnit)],
+          dok_level: dokLevel,
+          prompt: prompt || undefined,
+          multiple_choice_count: counts.multipleChoice,
+          image_count: counts.image,
+          voice_count: counts.voice,
+        },
+        ({ event, data }) => {
+          if (event === "quiz") {
+            quizId = data.quiz_id;
+          } else if (event === "questions") {
+            received += data.items.length;
+            if (data.group === "multiple_choice_questions" || counts.multipleChoice === 0) {
+              start();
+              return false;
+            }
+          } else if (event === "error") {
+            error = data.detail;
+          }
+        },
+      );
+
+      if (!started) {
+        if (quizId && received > 0) {
+          start();
+        } else {
+          toast.error(error || "Failed to generate quiz");
+        }
       }
     } catch (error) {
       toast.error("An error occurred while generating the quiz");
@@ -0,0 +1,44 @@
+import { auth } from '@clerk/nextjs'
+import { NextResponse } from 'next/server'
+
+export const dynamic = 'force-dynamic'
+
+// Pass the backend's text/event-stream through unbuffered
+export async function POST(request: Request) {
+    try {
+        const { userId } = auth()
+        if (!userId) {
+            return NextResponse.json({ error: 'Unauthorized' }, { status: 401 })
+        }
+
+        const body = await request.json()
+        const backendUrl = process.env.BACKEND_URL || 'http://localhost:8000'
+
+        const response = await fetch(`${backendUrl}/api/quiz/generate/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ ...body, user_id: userId }),
+            cache: 'no-store',
+        })
+
+        if (!response.ok || !response.body) {
+            throw new Error(await response.text())
+        }
+
+        return new Response(response.body, {
+            headers: {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+            },
+        })
+    } catch (error) {
+        console.error('Error in quiz generate stream route:', error)
+        return NextResponse.json(
+            { error: 'Failed to generate quiz' },
+            { status: 500 }
+        )
+    }
+}
@@ -199,6 +199,11 @@ export const PronunciationChallenge = ({
 
             const data = await response.json(); // Read response body once
 
+            if (response.status === 429) {
+                // Server is busy analyzing other recordings; the recording itself is fine
+                throw new Error("The server is busy right now. Please try again in a few seconds.");
+            }
+
             if (!response.ok) {
                 console.error("Upload/Analysis failed:", response.status, data);
                  // Use error message from backend if available
@@ -9,6 +9,7 @@ interface PageProps {
   searchParams: {
     quizId?: string;
     lessonId?: string;
+    pending?: string; // questions still being generated (streamed quiz)
   };
 }
 
@@ -76,6 +77,7 @@ const LessonPage = async ({ searchParams }: PageProps) => {
         initialHearts={hearts}
         initialPercentage={0}
         userId={userProgress.userId}
+        pendingQuestions={searchParams.pending ? parseInt(searchParams.pending) || 0 : 0}
       />
     );
   } catch (error) {
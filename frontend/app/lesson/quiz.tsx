@@ -10,7 +10,10 @@ import { Challenge } from "./challenge";
 import { Footer } from "./footer";
 import { Header } from "./header";
 
-import { submitQuizAnswers } from "./api";
+import { submitQuizAnswers, lessonApi } from "./api";
+
+const PENDING_POLL_INTERVAL = 3000; // ms
+const PENDING_POLL_TIMEOUT = 120000; // ms, give up on questions that never arrive
 
 type Challenge = {
   id: number;
@@ -36,6 +39,7 @@ type QuizProps = {
   initialQuizId: number;
   initialQuestions: Challenge[];
   userId: string;
+  pendingQuestions?: number;
 };
 
 export const Quiz = ({
@@ -46,6 +50,7 @@ export const Quiz = ({
   initialQuizId,
   initialQuestions = [],
   userId,
+  pendingQuestions = 0,
 }: QuizProps) => {
   const router = useRouter();
   
@@ -72,6 +77,44 @@ export const Quiz = ({
     setStatus("none");
   }, [quizId]); // Reset when quiz ID changes
 
+  // Questions of a streamed quiz that were still being generated when it started
+  useEffect(() => {
+    if (pendingQuestions <= 0) return;
+
+    let remaining = pendingQuestions;
+    const known = new Set(initialQuestions.map((q) => q.id));
+    const startedAt = Date.now();
+    const timer = setInterval(async () => {
+      try {
+        const quizData = await lessonApi.fetchQuizById(quizId, undefined, userId);
+        const added = [
+          ...quizData.multiple_choice_questions,
+          ...quizData.image_questions,
+          ...quizData.voice_questions,
+          ...quizData.pronunc_questions,
+        ]
+          .filter((q) => !known.has(q.id))
+          .map((q) => ({
+            ...q,
+            type: q.type.toUpperCase() as Challenge["type"],
+            quizId,
+          }));
+        if (added.length > 0) {
+          added.forEach((q) => known.add(q.id));
+          remaining -= added.length;
+          setChallenges((current) => [...current, ...added]);
+        }
+      } catch (error) {
+        console.error("Error fetching generated questions:", error);
+      }
+      if (remaining <= 0 || Date.now() - startedAt > PENDING_POLL_TIMEOUT) {
+        clearInterval(timer);
+      }
+    }, PENDING_POLL_INTERVAL);
+
+    return () => clearInterval(timer);
+  }, [quizId, userId, pendingQuestions]); // eslint-disable-line react-hooks/exhaustive-deps
+
   const challenge = challenges[activeIndex];
   const options = challenge?.challengeOptions ?? [];
   const isLastQuestion = activeIndex === challenges.length - 1;
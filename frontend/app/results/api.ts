@@ -72,3 +72,15 @@ export async function getStrengthWeakness(quizId: number) {
   }
   return res.json();
 }
+
+// Performance analysis runs as a background job after submit: poll until it settles
+export async function waitForStrengthWeakness(quizId: number, intervalMs = 2000, maxAttempts = 60) {
+  for (let attempt = 0; ; attempt++) {
+    const data = await getStrengthWeakness(quizId);
+    const pending = data.analysisStatus === "queued" || data.analysisStatus === "running";
+    if (!pending || attempt + 1 >= maxAttempts) {
+      return data;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
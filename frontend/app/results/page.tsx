@@ -13,7 +13,7 @@ import ReactMarkdown from "react-markdown";
 import { Button } from "@/components/ui/button";
 import { ResultCard } from "./result-card";
 import { Footer } from "./footer";
-import { generatePracticeQuiz, getUserProfile, Role, getStrengthWeakness } from "./api";
+import { generatePracticeQuiz, getUserProfile, Role, waitForStrengthWeakness } from "./api";
 import { useAuth } from "@clerk/nextjs";
 
 interface QuizResult {
@@ -55,7 +55,7 @@ export default function ResultPage() {
 
         // Fetch strengths and weaknesses
         if (parsedResults.quizId) {
-          getStrengthWeakness(parsedResults.quizId)
+          waitForStrengthWeakness(parsedResults.quizId)
             .then(data => {
               setStrengths(data.strengths);
               setWeaknesses(data.weaknesses);
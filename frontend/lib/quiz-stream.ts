@@ -0,0 +1,61 @@
+import type { QuizQuestion } from "@/app/lesson/api";
+
+export type QuizStreamEvent =
+  | { event: "quiz"; data: { quiz_id: number } }
+  | { event: "questions"; data: { group: string; items: QuizQuestion[] } }
+  | { event: "done"; data: { quiz_id: number; counts: Record<string, number> } }
+  | { event: "error"; data: { quiz_id: number; detail: string } };
+
+export type QuizStreamRequest = {
+  unit_ids: number[];
+  dok_level: (1 | 2 | 3)[];
+  prompt?: string;
+  multiple_choice_count: number;
+  image_count: number;
+  voice_count: number;
+};
+
+// Read /api/quiz/generate/stream event by event; return false from onEvent to stop reading.
+// The backend keeps generating and saving the quiz after the reader stops.
+export const streamQuiz = async (
+  request: QuizStreamRequest,
+  onEvent: (event: QuizStreamEvent) => boolean | void,
+): Promise<void> => {
+  const response = await fetch("/api/quiz/generate/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(request),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(await response.text());
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  try {
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+
+        let event = "message";
+        let data = "";
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        }
+        if (!data) continue; // keepalive comment
+
+        if (onEvent({ event, data: JSON.parse(data) } as QuizStreamEvent) === false) return;
+      }
+    }
+  } finally {
+    reader.cancel().catch(() => {});
+  }
+};